@@ -29,6 +29,9 @@ class Config:
         self.REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.ENV = os.getenv("ENV", "development")
         self.AI_PROVIDER = os.getenv("AI_PROVIDER", "yandex")
+
+        # Хранилище буфера консультаций: redis | postgres
+        self.CONSULTATION_BUFFER_BACKEND = os.getenv("CONSULTATION_BUFFER_BACKEND", "redis")
         
         # AI ключи
         self.YANDEX_GPT_API_KEY = os.getenv("YANDEX_GPT_API_KEY")
@@ -39,6 +42,10 @@ class Config:
         
         # Webhook
         self.WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+        
+        # Точка отправления курьеров (магазин) для построения маршрутов
+        self.SHOP_LATITUDE = self._get_float("SHOP_LATITUDE")
+        self.SHOP_LONGITUDE = self._get_float("SHOP_LONGITUDE")
     
     def _get_required(self, key: str) -> str:
         """Получить обязательную переменную"""
@@ -47,6 +54,15 @@ class Config:
             raise ValueError(f"Переменная {key} обязательна")
         return value
     
+    def _get_float(self, key: str):
+        """Необязательная числовая переменная"""
+        value = os.getenv(key)
+        try:
+            return float(value) if value else None
+        except ValueError:
+            print(f"⚠️ {key} должна быть числом: {value}")
+            return None
+    
     def is_development(self) -> bool:
         return self.ENV == "development"
     
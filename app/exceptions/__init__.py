@@ -3,6 +3,7 @@ from .base import (
     UserNotFoundError,
     ProductNotFoundError,
     OrderNotFoundError,
+    SlotUnavailableError,
     ValidationError,
     PermissionDeniedError
 )
@@ -12,6 +13,7 @@ __all__ = [
     "UserNotFoundError", 
     "ProductNotFoundError",
     "OrderNotFoundError",
+    "SlotUnavailableError",
     "ValidationError",
     "PermissionDeniedError"
 ]
\ No newline at end of file
@@ -22,6 +22,11 @@ class OrderNotFoundError(FlorangeException):
     def __init__(self, order_id: int):
         super().__init__(f"Order {order_id} not found", "order_not_found")
 
+class SlotUnavailableError(FlorangeException):
+    """Слот доставки занят"""
+    def __init__(self, slot_at):
+        super().__init__(f"Delivery slot {slot_at} is fully booked", "slot_unavailable")
+
 class ValidationError(FlorangeException):
     """Ошибка валидации данных"""
     pass
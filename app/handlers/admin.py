@@ -1,8 +1,12 @@
 from aiogram import Router, types, F
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
 
 from app.database.database import get_session
-from app.services import UserService, NotificationService
-from app.repositories import SettingsRepository
+from app.services import UserService, NotificationService, InventoryExportService
+from app.services.role_request_counter import pending_requests
+from app.services.staff_directory import staff_directory
+from app.repositories import SettingsRepository, ConsultationRepository
 from app.models import (
     RoleEnum, 
     RoleRequest, 
@@ -13,8 +17,10 @@ from app.models import (
 from app.translate import t
 from app.exceptions import UserNotFoundError
 
+import html
 import logging
-from datetime import datetime
+import os
+from datetime import datetime, date, timedelta
 from app.translate import t
 from app.models import User, RoleEnum, RequestedRoleEnum
 
@@ -360,6 +366,8 @@ async def approve_request(callback: types.CallbackQuery):
             request.approved_by = user.id
             
             await session.commit()
+            pending_requests.decrement()
+            await staff_directory.refresh()
             
             # Уведомляем пользователя
             role_name = "флорист" if target_role == RoleEnum.florist else "владелец"
@@ -422,6 +430,7 @@ async def reject_request(callback: types.CallbackQuery):
         request.approved_by = user.id
         
         await session.commit()
+        pending_requests.decrement()
         
         # ВАЖНО: При отклонении НЕ создаем пользователя вообще!
         # Пользователь останется незарегистрированным
@@ -545,11 +554,18 @@ async def show_user_info(callback: types.CallbackQuery):
         try:
             target_user = await user_service.get_user_by_id(user_id)
             
-            # Получаем статистику заказов пользователя
-            user_orders = await order_service.get_user_orders(user_id)
-            
-            total_orders = len(user_orders)
-            total_spent = sum(float(order.total_price or 0) for order in user_orders)
+            # Сводка по заказам - одна строка customer_stats
+            stats = await order_service.get_customer_stats(user_id)
+            if stats:
+                last_order = stats.last_order_at.strftime('%d.%m.%Y') if stats.last_order_at else '—'
+                stats_text = (
+                    f"• Заказов: {stats.orders_count} (доставлено {stats.delivered_count})\n"
+                    f"• Потратил: {stats.total_spent:,.0f} сум\n"
+                    f"• Средний чек: {stats.average_check:,.0f} сум\n"
+                    f"• Последний заказ: {last_order}"
+                )
+            else:
+                stats_text = "• Заказов: 0"
             
             role_emoji = {"florist": "🌸", "owner": "👑", "client": "👤"}.get(target_user.role.value, "❓")
             
@@ -561,8 +577,7 @@ async def show_user_info(callback: types.CallbackQuery):
                 f"🎯 {target_user.role.value}\n"
                 f"🗓 {target_user.created_at.strftime('%d.%m.%Y') if target_user.created_at else 'Неизвестно'}\n\n"
                 f"📊 <b>Статистика:</b>\n"
-                f"• Заказов: {total_orders}\n"
-                f"• Потратил: {total_spent:,.0f} сум"
+                f"{stats_text}"
             )
             
             kb_rows = []
@@ -678,6 +693,8 @@ async def confirm_delete_florist(callback: types.CallbackQuery):
             # ПОЛНОЕ УДАЛЕНИЕ из системы
             await _delete_user_completely(session, user_id)
             await session.commit()
+            await pending_requests.refresh()  # могли удалиться заявки пользователя
+            await staff_directory.refresh()
             
             # Показываем КОРОТКИЙ результат
             result_text = (
@@ -707,7 +724,7 @@ async def confirm_delete_florist(callback: types.CallbackQuery):
 async def _delete_user_completely(session, user_id: int):
     """Полное удаление пользователя из системы"""
     from sqlalchemy import delete, update
-    from app.models import User, RoleRequest, FloristProfile
+    from app.models import User, RoleRequest, FloristProfile, CustomerStats, CustomerSegment
     
     try:
         # 1. СНАЧАЛА удаляем/обновляем все ссылки на пользователя
@@ -735,6 +752,13 @@ async def _delete_user_completely(session, user_id: int):
             # Если таблицы FloristProfile нет - игнорируем
             pass
         
+        await session.execute(
+            delete(CustomerStats).where(CustomerStats.user_id == user_id)
+        )
+        await session.execute(
+            delete(CustomerSegment).where(CustomerSegment.user_id == user_id)
+        )
+        
         # 3. ИСТОРИЯ ЗАКАЗОВ И КОНСУЛЬТАЦИЙ ОСТАЕТСЯ!
         # orders.user_id остается для отчетности
         # В интерфейсе будет показываться "Удаленный пользователь"
@@ -748,4 +772,293 @@ async def _delete_user_completely(session, user_id: int):
         
     except Exception as e:
         print(f"Complete deletion error: {e}")
-        raise
\ No newline at end of file
+        raise
+
+@router.message(Command("export_movements"))
+async def export_movements(message: types.Message):
+    """Выгрузка движений склада в CSV: /export_movements [ГГГГ-ММ-ДД ГГГГ-ММ-ДД]"""
+    args = message.text.split()[1:]
+    
+    try:
+        if len(args) >= 2:
+            start_date = date.fromisoformat(args[0])
+            end_date = date.fromisoformat(args[1])
+        else:
+            # По умолчанию - последние 30 дней
+            end_date = date.today()
+            start_date = end_date - timedelta(days=30)
+    except ValueError:
+        await message.answer("❌ Формат: /export_movements 2025-01-01 2025-12-31")
+        return
+    
+    if start_date > end_date:
+        await message.answer("❌ Дата начала позже даты окончания")
+        return
+    
+    async for session in get_session():
+        user, is_admin = await _get_user_and_check_admin(session, message.from_user.id)
+        
+        if not is_admin:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        progress_msg = await message.answer("⏳ Формирую выгрузку...")
+        
+        path = None
+        try:
+            export_service = InventoryExportService(session)
+            path = await export_service.export_movements_csv(start_date, end_date)
+            
+            filename = f"movements_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+            await message.answer_document(
+                types.FSInputFile(path, filename=filename),
+                caption=f"📦 Движения склада\n📅 {start_date.strftime('%d.%m.%Y')} — {end_date.strftime('%d.%m.%Y')}"
+            )
+        except Exception as e:
+            print(f"Movements export error: {e}")
+            await message.answer(f"❌ Ошибка выгрузки: {str(e)[:100]}")
+        finally:
+            if path and os.path.exists(path):
+                os.remove(path)
+        
+        try:
+            await progress_msg.delete()
+        except Exception:
+            pass
+
+@router.message(Command("slot_capacity"))
+async def slot_capacity(message: types.Message):
+    """Лимиты доставок на слот: /slot_capacity [период] [число]"""
+    from app.services.delivery_slots import (
+        SLOT_PERIODS, CAPACITY_SETTING, slot_availability, load_capacities, period_label
+    )
+    
+    args = message.text.split()[1:]
+    if len(args) == 1:
+        args = ["all"] + args
+    usage = "❌ Формат: /slot_capacity 5 или /slot_capacity morning 3\nПериоды: " + ", ".join(SLOT_PERIODS)
+    
+    if args and (len(args) != 2 or not args[1].isdigit() or args[0] not in ("all", *SLOT_PERIODS)):
+        await message.answer(usage)
+        return
+    
+    async for session in get_session():
+        user, is_admin = await _get_user_and_check_admin(session, message.from_user.id)
+        
+        if not is_admin:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        if args:
+            period, value = args
+            key = CAPACITY_SETTING if period == "all" else f"{CAPACITY_SETTING}_{period}"
+            await SettingsRepository(session).set_value(key, value)
+            await session.commit()
+            slot_availability.invalidate()
+        
+        capacities = await load_capacities(session)
+        lines = [f"• {period_label(period)}: {capacities[period]}" for period in SLOT_PERIODS]
+        await message.answer("🚚 <b>Доставок на слот:</b>\n\n" + "\n".join(lines), parse_mode="HTML")
+
+@router.message(Command("delivery_zones"))
+@router.message(F.document, F.caption.startswith("/delivery_zones"))
+async def delivery_zones_command(message: types.Message):
+    """Зоны доставки: /delivery_zones - список, JSON-файл с подписью /delivery_zones - замена"""
+    from app.repositories import DeliveryZoneRepository
+    from app.services.delivery_zones import delivery_zones, parse_zones
+    
+    async for session in get_session():
+        user, is_admin = await _get_user_and_check_admin(session, message.from_user.id)
+        
+        if not is_admin:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        zone_repo = DeliveryZoneRepository(session)
+        
+        if message.document:
+            try:
+                file = await message.bot.download(message.document)
+                zones = parse_zones(file.read().decode("utf-8"))
+            except (ValueError, UnicodeDecodeError) as e:
+                await message.answer(f"❌ {e}")
+                return
+            
+            await zone_repo.replace_active(zones)
+            await session.commit()
+            delivery_zones.invalidate()
+        
+        zones = await zone_repo.get_active()
+        if not zones:
+            await message.answer(
+                "🗺 Зоны доставки не заданы - доставляем по любому адресу.\n\n"
+                "Отправьте JSON-файл с подписью /delivery_zones:\n"
+                '<code>[{"name_ru": "Центр", "name_uz": "Markaz", "fee": 20000, '
+                '"eta_minutes": 60, "polygon": [[41.30, 69.24], [41.32, 69.24], [41.32, 69.28]]}]</code>',
+                parse_mode="HTML"
+            )
+            return
+        
+        lines = [
+            f"• {html.escape(zone.name_ru)} — {zone.fee} сум, ~{zone.eta_minutes} мин"
+            for zone in zones
+        ]
+        await message.answer("🗺 <b>Зоны доставки:</b>\n\n" + "\n".join(lines), parse_mode="HTML")
+
+@router.message(Command("courier"))
+async def toggle_courier(message: types.Message):
+    """Назначить курьером или снять: /courier <telegram id>"""
+    args = message.text.split()[1:]
+    if len(args) != 1 or not args[0].isdigit():
+        await message.answer("❌ Формат: /courier 123456789")
+        return
+    
+    async for session in get_session():
+        user, is_admin = await _get_user_and_check_admin(session, message.from_user.id)
+        
+        if not is_admin:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        target = await UserService(session).user_repo.get_by_tg_id(args[0])
+        if not target:
+            await message.answer("❌ Пользователь не найден - он должен сначала нажать /start")
+            return
+        
+        if target.role == RoleEnum.courier:
+            target.role = RoleEnum.client
+            result_text = f"✅ {target.first_name} больше не курьер"
+        elif target.role == RoleEnum.client:
+            target.role = RoleEnum.courier
+            result_text = f"✅ {target.first_name} теперь курьер"
+        else:
+            await message.answer("❌ Курьером можно назначить только клиента")
+            return
+        
+        await session.commit()
+        await staff_directory.refresh()
+        await message.answer(result_text)
+        
+        try:
+            await message.bot.send_message(
+                chat_id=int(target.tg_id),
+                text="🔄 Ваша роль изменена. Нажмите /start для обновления меню."
+            )
+        except Exception as e:
+            print(f"User notification error: {e}")
+
+SEARCH_PAGE_SIZE = 5
+
+@router.message(Command("digest"))
+async def notification_digest_command(message: types.Message):
+    """Режим уведомлений о заказах: /digest 15 - сводка раз в 15 минут, /digest off - сразу"""
+    from app.services.notification_digest import notification_digest, render_digest
+    
+    args = message.text.split()[1:]
+    if args and not (args[0] == "off" or (args[0].isdigit() and 1 <= int(args[0]) <= 24 * 60)):
+        await message.answer("❌ Формат: /digest 15 (минут) или /digest off")
+        return
+    
+    async for session in get_session():
+        user, _ = await _get_user_and_check_admin(session, message.from_user.id)
+        
+        if not user or user.role not in [RoleEnum.owner, RoleEnum.florist]:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        if args:
+            previous = user.notify_digest_minutes
+            user.notify_digest_minutes = None if args[0] == "off" else int(args[0])
+            await session.commit()
+            await staff_directory.refresh()
+            
+            # Накопленное при выключении сводки не должно потеряться
+            if previous and not user.notify_digest_minutes:
+                events = await notification_digest.drain(user.tg_id)
+                if events:
+                    await message.answer(render_digest(events, previous), parse_mode="HTML")
+        
+        if user.notify_digest_minutes:
+            await message.answer(
+                f"📊 Уведомления о заказах: сводка раз в {user.notify_digest_minutes} мин.\n"
+                f"Отмены приходят сразу. Выключить: /digest off"
+            )
+        else:
+            await message.answer("🔔 Уведомления о заказах приходят сразу.\nСводка: /digest 15")
+
+@router.message(Command("search_consultations"))
+async def search_consultations(message: types.Message, state: FSMContext):
+    """Поиск консультаций по переписке: /search_consultations пионы на свадьбу.
+
+    Ищет в пределах срока хранения сообщений (TRANSCRIPT_RETENTION_DAYS).
+    """
+    query = message.text.partition(" ")[2].strip()
+    if not query:
+        await message.answer("❌ Формат: /search_consultations пионы на свадьбу")
+        return
+    
+    await state.update_data(consultation_search={"query": query, "after": None})
+    await _send_consultation_search_page(message, message.from_user.id, state)
+
+@router.callback_query(F.data == "consultation_search_next")
+async def search_consultations_next(callback: types.CallbackQuery, state: FSMContext):
+    """Следующая страница результатов поиска"""
+    await _send_consultation_search_page(callback.message, callback.from_user.id, state)
+    await callback.answer()
+
+async def _send_consultation_search_page(message: types.Message, tg_id: int, state: FSMContext):
+    """Отправить страницу результатов поиска и запомнить курсор"""
+    search = (await state.get_data()).get("consultation_search")
+    if not search:
+        await message.answer("❌ Поиск устарел, повторите команду")
+        return
+    
+    async for session in get_session():
+        user, is_admin = await _get_user_and_check_admin(session, tg_id)
+        
+        if not is_admin:
+            await message.answer(t(user.lang if user else "ru", "access_denied"))
+            return
+        
+        after = tuple(search["after"]) if search["after"] else None
+        try:
+            hits = await ConsultationRepository(session).search_consultations(
+                search["query"], limit=SEARCH_PAGE_SIZE + 1, after=after
+            )
+        except Exception as e:
+            print(f"Consultation search error: {e}")
+            await message.answer("❌ Ошибка поиска")
+            return
+        
+        has_more = len(hits) > SEARCH_PAGE_SIZE
+        hits = hits[:SEARCH_PAGE_SIZE]
+        
+        if not hits:
+            await message.answer("🔍 Ничего не найдено" if not after else "🔍 Больше результатов нет")
+            return
+        
+        lines = [f"🔍 <b>{html.escape(search['query'])}</b>\n"]
+        kb_rows = []
+        for hit in hits:
+            started = hit["started_at"].strftime("%d.%m.%Y") if hit["started_at"] else "—"
+            lines.append(
+                f"💬 <b>#{hit['consultation_id']}</b> · {started} · "
+                f"{html.escape(hit['client_name'])} → {html.escape(hit['florist_name'])} "
+                f"({hit['hits']} совп.)\n{hit['snippet']}\n"
+            )
+            kb_rows.append([types.InlineKeyboardButton(
+                text=f"📖 Консультация #{hit['consultation_id']}",
+                callback_data=f"view_consultation_{hit['consultation_id']}"
+            )])
+        
+        if has_more:
+            last = hits[-1]
+            search["after"] = [last["rank"], last["consultation_id"]]
+            await state.update_data(consultation_search=search)
+            kb_rows.append([types.InlineKeyboardButton(text="▶️ Дальше", callback_data="consultation_search_next")])
+        
+        await message.answer(
+            "\n".join(lines),
+            parse_mode="HTML",
+            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
+        )
@@ -1,4 +1,7 @@
 from aiogram import Router, types, F
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 
 from app.database.database import get_session
 from app.services import UserService, CatalogService
@@ -7,6 +10,9 @@ from app.handlers.common import get_user_lang
 
 router = Router()
 
+class CatalogSearchStates(StatesGroup):
+    waiting_query = State()
+
 async def _get_user_and_lang(session, tg_id: int):
     """Получить пользователя и язык через сервис"""
     user_service = UserService(session)
@@ -17,8 +23,12 @@ async def _get_user_and_lang(session, tg_id: int):
         return None, "ru"
 
 @router.callback_query(F.data == "open_catalog")
-async def show_categories(callback: types.CallbackQuery):
+async def show_categories(callback: types.CallbackQuery, state: FSMContext):
     """Показать список категорий"""
+    # Выход из поиска без запроса
+    if await state.get_state() == CatalogSearchStates.waiting_query.state:
+        await state.clear()
+    
     async for session in get_session():
         user, lang = await _get_user_and_lang(session, callback.from_user.id)
         catalog_service = CatalogService(session)
@@ -39,7 +49,11 @@ async def show_categories(callback: types.CallbackQuery):
             callback_data=f"cat_{category.id}"
         )])
     
-    # Добавляем кнопку назад
+    # Популярное, поиск и кнопка назад
+    kb_rows.append([
+        types.InlineKeyboardButton(text=t(lang, "catalog_popular"), callback_data="catalog_popular"),
+        types.InlineKeyboardButton(text=t(lang, "catalog_search"), callback_data="catalog_search")
+    ])
     kb_rows.append([types.InlineKeyboardButton(
         text=t(lang, "back_to_menu"), 
         callback_data="main_menu"
@@ -60,6 +74,7 @@ async def show_products(callback: types.CallbackQuery):
         
         # Получаем товары категории
         products = await catalog_service.get_products_by_category(cat_id)
+        related = await catalog_service.get_related_products(products[0].id) if products else []
         
         # Получаем категорию для названия
         categories = await catalog_service.get_categories()
@@ -78,10 +93,10 @@ async def show_products(callback: types.CallbackQuery):
         return
 
     # Показываем первый товар
-    await show_product_card(callback, products, 0, cat_id, lang)
+    await show_product_card(callback, products, 0, cat_id, lang, related)
 
-async def show_product_card(callback: types.CallbackQuery, products, index, cat_id, lang):
-    """Показать карточку товара"""
+async def show_product_card(callback: types.CallbackQuery, products, index, cat_id, lang, related=()):
+    """Показать карточку товара (related - "Часто берут вместе")"""
     product = products[index]
     
     # Формируем текст карточки (твоя логика)
@@ -107,6 +122,17 @@ async def show_product_card(callback: types.CallbackQuery, products, index, cat_
     if nav_row:
         kb_rows.append(nav_row)
     
+    # Часто берут вместе - готовые пары из product_pairs
+    if related:
+        text += f"\n\n{t(lang, 'often_bought_with')}"
+        kb_rows.append([
+            types.InlineKeyboardButton(
+                text=f"🌸 {item.name_ru if lang == 'ru' else item.name_uz}",
+                callback_data=f"sprod_{item.id}"
+            )
+            for item in related
+        ])
+    
     # Действия
     kb_rows.extend([
         [types.InlineKeyboardButton(text=t(lang, "add_to_cart"), callback_data=f"add_{product.id}")],
@@ -166,12 +192,133 @@ async def navigate_products(callback: types.CallbackQuery):
         
         # Получаем товары заново (TODO: добавить кэширование)
         products = await catalog_service.get_products_by_category(cat_id)
+        related = []
+        if products and index < len(products):
+            related = await catalog_service.get_related_products(products[index].id)
     
     if not products or index >= len(products):
         await callback.answer("Товар не найден")
         return
         
-    await show_product_card(callback, products, index, cat_id, lang)
+    await show_product_card(callback, products, index, cat_id, lang, related)
+    await callback.answer()
+
+@router.callback_query(F.data == "catalog_popular")
+async def show_popular_products(callback: types.CallbackQuery):
+    """Популярные товары по продажам с затуханием"""
+    async for session in get_session():
+        user, lang = await _get_user_and_lang(session, callback.from_user.id)
+        catalog_service = CatalogService(session)
+        products = await catalog_service.get_popular_products(limit=10)
+    
+    currency = t(lang, "currency")
+    kb_rows = [
+        [types.InlineKeyboardButton(
+            text=f"{product.name_ru if lang == 'ru' else product.name_uz} — {product.price} {currency}",
+            callback_data=f"sprod_{product.id}"
+        )]
+        for product in products
+    ]
+    kb_rows.append([types.InlineKeyboardButton(text=t(lang, "back_to_categories"), callback_data="open_catalog")])
+    
+    await callback.message.edit_text(
+        t(lang, "popular_title") if products else t(lang, "no_products"),
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    )
+    await callback.answer()
+
+@router.callback_query(F.data == "catalog_search")
+async def start_catalog_search(callback: types.CallbackQuery, state: FSMContext):
+    """Поиск из экрана каталога: ждем текст запроса"""
+    async for session in get_session():
+        user, lang = await _get_user_and_lang(session, callback.from_user.id)
+    
+    await state.set_state(CatalogSearchStates.waiting_query)
+    await callback.message.edit_text(
+        t(lang, "search_prompt"),
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+            [types.InlineKeyboardButton(text=t(lang, "back_to_categories"), callback_data="open_catalog")]
+        ])
+    )
+    await callback.answer()
+
+@router.message(CatalogSearchStates.waiting_query, F.text)
+async def catalog_search_query(message: types.Message, state: FSMContext):
+    """Текст запроса после кнопки поиска"""
+    await state.clear()
+    await _send_search_results(message, message.text.strip())
+
+@router.message(Command("search"))
+async def search_command(message: types.Message, state: FSMContext):
+    """Поиск товаров командой: /search розы"""
+    query = message.text.partition(" ")[2].strip()
+    if not query:
+        await state.set_state(CatalogSearchStates.waiting_query)
+        async for session in get_session():
+            user, lang = await _get_user_and_lang(session, message.from_user.id)
+        await message.answer(t(lang, "search_prompt"))
+        return
+    
+    await _send_search_results(message, query)
+
+async def _send_search_results(message: types.Message, query: str):
+    """Найти товары и показать их кнопками"""
+    async for session in get_session():
+        user, lang = await _get_user_and_lang(session, message.from_user.id)
+        catalog_service = CatalogService(session)
+        
+        try:
+            products = await catalog_service.search_products(query, lang, limit=10)
+        except Exception as e:
+            print(f"Product search error: {e}")
+            products = []
+    
+    back_row = [types.InlineKeyboardButton(text=t(lang, "back_to_categories"), callback_data="open_catalog")]
+    
+    if not products:
+        await message.answer(
+            t(lang, "search_no_results", query=query),
+            reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[
+                [types.InlineKeyboardButton(text=t(lang, "catalog_search"), callback_data="catalog_search")],
+                back_row
+            ])
+        )
+        return
+    
+    currency = t(lang, "currency")
+    kb_rows = [
+        [types.InlineKeyboardButton(
+            text=f"{product.name_ru if lang == 'ru' else product.name_uz} — {product.price} {currency}",
+            callback_data=f"sprod_{product.id}"
+        )]
+        for product in products
+    ]
+    kb_rows.append(back_row)
+    
+    await message.answer(
+        t(lang, "search_results", query=query),
+        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    )
+
+@router.callback_query(F.data.startswith("sprod_"))
+async def show_found_product(callback: types.CallbackQuery):
+    """Карточка найденного товара с навигацией по его категории"""
+    product_id = int(callback.data.split("_")[1])
+    
+    async for session in get_session():
+        user, lang = await _get_user_and_lang(session, callback.from_user.id)
+        catalog_service = CatalogService(session)
+        
+        try:
+            product = await catalog_service.get_product(product_id)
+            products = await catalog_service.get_products_by_category(product.category_id)
+            related = await catalog_service.get_related_products(product_id)
+        except Exception:
+            await callback.answer("Товар не найден")
+            return
+    
+    index = next((i for i, p in enumerate(products) if p.id == product_id), 0)
+    await show_product_card(callback, products, index, product.category_id, lang, related)
     await callback.answer()
 
 @router.callback_query(F.data == "goto_checkout")
@@ -4,17 +4,22 @@ from aiogram import Router, types, F
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from decimal import Decimal
-from datetime import datetime, timedelta
-import calendar
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 
 from app.database.database import get_session
-from app.services import UserService, CatalogService, OrderService, NotificationService
+from app.services import CatalogService, OrderService
 from app.schemas.order import OrderCreate
 from app.utils.cart import get_cart, clear_cart
 from app.utils.validators import validate_phone, validate_address
+from app.utils.calendar_kb import calendar_keyboard
+from app.services.delivery_zones import delivery_zones
+from app.services.order_assignment import order_assigner
+from app.services.delivery_slots import (
+    SLOT_PERIODS, slot_availability, slot_start, period_for_time, period_label
+)
 from app.translate import t
-from app.exceptions import ProductNotFoundError, ValidationError
+from app.exceptions import ProductNotFoundError, ValidationError, SlotUnavailableError
 from app.models import RoleEnum
 
 router = Router()
@@ -54,6 +59,7 @@ async def checkout_start(callback: types.CallbackQuery, state: FSMContext):
 
     await state.clear()
     await state.set_state(Checkout.ASK_ADDRESS)
+    await state.update_data(lang=lang)
     
     # УПРОЩЕННЫЙ ЗАПРОС АДРЕСА - все в одном сообщении
     kb = types.ReplyKeyboardMarkup(
@@ -87,7 +93,24 @@ async def process_location(message: types.Message, state: FSMContext):
     async for session in get_session():
         user, lang = await _get_user_and_lang(session, message.from_user.id)
 
-    await state.update_data(address=address, latitude=lat, longitude=lon)
+    # Зона доставки по сеточному индексу - без запроса к БД
+    zone_index = await delivery_zones.get_index()
+    zone = zone_index.locate(lat, lon)
+    if zone_index.zones and zone is None:
+        await message.answer(
+            "😔 <b>По этому адресу мы пока не доставляем</b>\n\n"
+            "Отправьте другую геопозицию или напишите адрес текстом.",
+            parse_mode="HTML"
+        )
+        return
+
+    await state.update_data(
+        address=address,
+        latitude=lat,
+        longitude=lon,
+        delivery_zone_id=zone.id if zone else None,
+        delivery_fee=str(zone.fee) if zone else None
+    )
     await _proceed_to_phone(message, state, user)
 
 @router.message(Checkout.ASK_ADDRESS, F.text)
@@ -172,13 +195,29 @@ async def process_phone(message: types.Message, state: FSMContext):
     await state.update_data(phone=phone)
     await _ask_delivery_date_message(message, state)
 
+def _earliest_delivery_date() -> date:
+    """Первая дата, доступная для доставки"""
+    return date.today()
+
+async def _delivery_calendar(state: FSMContext, year: int = None, month: int = None):
+    """Клавиатура календаря - язык берем из FSM, без обращения к БД"""
+    data = await state.get_data()
+    availability = await slot_availability.get()
+    earliest = _earliest_delivery_date()
+    return calendar_keyboard(
+        year or earliest.year,
+        month or earliest.month,
+        data.get("lang", "ru"),
+        earliest,
+        availability.fully_booked
+    )
+
 async def _ask_delivery_date(callback: types.CallbackQuery, state: FSMContext):
     """Показать календарь для выбора даты"""
     await state.set_state(Checkout.ASK_DATE)
     
-    # Создаем календарь на текущий месяц
-    now = datetime.now()
-    cal_kb = _create_calendar(now.year, now.month)
+    # Календарь на месяц первой доступной даты
+    cal_kb = await _delivery_calendar(state)
     
     await callback.message.edit_text(
         "📅 Выберите дату доставки:",
@@ -190,77 +229,19 @@ async def _ask_delivery_date_message(message: types.Message, state: FSMContext):
     """Показать календарь для выбора даты (для message)"""
     await state.set_state(Checkout.ASK_DATE)
     
-    # Создаем календарь на текущий месяц
-    now = datetime.now()
-    cal_kb = _create_calendar(now.year, now.month)
+    # Календарь на месяц первой доступной даты
+    cal_kb = await _delivery_calendar(state)
     
     await message.answer(
         "📅 Выберите дату доставки:",
         reply_markup=cal_kb
     )
 
-def _create_calendar(year: int, month: int):
-    """Создать календарь на месяц"""
-    cal = calendar.monthcalendar(year, month)
-    month_name = calendar.month_name[month]
-    
-    kb_rows = []
-    
-    # Заголовок месяца
-    kb_rows.append([types.InlineKeyboardButton(
-        text=f"{month_name} {year}",
-        callback_data="ignore"
-    )])
-    
-    # Дни недели
-    kb_rows.append([
-        types.InlineKeyboardButton(text="Пн", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Вт", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Ср", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Чт", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Пт", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Сб", callback_data="ignore"),
-        types.InlineKeyboardButton(text="Вс", callback_data="ignore"),
-    ])
-    
-    # Дни месяца
-    today = datetime.now().date()
-    for week in cal:
-        week_row = []
-        for day in week:
-            if day == 0:
-                week_row.append(types.InlineKeyboardButton(text=" ", callback_data="ignore"))
-            else:
-                date_obj = datetime(year, month, day).date()
-                if date_obj < today:
-                    # Прошедшие дни
-                    week_row.append(types.InlineKeyboardButton(text=" ", callback_data="ignore"))
-                else:
-                    # Доступные дни
-                    week_row.append(types.InlineKeyboardButton(
-                        text=str(day),
-                        callback_data=f"date_{year}_{month}_{day}"
-                    ))
-        kb_rows.append(week_row)
-    
-    # Навигация по месяцам
-    prev_month = month - 1 if month > 1 else 12
-    prev_year = year if month > 1 else year - 1
-    next_month = month + 1 if month < 12 else 1
-    next_year = year if month < 12 else year + 1
-    
-    kb_rows.append([
-        types.InlineKeyboardButton(text="◀️", callback_data=f"cal_{prev_year}_{prev_month}"),
-        types.InlineKeyboardButton(text="▶️", callback_data=f"cal_{next_year}_{next_month}")
-    ])
-    
-    return types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
-
 @router.callback_query(F.data.startswith("cal_"))
 async def change_calendar_month(callback: types.CallbackQuery, state: FSMContext):
     """Смена месяца в календаре"""
     _, year, month = callback.data.split("_")
-    cal_kb = _create_calendar(int(year), int(month))
+    cal_kb = await _delivery_calendar(state, int(year), int(month))
     
     await callback.message.edit_text(
         "📅 Выберите дату доставки:",
@@ -274,35 +255,60 @@ async def select_date(callback: types.CallbackQuery, state: FSMContext):
     _, year, month, day = callback.data.split("_")
     selected_date = datetime(int(year), int(month), int(day)).date()
     
+    # Кнопка из старого сообщения - дата могла уже пройти или заполниться
+    availability = await slot_availability.get()
+    free_periods = availability.free_periods(selected_date)
+    if selected_date < _earliest_delivery_date() or not free_periods:
+        await callback.answer("❌ Дата недоступна", show_alert=True)
+        await callback.message.edit_reply_markup(reply_markup=await _delivery_calendar(state))
+        return
+    
     await state.update_data(delivery_date=selected_date.isoformat())
     await state.set_state(Checkout.ASK_TIME)
     
-    # Показываем выбор времени
-    time_kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="🌅 09:00-12:00", callback_data="time_morning")],
-        [types.InlineKeyboardButton(text="🌞 12:00-15:00", callback_data="time_day")],
-        [types.InlineKeyboardButton(text="🌇 15:00-18:00", callback_data="time_evening")],
-        [types.InlineKeyboardButton(text="🌃 18:00-21:00", callback_data="time_night")],
-        [types.InlineKeyboardButton(text="🕐 Указать точное время", callback_data="time_exact")]
-    ])
-    
+    # Показываем выбор времени - только периоды со свободными местами
     date_str = selected_date.strftime("%d.%m.%Y")
     await callback.message.edit_text(
         f"✅ Дата: {date_str}\n\n🕐 Выберите время доставки:",
-        reply_markup=time_kb
+        reply_markup=_time_keyboard(frozenset(free_periods))
     )
     await callback.answer()
 
+def _time_keyboard(free_periods: frozenset) -> types.InlineKeyboardMarkup:
+    """Клавиатура периодов доставки - новая разметка из кэшированных строк"""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=text, callback_data=data)]
+        for text, data in _time_rows(free_periods)
+    ])
+
+@lru_cache(maxsize=16)
+def _time_rows(free_periods: frozenset) -> tuple:
+    """Кнопки (текст, callback_data) по свободным периодам"""
+    icons = {"morning": "🌅", "day": "🌞", "evening": "🌇", "night": "🌃"}
+    rows = tuple(
+        (f"{icons.get(period, '🕐')} {period_label(period)}", f"time_{period}")
+        for period in SLOT_PERIODS if period in free_periods
+    )
+    return rows + (("🕐 Указать точное время", "time_exact"),)
+
+async def _set_delivery_slot(state: FSMContext, period: str, delivery_time: str) -> bool:
+    """Запомнить слот, если в нем есть места"""
+    data = await state.get_data()
+    delivery_date = date.fromisoformat(data["delivery_date"])
+    
+    availability = await slot_availability.get()
+    if not availability.is_free(delivery_date, period):
+        return False
+    
+    await state.update_data(
+        delivery_time=delivery_time,
+        slot_at=slot_start(delivery_date, period).isoformat()
+    )
+    return True
+
 @router.callback_query(F.data.startswith("time_"))
 async def select_time(callback: types.CallbackQuery, state: FSMContext):
     """Выбор времени"""
-    time_periods = {
-        "time_morning": "09:00-12:00",
-        "time_day": "12:00-15:00", 
-        "time_evening": "15:00-18:00",
-        "time_night": "18:00-21:00"
-    }
-    
     if callback.data == "time_exact":
         await callback.message.edit_text(
             "🕐 Введите точное время доставки:\n\n"
@@ -311,8 +317,15 @@ async def select_time(callback: types.CallbackQuery, state: FSMContext):
         await callback.answer()
         return
     
-    time_slot = time_periods[callback.data]
-    await state.update_data(delivery_time=time_slot)
+    period = callback.data.replace("time_", "", 1)
+    if period not in SLOT_PERIODS:
+        await callback.answer()
+        return
+    
+    if not await _set_delivery_slot(state, period, period_label(period)):
+        await callback.answer("❌ На это время мест нет, выберите другое", show_alert=True)
+        return
+    
     await _show_order_confirmation(callback, state)
 
 @router.message(Checkout.ASK_TIME)
@@ -322,11 +335,22 @@ async def process_exact_time(message: types.Message, state: FSMContext):
     
     # Простая валидация формата времени
     try:
-        datetime.strptime(time_text, "%H:%M")
-        await state.update_data(delivery_time=time_text)
-        await _show_order_confirmation_message(message, state)
+        exact_time = datetime.strptime(time_text, "%H:%M").time()
     except ValueError:
         await message.answer("❌ Неверный формат времени. Пример: 14:30")
+        return
+    
+    period = period_for_time(exact_time)
+    if period is None:
+        first, last = min(SLOT_PERIODS.values())[0], max(SLOT_PERIODS.values())[1]
+        await message.answer(f"❌ Доставка с {first:02d}:00 до {last:02d}:00")
+        return
+    
+    if not await _set_delivery_slot(state, period, time_text):
+        await message.answer("❌ На это время мест нет, выберите другое")
+        return
+    
+    await _show_order_confirmation_message(message, state)
 
 async def _show_order_confirmation(callback: types.CallbackQuery, state: FSMContext):
     """Показать подтверждение заказа"""
@@ -384,10 +408,19 @@ async def _show_confirmation_logic(message, state: FSMContext, user_id: int, is_
     delivery_date = data.get('delivery_date', 'не указана')
     delivery_time = data.get('delivery_time', 'не указано')
     
+    # Доставка по зоне (только для геопозиции)
+    delivery_text = ""
+    zone = await delivery_zones.get(data["delivery_zone_id"]) if data.get("delivery_zone_id") else None
+    if zone:
+        delivery_text = (
+            f"🚚 <b>Доставка:</b> {zone.name(lang)} — {zone.fee} сум, ~{zone.eta_minutes} мин\n"
+            f"💳 <b>К оплате: {total + zone.fee} сум</b>\n\n"
+        )
+    
     text = (
         f"📋 <b>Подтверждение заказа</b>\n\n"
         f"🛍 <b>Товары:</b>\n" + "\n".join(lines) + 
-        f"\n\n💰 <b>Итого: {total} сум</b>\n\n"
+        f"\n\n💰 <b>Итого: {total} сум</b>\n" + delivery_text + "\n"
         f"📍 <b>Адрес:</b> {data['address']}\n"
         f"📞 <b>Телефон:</b> {data['phone']}\n"
         f"📅 <b>Дата:</b> {delivery_date}\n"
@@ -438,14 +471,16 @@ async def create_order(callback: types.CallbackQuery, state: FSMContext):
             delivery_time = data.get('delivery_time', '')
             comment = f"Доставка: {delivery_date} в {delivery_time}"
             
-            if 'latitude' in data and 'longitude' in data:
-                comment += f"\nКоординаты: {data['latitude']}, {data['longitude']}"
-            
             order_data = OrderCreate(
                 user_id=user.id,
                 address=data["address"],
                 phone=data["phone"],
-                comment=comment
+                comment=comment,
+                slot_at=datetime.fromisoformat(data["slot_at"]) if data.get("slot_at") else None,
+                latitude=data.get("latitude"),
+                longitude=data.get("longitude"),
+                delivery_zone_id=data.get("delivery_zone_id"),
+                delivery_fee=Decimal(data["delivery_fee"]) if data.get("delivery_fee") else None
             )
             
             order = await order_service.create_order(
@@ -455,12 +490,14 @@ async def create_order(callback: types.CallbackQuery, state: FSMContext):
             )
             
             await session.commit()
+            if order.slot_at:
+                slot_availability.invalidate()
             
             # Очищаем корзину
             clear_cart(callback.from_user.id)
             
-            # Уведомляем флористов и отправляем в канал
-            await _notify_about_new_order(callback.bot, order, session, lang)
+            # Предлагаем заказ наименее загруженному флористу
+            order_assigner.kick(callback.bot)
             
             await callback.message.edit_text(
                 f"✅ <b>Заказ создан!</b>\n\n"
@@ -472,109 +509,23 @@ async def create_order(callback: types.CallbackQuery, state: FSMContext):
                 parse_mode="HTML"
             )
             
+        except SlotUnavailableError:
+            # Пока клиент оформлял, слот заполнился - выбираем дату заново
+            slot_availability.invalidate()
+            await state.set_state(Checkout.ASK_DATE)
+            await callback.message.edit_text(
+                "❌ Выбранное время уже занято.\n\n📅 Выберите дату доставки:",
+                reply_markup=await _delivery_calendar(state)
+            )
+            await callback.answer()
+            return
+            
         except Exception as e:
             await callback.message.edit_text(f"❌ Ошибка создания заказа: {str(e)}")
             
     await state.clear()
     await callback.answer()
 
-async def _notify_about_new_order(bot, order, session, lang):
-    """Уведомить флористов о новом заказе"""
-    try:
-        # СНАЧАЛА получаем заказ с полными данными (включая items)
-        from app.services import OrderService
-        order_service = OrderService(session)
-        
-        # Получаем заказ с загруженными связями
-        full_order = await order_service.get_order_with_details(order.id)
-        
-        # Уведомляем в личные сообщения
-        notification_service = NotificationService(bot)
-        user_service = UserService(session)
-        
-        florists = await user_service.user_repo.get_by_role(RoleEnum.florist)
-        owners = await user_service.user_repo.get_by_role(RoleEnum.owner)
-        all_florists = florists + owners
-        
-        print(f"📧 Отправляем уведомления {len(all_florists)} флористам")
-        
-        if all_florists:
-            await notification_service.notify_florists_about_order(all_florists, full_order, lang)
-        
-        # Отправляем в канал флористов
-        from app.config import settings
-        if settings.FLORIST_CHANNEL_ID:
-            print(f"📢 Отправляем в канал {settings.FLORIST_CHANNEL_ID}")
-            await _send_order_to_channel(bot, full_order, settings.FLORIST_CHANNEL_ID)
-        else:
-            print("⚠️ FLORIST_CHANNEL_ID не настроен")
-            
-    except Exception as e:
-        print(f"❌ Notification error: {e}")
-        import traceback
-        traceback.print_exc()
-
-async def _send_order_to_channel(bot, order, channel_id):
-    """Отправить заказ в канал флористов С ПОДРОБНОСТЯМИ"""
-    try:
-        # Проверяем настройки канала
-        if not channel_id:
-            print("⚠️ FLORIST_CHANNEL_ID не настроен в .env")
-            return
-            
-        if not channel_id.startswith("-"):
-            print(f"⚠️ Неверный формат FLORIST_CHANNEL_ID: {channel_id}")
-            return
-        
-        # Получаем детали заказа
-        user_name = getattr(order.user, 'first_name', 'Неизвестно') or 'Неизвестно'
-        phone = order.phone or 'Не указан'
-        address = order.address or 'Не указан'
-        comment = order.comment or 'Нет'
-        
-        # ПОЛУЧАЕМ СОСТАВ ЗАКАЗА - ИСПРАВЛЕННАЯ ЛОГИКА
-        order_items = []
-        try:
-            if hasattr(order, 'items') and order.items:
-                for item in order.items:
-                    if hasattr(item, 'product') and item.product:
-                        order_items.append(f"• {item.product.name_ru} × {item.qty}")
-                    else:
-                        order_items.append(f"• Товар ID:{item.product_id} × {item.qty}")
-        except Exception as e:
-            print(f"Error getting order items for channel: {e}")
-        
-        items_text = "\n".join(order_items) if order_items else "Состав недоступен"
-        
-        text = (
-            f"🆕 <b>Новый заказ #{order.id}</b>\n\n"
-            f"👤 <b>Клиент:</b> {user_name}\n"
-            f"📞 <b>Телефон:</b> {phone}\n"
-            f"📍 <b>Адрес:</b> {address}\n"
-            f"💰 <b>Сумма:</b> {order.total_price} сум\n"
-            f"🗓 <b>Создан:</b> {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"🛍 <b>Состав:</b>\n{items_text}\n\n"
-            f"💬 <b>Комментарий:</b> {comment}"
-        )
-        
-        kb = types.InlineKeyboardMarkup(inline_keyboard=[
-            [types.InlineKeyboardButton(text="✅ Принять в работу", callback_data=f"accept_order_{order.id}")],
-            [types.InlineKeyboardButton(text="❌ Отменить заказ", callback_data=f"cancel_order_{order.id}")]
-        ])
-        
-        await bot.send_message(
-            chat_id=int(channel_id),
-            text=text,
-            reply_markup=kb,
-            parse_mode="HTML"
-        )
-        print(f"✅ Заказ #{order.id} отправлен в канал {channel_id}")
-        
-    except Exception as e:
-        print(f"❌ Ошибка отправки в канал {channel_id}: {e}")
-        import traceback
-        traceback.print_exc()
-
 @router.callback_query(Checkout.CONFIRM, F.data == "confirm_cancel")
 async def cancel_confirm(callback: types.CallbackQuery, state: FSMContext):
     """Отмена подтверждения заказа"""
@@ -602,7 +553,7 @@ async def ignore_callback(callback: types.CallbackQuery):
 
 @router.callback_query(F.data.startswith("accept_order_"))
 async def florist_accept_order_from_channel(callback: types.CallbackQuery):
-    """Флорист принимает заказ ИЗ КАНАЛА"""
+    """Флорист принимает заказ из канала или из личного предложения"""
     try:
         order_id = int(callback.data.split("_")[2])
     except (IndexError, ValueError):
@@ -611,6 +562,7 @@ async def florist_accept_order_from_channel(callback: types.CallbackQuery):
     
     async for session in get_session():
         from app.services import OrderService, NotificationService
+        from app.repositories import FloristRepository
         order_service = OrderService(session)
         
         # Получаем информацию о пользователе
@@ -619,20 +571,21 @@ async def florist_accept_order_from_channel(callback: types.CallbackQuery):
             await callback.answer("❌ Пользователь не найден", show_alert=True)
             return
         
+        if user.role not in [RoleEnum.florist, RoleEnum.owner]:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+        
         try:
-            # Получаем заказ
-            order = await order_service.get_order_with_details(order_id)
-            
-            # Проверяем что заказ еще можно принять
-            from app.models import OrderStatusEnum
-            if order.status not in [OrderStatusEnum.new, OrderStatusEnum.await_florist]:
+            # Условный UPDATE: из канала и из предложения заказ достанется одному
+            if not await order_service.order_repo.claim(order_id, user.id):
                 await callback.answer("❌ Заказ уже обработан", show_alert=True)
+                await callback.message.edit_reply_markup(reply_markup=None)
                 return
-            
-            # Обновляем статус заказа
-            updated_order = await order_service.update_order_status(order_id, OrderStatusEnum.accepted)
+            await FloristRepository(session).update_last_seen(user.id)
             await session.commit()
             
+            order = await order_service.get_order_with_details(order_id)
+            
             # Обновляем сообщение в канале
             user_name = f"{user.first_name} {user.last_name or ''}".strip()
             await callback.message.edit_text(
@@ -641,10 +594,9 @@ async def florist_accept_order_from_channel(callback: types.CallbackQuery):
                 reply_markup=None  # Убираем кнопки
             )
             
-            # Уведомляем других флористов и владельцев
+            # Владельцам - кто принял; остальные флористы заказ не получали
             notification_service = NotificationService(callback.bot)
-            await notification_service.notify_order_status_change(order, "accepted", user, lang)
-            await notification_service.hide_order_from_other_florists(order_id, user)
+            await notification_service.notify_order_status_change(order, "accepted", user, lang, notify_florists=False)
             
             await callback.answer("✅ Заказ принят в работу")
             
@@ -652,6 +604,27 @@ async def florist_accept_order_from_channel(callback: types.CallbackQuery):
             print(f"Accept order error: {e}")
             await callback.answer(f"❌ Ошибка: {str(e)}", show_alert=True)
 
+@router.callback_query(F.data.startswith("decline_offer_"))
+async def florist_decline_offer(callback: types.CallbackQuery):
+    """Флорист отказывается от предложенного заказа - он уходит следующему"""
+    try:
+        order_id = int(callback.data.split("_")[2])
+    except (IndexError, ValueError):
+        await callback.answer("❌ Неверный формат команды", show_alert=True)
+        return
+    
+    async for session in get_session():
+        user, lang = await _get_user_and_lang(session, callback.from_user.id)
+        if not user or user.role not in [RoleEnum.florist, RoleEnum.owner]:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+    
+    if await order_assigner.decline(order_id, user.id):
+        order_assigner.kick(callback.bot)
+    
+    await callback.message.edit_text(f"↪️ Вы отказались от заказа #{order_id}")
+    await callback.answer()
+
 @router.callback_query(F.data.startswith("cancel_order_") & F.message.chat.type.in_(["channel", "supergroup"]))
 async def florist_cancel_order_from_channel(callback: types.CallbackQuery):
     """Флорист отменяет заказ ИЗ КАНАЛА"""
@@ -684,6 +657,8 @@ async def florist_cancel_order_from_channel(callback: types.CallbackQuery):
             # Обновляем статус заказа
             updated_order = await order_service.update_order_status(order_id, OrderStatusEnum.canceled)
             await session.commit()
+            if updated_order.slot_at:
+                slot_availability.invalidate()
             
             # Обновляем сообщение в канале
             user_name = f"{user.first_name} {user.last_name or ''}".strip()
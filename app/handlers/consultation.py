@@ -1,37 +1,36 @@
 from aiogram import Router, types, F
+from aiogram.exceptions import TelegramRetryAfter
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.storage.base import StorageKey
-from sqlalchemy import select, and_, delete 
+from sqlalchemy import select, and_
 
 from app.database.database import get_session
 from app.services import UserService, FloristService, ConsultationService
-from app.models import (
-    RoleEnum, ConsultationStatusEnum, Consultation, 
-    ConsultationMessage, ConsultationBuffer, FloristReview
-)
+from app.repositories import ConsultationRepository, FloristRepository
+from app.models import RoleEnum, ConsultationStatusEnum, Consultation
 from app.translate import t
 from app.exceptions import ValidationError, UserNotFoundError
+import asyncio
+from typing import Dict
 import logging
 from datetime import datetime, timedelta
 import os
 from app.config import settings
+from app.services.consultation_buffer import ConsultationBufferService
+from app.utils.message_packing import pack_messages
+from app.services.consultation_relay import (
+    participants_cache, message_writer, album_collector, finish_consultation, flush_consultation,
+    extract_content, build_input_media, CAPTION_CONTENT_TYPES
+)
 
-# ✅ ИСПРАВЛЕНО: Правильный импорт архивного сервиса
-try:
-    from app.services.ai_archive_service import AIArchiveService
-except ImportError:
-    # Если сервис не готов, создаем заглушку
-    class AIArchiveService:
-        def __init__(self, bot):
-            self.bot = bot
-        async def archive_consultation_to_channel(self, consultation_id):
-            return None
-        async def restore_consultation_from_archive(self, chat_id, archive_id):
-            return False
+from app.services.ai_archive_service import AIArchiveService, archive_queue
 
 ARCHIVE_CHANNEL_ID = os.getenv("ARCHIVE_CHANNEL_ID")
 
+# Консультации с недоставленным буфером: id -> сколько отправок уже прошло
+_buffer_delivery_progress: Dict[int, int] = {}
+
 router = Router()
 
 class ConsultationStates(StatesGroup):
@@ -185,8 +184,7 @@ async def select_florist(callback: types.CallbackQuery, state: FSMContext):
                 )
             )
             for old_consult in old_consultations.scalars():
-                old_consult.status = ConsultationStatusEnum.expired
-                old_consult.completed_at = datetime.utcnow()
+                finish_consultation(old_consult, ConsultationStatusEnum.expired)
             
             await session.commit()
             
@@ -258,7 +256,7 @@ async def select_florist(callback: types.CallbackQuery, state: FSMContext):
 
 @router.message(ConsultationStates.CHATTING)
 async def handle_consultation_message(message: types.Message, state: FSMContext):
-    """✅ ИСПРАВЛЕННАЯ обработка сообщений в активной консультации"""
+    """Пересылка сообщений в активной консультации (быстрый путь)"""
     data = await state.get_data()
     consultation_id = data.get('consultation_id')
     
@@ -267,60 +265,120 @@ async def handle_consultation_message(message: types.Message, state: FSMContext)
         await state.clear()
         return
     
-    async for session in get_session():
-        user, lang = await _get_user_and_lang(session, message.from_user.id)
+    try:
+        # ✅ Участники из кэша - без запросов к БД на каждое сообщение
+        participants = participants_cache.get(consultation_id)
+        if not participants:
+            async for session in get_session():
+                participants = await participants_cache.load(session, consultation_id)
         
-        try:
-            consultation = await session.get(Consultation, consultation_id)
-            
-            if not consultation or consultation.status != ConsultationStatusEnum.active:
-                await message.answer("❌ Консультация неактивна")
-                await state.clear()
-                return
-            
-            await session.refresh(consultation, ['client', 'florist'])
-            
-            # ✅ ОПРЕДЕЛЯЕМ получателя
-            if user.id == consultation.client_id:
-                recipient_tg_id = consultation.florist.tg_id
-                sender_name = consultation.client.first_name
-            elif user.id == consultation.florist_id:
-                recipient_tg_id = consultation.client.tg_id
-                sender_name = consultation.florist.first_name
-            else:
-                await message.answer("❌ Вы не участвуете в этой консультации")
-                return
-            
-            # ✅ СОХРАНЯЕМ сообщение в БД
-            consultation_msg = ConsultationMessage(
-                consultation_id=consultation_id,
-                sender_id=user.id,
-                message_text=message.text or "",
-                photo_file_id=message.photo[-1].file_id if message.photo else None
+        if not participants:
+            await message.answer("❌ Консультация неактивна")
+            await state.clear()
+            return
+        
+        resolved = participants.resolve(message.from_user.id)
+        if not resolved:
+            await message.answer("❌ Вы не участвуете в этой консультации")
+            return
+        
+        sender_id, sender_name, recipient_tg_id = resolved
+        
+        # ✅ Недоставленный при принятии буфер - повторяем с сообщением флориста
+        if consultation_id in _buffer_delivery_progress and str(message.from_user.id) == participants.florist_tg_id:
+            async for session in get_session():
+                await _deliver_buffered_messages_to_florist(
+                    message.bot, consultation_id, session, participants.florist_tg_id
+                )
+        
+        # ✅ Альбом собираем целиком и отправляем одним send_media_group
+        if message.media_group_id:
+            album_collector.add(
+                message,
+                lambda messages: _relay_album(
+                    messages, consultation_id, sender_id, sender_name, recipient_tg_id
+                ),
+                owner=consultation_id
             )
-            session.add(consultation_msg)
-            await session.commit()
-            
-            # ✅ ПЕРЕСЫЛАЕМ сообщение
-            try:
-                if message.photo:
-                    await message.bot.send_photo(
-                        chat_id=int(recipient_tg_id),
-                        photo=message.photo[-1].file_id,
-                        caption=f"💬 {sender_name}: {message.caption or ''}"
-                    )
-                else:
-                    await message.bot.send_message(
-                        chat_id=int(recipient_tg_id),
-                        text=f"💬 {sender_name}: {message.text}"
-                    )
-            except Exception as e:
-                print(f"Error forwarding message: {e}")
-                await message.answer("❌ Ошибка доставки сообщения")
-                
+            return
+        
+        # ✅ СНАЧАЛА пересылаем
+        try:
+            await _relay_single_message(message, sender_name, recipient_tg_id)
         except Exception as e:
-            print(f"Consultation message error: {e}")
-            await message.answer("❌ Ошибка обработки сообщения")
+            print(f"Error forwarding message: {e}")
+            await message.answer("❌ Ошибка доставки сообщения")
+        
+        # ✅ ПОТОМ сохраняем через буфер записи (пачками)
+        _store_relayed_message(consultation_id, sender_id, message)
+            
+    except Exception as e:
+        print(f"Consultation message error: {e}")
+        await message.answer("❌ Ошибка обработки сообщения")
+
+async def _relay_single_message(message: types.Message, sender_name: str, recipient_tg_id: str):
+    """Переслать одно сообщение любого типа"""
+    content_type, _ = extract_content(message)
+    chat_id = int(recipient_tg_id)
+    
+    if content_type == "text":
+        await message.bot.send_message(chat_id=chat_id, text=f"💬 {sender_name}: {message.text}")
+    elif content_type in CAPTION_CONTENT_TYPES:
+        await message.bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=message.chat.id,
+            message_id=message.message_id,
+            caption=f"💬 {sender_name}: {message.caption or ''}"
+        )
+    else:
+        # Стикеры, кружки, геолокация - подпись не поддерживается
+        await message.bot.copy_message(
+            chat_id=chat_id,
+            from_chat_id=message.chat.id,
+            message_id=message.message_id
+        )
+
+async def _relay_album(messages, consultation_id: int, sender_id: int, sender_name: str, recipient_tg_id: str):
+    """Переслать альбом одним send_media_group"""
+    caption = next((m.caption for m in messages if m.caption), "")
+    
+    media = []
+    for msg in messages:
+        content_type, file_id = extract_content(msg)
+        item = build_input_media(
+            content_type, file_id,
+            caption=f"💬 {sender_name}: {caption}" if not media else None
+        )
+        if item is None:
+            media = None
+            break
+        media.append(item)
+    
+    try:
+        if media:
+            await messages[0].bot.send_media_group(chat_id=int(recipient_tg_id), media=media)
+        else:
+            for msg in messages:
+                await _relay_single_message(msg, sender_name, recipient_tg_id)
+    except Exception as e:
+        print(f"Error forwarding album: {e}")
+        await messages[0].answer("❌ Ошибка доставки альбома")
+    
+    for msg in messages:
+        _store_relayed_message(consultation_id, sender_id, msg)
+
+def _store_relayed_message(consultation_id: int, sender_id: int, message: types.Message):
+    """Поставить сообщение в буфер записи: только текст, file_id и тип"""
+    content_type, file_id = extract_content(message)
+    message_writer.add(
+        consultation_id,
+        sender_id,
+        message_text=message.text or message.caption or "",
+        content_type=content_type,
+        file_id=file_id,
+        photo_file_id=file_id if content_type == "photo" else None,
+        media_group_id=message.media_group_id
+    )
 
 @router.callback_query(F.data.startswith("end_consultation_"))
 async def end_consultation(callback: types.CallbackQuery, state: FSMContext):
@@ -344,23 +402,15 @@ async def end_consultation(callback: types.CallbackQuery, state: FSMContext):
                 return
             
             # Завершаем консультацию
-            consultation.status = ConsultationStatusEnum.completed
-            consultation.completed_at = datetime.utcnow()
+            finish_consultation(consultation, ConsultationStatusEnum.completed)
             await session.commit()
             
-            # ✅ АРХИВИРУЕМ консультацию
-            try:
-                ai_service = AIArchiveService(callback.bot)
-                archive_id = await ai_service.archive_consultation_to_channel(consultation.id)
-                
-                if archive_id:
-                    consultation.archive_id = archive_id
-                    await session.commit()
-                    print(f"✅ Consultation {consultation.id} archived with ID: {archive_id}")
-                else:
-                    print(f"❌ Failed to archive consultation {consultation.id}")
-            except Exception as e:
-                print(f"Archive error: {e}")
+            # ✅ Дописываем буфер сообщений до архивации
+            _buffer_delivery_progress.pop(consultation_id, None)
+            await flush_consultation(consultation_id)
+            
+            # ✅ АРХИВИРУЕМ консультацию в фоне - завершение не ждет архива
+            archive_queue.enqueue(consultation.id)
 
             # ✅ ОЧИЩАЕМ состояние
             await state.clear()
@@ -455,13 +505,15 @@ async def handle_waiting_messages(message: types.Message, state: FSMContext):
                 return
             
             # ✅ СОХРАНЯЕМ сообщение в буфер
-            buffer_msg = ConsultationBuffer(
-                consultation_id=consultation_id,
-                sender_id=user.id,
-                message_text=message.text or "",
-                photo_file_id=message.photo[-1].file_id if message.photo else None
+            buffer_service = ConsultationBufferService(session)
+            await buffer_service.add_message(
+                consultation_id,
+                user.id,
+                message_text=message.text or message.caption or "",
+                photo_file_id=message.photo[-1].file_id if message.photo else None,
+                sender_name=user.first_name,
+                expires_at=consultation.expires_at
             )
-            session.add(buffer_msg)
             await session.commit()
             
             # ✅ ПОДТВЕРЖДЕНИЕ сохранения
@@ -472,7 +524,7 @@ async def handle_waiting_messages(message: types.Message, state: FSMContext):
             await message.answer("❌ Ошибка сохранения сообщения")
 
 @router.callback_query(F.data.startswith("accept_consultation_"))
-async def accept_consultation_handler(callback: types.CallbackQuery):
+async def accept_consultation_handler(callback: types.CallbackQuery, state: FSMContext):
     """✅ ПРИНЯТИЕ консультации флористом"""
     consultation_id = int(callback.data.split("_")[2])
     
@@ -487,8 +539,26 @@ async def accept_consultation_handler(callback: types.CallbackQuery):
             
             await session.refresh(consultation, ['client', 'florist'])
             
+            # ✅ Кэшируем участников для быстрой пересылки
+            participants_cache.put(consultation)
+            
+            # ✅ Флорист тоже переходит в режим чата
+            await state.set_state(ConsultationStates.CHATTING)
+            await state.update_data(consultation_id=consultation_id)
+            
             # ✅ ДОСТАВЛЯЕМ буферные сообщения ФЛОРИСТУ
-            await _deliver_buffered_messages_to_florist(callback.bot, consultation_id, session)
+            delivered = await _deliver_buffered_messages_to_florist(
+                callback.bot, consultation_id, session, consultation.florist.tg_id
+            )
+            if not delivered:
+                try:
+                    await callback.bot.send_message(
+                        chat_id=int(consultation.florist.tg_id),
+                        text="⚠️ Не все сообщения клиента удалось доставить. "
+                             "Повторим отправку при вашем следующем сообщении."
+                    )
+                except Exception:
+                    pass
             
             # Обновляем интерфейс флориста
             await callback.message.edit_text(
@@ -532,64 +602,74 @@ async def accept_consultation_handler(callback: types.CallbackQuery):
             print(f"Accept consultation error: {e}")
             await callback.answer("Произошла ошибка", show_alert=True)
 
-async def _deliver_buffered_messages_to_florist(bot, consultation_id: int, session):
-    """✅ ПРАВИЛЬНАЯ доставка буферных сообщений флористу"""
-    
-    # Получаем консультацию для флориста
-    consultation = await session.get(Consultation, consultation_id)
-    if not consultation:
-        return
-        
-    await session.refresh(consultation, ['client', 'florist'])
-    
-    # Получаем буферные сообщения
-    buffer_query = select(ConsultationBuffer).where(
-        ConsultationBuffer.consultation_id == consultation_id
-    ).order_by(ConsultationBuffer.created_at)
-    
-    result = await session.execute(buffer_query)
-    buffered_messages = result.scalars().all()
+async def _deliver_buffered_messages_to_florist(bot, consultation_id: int, session, florist_tg_id: str) -> bool:
+    """Доставка буферных сообщений флористу пачками; буфер удаляется только после доставки.
+
+    При сбое запоминается, сколько отправок уже прошло: повтор (со следующим
+    сообщением флориста) продолжает с места обрыва, без дублей.
+    """
+    buffer_service = ConsultationBufferService(session)
+    buffered_messages = await buffer_service.get_messages(consultation_id)
     
     if not buffered_messages:
-        return
+        _buffer_delivery_progress.pop(consultation_id, None)
+        return True
     
     print(f"📬 Delivering {len(buffered_messages)} buffered messages to florist")
     
-    # ✅ ДОСТАВЛЯЕМ каждое сообщение флористу
-    try:
-        for msg in buffered_messages:
-            await session.refresh(msg, ['sender'])
-            sender_name = msg.sender.first_name or "Клиент"
-            
-            if msg.photo_file_id:
-                await bot.send_photo(
-                    chat_id=int(consultation.florist.tg_id),
-                    photo=msg.photo_file_id,
-                    caption=f"📝 {sender_name} (из буфера): {msg.message_text or ''}"
-                )
-            else:
-                await bot.send_message(
-                    chat_id=int(consultation.florist.tg_id),
-                    text=f"📝 {sender_name} (из буфера): {msg.message_text}"
-                )
+    sender_name = buffered_messages[0]['sender_name'] or "Клиент"
+    items = [
+        {
+            'text': f"🕐 {msg['created_at'].strftime('%H:%M')} {msg['message_text'] or ''}".rstrip()
+                    if not msg['photo_file_id'] else msg['message_text'],
+            'photo': msg['photo_file_id']
+        }
+        for msg in buffered_messages
+    ]
+    packets = pack_messages(items)
+    chat_id = int(florist_tg_id)
     
-        # Уведомляем о количестве доставленных сообщений
-        if len(buffered_messages) > 0:
-            await bot.send_message(
-                chat_id=int(consultation.florist.tg_id),
-                text=f"📬 Доставлено {len(buffered_messages)} сообщений из буфера"
-            )
+    sends = [(bot.send_message, {'text': f"📝 Сообщения от {sender_name}, пока вы не приняли консультацию:"})]
+    for packet in packets:
+        if packet['type'] == 'text':
+            sends.append((bot.send_message, {'text': packet['text']}))
+        elif len(packet['photos']) == 1:
+            file_id, caption = packet['photos'][0]
+            sends.append((bot.send_photo, {'photo': file_id, 'caption': caption}))
+        else:
+            media = [
+                types.InputMediaPhoto(media=file_id, caption=caption)
+                for file_id, caption in packet['photos']
+            ]
+            sends.append((bot.send_media_group, {'media': media}))
     
+    sent = _buffer_delivery_progress.get(consultation_id, 0)
+    try:
+        for method, kwargs in sends[sent:]:
+            await _send_with_retry(method, chat_id=chat_id, **kwargs)
+            sent += 1
     except Exception as e:
+        # Буфер не трогаем - продолжим с этого места при следующей попытке
         print(f"Error delivering buffered messages: {e}")
+        _buffer_delivery_progress[consultation_id] = sent
+        return False
     
-    # Удаляем буферные сообщения
-    await session.execute(
-        delete(ConsultationBuffer)
-        .where(ConsultationBuffer.consultation_id == consultation_id)
-    )
+    # ✅ Все отправки подтверждены - очищаем буфер
+    _buffer_delivery_progress[consultation_id] = sent
+    await buffer_service.clear_buffer(consultation_id)
+    await session.commit()
+    _buffer_delivery_progress.pop(consultation_id, None)
     
-    print(f"🗑️ Cleared {len(buffered_messages)} buffered messages from buffer")
+    print(f"🗑️ Delivered {len(buffered_messages)} buffered messages in {len(packets)} packets")
+    return True
+
+async def _send_with_retry(method, **kwargs):
+    """Вызвать метод Bot API, при флуд-контроле подождать и повторить один раз"""
+    try:
+        return await method(**kwargs)
+    except TelegramRetryAfter as e:
+        await asyncio.sleep(e.retry_after)
+        return await method(**kwargs)
 
 @router.callback_query(F.data.startswith("decline_consultation_"))
 async def decline_consultation_handler(callback: types.CallbackQuery):
@@ -651,8 +731,7 @@ async def cancel_consultation_request(callback: types.CallbackQuery, state: FSMC
                 return
             
             # Отменяем консультацию
-            consultation.status = ConsultationStatusEnum.expired
-            consultation.completed_at = datetime.utcnow()
+            finish_consultation(consultation, ConsultationStatusEnum.expired)
             await session.commit()
             
             # Очищаем состояние
@@ -791,7 +870,17 @@ async def show_consultation_history(callback: types.CallbackQuery):
 async def view_consultation_archive(callback: types.CallbackQuery):
     """Просмотр архива консультации"""
     consultation_id = int(callback.data.split("_")[2])
-    
+    await _show_archive_page(callback, consultation_id, page=0)
+
+@router.callback_query(F.data.startswith("archive_page_"))
+async def view_consultation_archive_page(callback: types.CallbackQuery):
+    """Следующая страница архива консультации"""
+    parts = callback.data.split("_")
+    consultation_id, page = int(parts[2]), int(parts[3])
+    await _show_archive_page(callback, consultation_id, page)
+
+async def _show_archive_page(callback: types.CallbackQuery, consultation_id: int, page: int):
+    """Проверить доступ и отдать страницу архива"""
     async for session in get_session():
         user, lang = await _get_user_and_lang(session, callback.from_user.id)
         
@@ -805,38 +894,42 @@ async def view_consultation_archive(callback: types.CallbackQuery):
             await callback.answer("Консультация не найдена", show_alert=True)
             return
         
-        # Проверяем права доступа
-        if consultation.client_id != user.id and consultation.florist_id != user.id:
+        # Проверяем права доступа (владелец видит все консультации - для поиска по архиву)
+        is_participant = user.id in (consultation.client_id, consultation.florist_id)
+        if not is_participant and user.role != RoleEnum.owner:
             await callback.answer("Нет доступа к этой консультации", show_alert=True)
             return
         
-        # Пока простое восстановление - в будущем из архивного канала
-        if consultation.archive_id:
-            try:
-                ai_service = AIArchiveService(callback.bot)
-                success = await ai_service.restore_consultation_from_archive(
-                    callback.message.chat.id, 
-                    consultation.archive_id
-                )
-                
-                if success:
-                    await callback.answer("📖 Архив восстановлен")
-                else:
-                    await callback.message.edit_text(
-                        "📝 Архив этой консультации недоступен\n"
-                        "Возможно, консультация была завершена до внедрения системы архивирования."
-                    )
-            except Exception as e:
-                print(f"Archive restore error: {e}")
-                await callback.message.edit_text(
-                    "📝 Ошибка восстановления архива\n"
-                    "Обратитесь к администратору."
-                )
-        else:
+        if not consultation.archive_id:
+            await callback.message.edit_text(
+                "📝 Архив этой консультации еще готовится\n"
+                "Попробуйте через пару минут."
+            )
+            await callback.answer()
+            return
+        
+        try:
+            ai_service = AIArchiveService(callback.bot)
+            success = await ai_service.restore_consultation_from_archive(
+                callback.message.chat.id,
+                consultation.id,
+                page=page
+            )
+            
+            if success:
+                await callback.answer("📖 Архив восстановлен")
+                return
+            
             await callback.message.edit_text(
-                "📝 Архив этой консультации не найден\n"
+                "📝 Архив этой консультации недоступен\n"
                 "Возможно, консультация была завершена до внедрения системы архивирования."
             )
+        except Exception as e:
+            print(f"Archive restore error: {e}")
+            await callback.message.edit_text(
+                "📝 Ошибка восстановления архива\n"
+                "Обратитесь к администратору."
+            )
         
         await callback.answer()
 
@@ -864,27 +957,18 @@ async def rate_florist(callback: types.CallbackQuery, state: FSMContext):
                 await callback.answer("❌ Только клиент может оценить флориста", show_alert=True)
                 return
             
-            # Проверяем нет ли уже оценки
-            existing_review = await session.execute(
-                select(FloristReview).where(FloristReview.consultation_id == consultation_id)
+            # Создаём оценку: повторная оценка отсекается уникальным ключом
+            review_id = await ConsultationRepository(session).add_review(
+                consultation_id, user.id, consultation.florist_id, rating
             )
-            
-            if existing_review.scalar_one_or_none():
+            if not review_id:
                 await callback.answer("❌ Оценка уже оставлена", show_alert=True)
                 return
             
-            # Создаём оценку
-            review = FloristReview(
-                consultation_id=consultation_id,
-                client_id=user.id,
-                florist_id=consultation.florist_id,
-                rating=rating,
-                created_at=datetime.utcnow()
-            )
-            session.add(review)
-            
-            # Обновляем общий рейтинг флориста
-            await _update_florist_rating(session, consultation.florist_id)
+            # Обновляем общий рейтинг флориста одним UPDATE
+            new_rating = await FloristRepository(session).add_rating(consultation.florist_id, rating)
+            if new_rating:
+                print(f"Updated florist {consultation.florist_id} rating: {new_rating[0]} ({new_rating[1]} reviews)")
             
             await session.commit()
             
@@ -974,32 +1058,3 @@ async def handle_rating_state_message(message: types.Message, state: FSMContext)
         await state.clear()
         await message.answer("❌ Ошибка состояния. Начните заново.")
 
-async def _update_florist_rating(session, florist_id: int):
-    """Обновление общего рейтинга флориста"""
-    from sqlalchemy import func
-    from app.models import FloristProfile
-    
-    # Вычисляем средний рейтинг и количество отзывов
-    result = await session.execute(
-        select(
-            func.avg(FloristReview.rating).label('avg_rating'),
-            func.count(FloristReview.id).label('reviews_count')
-        ).where(FloristReview.florist_id == florist_id)
-    )
-    
-    stats = result.first()
-    avg_rating = float(stats.avg_rating) if stats.avg_rating else 0.0
-    reviews_count = stats.reviews_count if stats.reviews_count else 0
-    
-    # Обновляем профиль флориста
-    florist_profile = await session.execute(
-        select(FloristProfile).where(FloristProfile.user_id == florist_id)
-    )
-    profile = florist_profile.scalar_one_or_none()
-    
-    if profile:
-        profile.rating = round(avg_rating, 2)
-        profile.reviews_count = reviews_count
-        profile.updated_at = datetime.utcnow()
-    
-    print(f"Updated florist {florist_id} rating: {avg_rating:.2f} ({reviews_count} reviews)")
\ No newline at end of file
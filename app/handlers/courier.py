@@ -0,0 +1,170 @@
+from aiogram import Router, types, F
+
+from app.database.database import get_session
+from app.services import UserService
+from app.services.courier_dispatch import dispatcher, format_batch
+from app.repositories import DeliveryBatchRepository
+from app.models import RoleEnum, BatchStatusEnum, OrderStatusEnum, User
+from app.translate import t
+from app.exceptions import UserNotFoundError
+from sqlalchemy import select
+
+router = Router()
+
+async def _get_courier(session, tg_id: int):
+    """Курьер по Telegram ID (None для остальных ролей) и язык"""
+    user_service = UserService(session)
+    try:
+        user = await user_service.get_user_by_tg_id(str(tg_id))
+    except UserNotFoundError:
+        return None, "ru"
+    if user.role != RoleEnum.courier:
+        return None, user.lang or "ru"
+    return user, user.lang or "ru"
+
+def _batch_keyboard(batch_id: int, status: BatchStatusEnum) -> types.InlineKeyboardMarkup:
+    """Кнопки рейса по его состоянию"""
+    rows = []
+    if status == BatchStatusEnum.accepted:
+        rows.append([types.InlineKeyboardButton(text="🚚 Выехал", callback_data=f"batch_start_{batch_id}")])
+    elif status == BatchStatusEnum.delivering:
+        rows.append([types.InlineKeyboardButton(text="✅ Все доставлено", callback_data=f"batch_done_{batch_id}")])
+    rows.append([types.InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")])
+    return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+async def _notify_clients(bot, session, changed, status: OrderStatusEnum) -> None:
+    """Сообщить клиентам рейса о новом статусе заказа"""
+    if not changed:
+        return
+    user_ids = {user_id for _, user_id in changed}
+    result = await session.execute(select(User).where(User.id.in_(user_ids)))
+    users = {user.id: user for user in result.scalars().all()}
+
+    for order_id, user_id in changed:
+        user = users.get(user_id)
+        if not user:
+            continue
+        lang = user.lang or "ru"
+        try:
+            await bot.send_message(
+                chat_id=int(user.tg_id),
+                text=f"📦 Заказ #{order_id}\nСтатус: {t(lang, f'order_status_{status.value}')}"
+            )
+        except Exception as e:
+            print(f"Client notification error: {e}")
+
+@router.callback_query(F.data == "courier_batches")
+async def show_courier_batches(callback: types.CallbackQuery):
+    """Текущие рейсы курьера"""
+    async for session in get_session():
+        courier, lang = await _get_courier(session, callback.from_user.id)
+        if not courier:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+
+        batch_repo = DeliveryBatchRepository(session)
+        batches = await batch_repo.get_courier_batches(courier.id)
+
+        if not batches:
+            await callback.message.edit_text(
+                "🚚 Активных рейсов нет.\n\nНовый рейс придет сообщением.",
+                reply_markup=_batch_keyboard(0, BatchStatusEnum.completed)
+            )
+            await callback.answer()
+            return
+
+        batch = batches[0]
+        orders = await batch_repo.get_orders(batch.id)
+        await callback.message.edit_text(
+            format_batch(batch, orders),
+            reply_markup=_batch_keyboard(batch.id, batch.status),
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+        await callback.answer()
+
+@router.callback_query(F.data.startswith("batch_accept_"))
+async def accept_batch(callback: types.CallbackQuery):
+    """Курьер берет рейс"""
+    batch_id = int(callback.data.split("_")[2])
+
+    async for session in get_session():
+        courier, lang = await _get_courier(session, callback.from_user.id)
+        if not courier:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+
+        batch_repo = DeliveryBatchRepository(session)
+        if not await batch_repo.accept(batch_id, courier.id):
+            await callback.answer("⏰ Предложение уже неактуально", show_alert=True)
+            await callback.message.edit_reply_markup(reply_markup=None)
+            return
+        await session.commit()
+
+        await callback.message.edit_reply_markup(reply_markup=_batch_keyboard(batch_id, BatchStatusEnum.accepted))
+        await callback.answer("✅ Рейс ваш")
+
+@router.callback_query(F.data.startswith("batch_decline_"))
+async def decline_batch(callback: types.CallbackQuery):
+    """Курьер отказывается - рейс уходит следующему"""
+    batch_id = int(callback.data.split("_")[2])
+
+    async for session in get_session():
+        courier, lang = await _get_courier(session, callback.from_user.id)
+        if not courier:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+
+        batch_repo = DeliveryBatchRepository(session)
+        batch = await batch_repo.get(batch_id)
+        if batch and await batch_repo.decline(batch, courier.id):
+            await session.commit()
+            dispatcher.kick(callback.bot)
+
+        await callback.message.edit_text(f"❌ Вы отказались от рейса #{batch_id}")
+        await callback.answer()
+
+@router.callback_query(F.data.startswith("batch_start_"))
+async def start_batch(callback: types.CallbackQuery):
+    """Курьер выехал: заказы рейса -> delivering"""
+    batch_id = int(callback.data.split("_")[2])
+
+    async for session in get_session():
+        courier, lang = await _get_courier(session, callback.from_user.id)
+        if not courier:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+
+        changed = await DeliveryBatchRepository(session).start(batch_id, courier.id)
+        if changed is None:
+            await callback.answer("❌ Рейс уже в пути или отменен", show_alert=True)
+            return
+        await session.commit()
+
+        await callback.message.edit_reply_markup(reply_markup=_batch_keyboard(batch_id, BatchStatusEnum.delivering))
+        await callback.answer(f"🚚 В пути: {len(changed)} заказ(ов)")
+        await _notify_clients(callback.bot, session, changed, OrderStatusEnum.delivering)
+
+@router.callback_query(F.data.startswith("batch_done_"))
+async def complete_batch(callback: types.CallbackQuery):
+    """Рейс доставлен: заказы -> delivered"""
+    batch_id = int(callback.data.split("_")[2])
+
+    async for session in get_session():
+        courier, lang = await _get_courier(session, callback.from_user.id)
+        if not courier:
+            await callback.answer(t(lang, "access_denied"), show_alert=True)
+            return
+
+        changed = await DeliveryBatchRepository(session).complete(batch_id, courier.id)
+        if changed is None:
+            await callback.answer("❌ Рейс уже завершен", show_alert=True)
+            return
+        await session.commit()
+
+        await callback.message.edit_reply_markup(reply_markup=_batch_keyboard(batch_id, BatchStatusEnum.completed))
+        await callback.answer(f"✅ Доставлено: {len(changed)} заказ(ов)")
+        await _notify_clients(callback.bot, session, changed, OrderStatusEnum.delivered)
+
+        # Курьер свободен - можно предлагать следующий рейс
+        dispatcher.kick(callback.bot)
@@ -0,0 +1,123 @@
+# app/handlers/inline.py
+
+"""Inline-режим: @florange_bot розы - поделиться букетом в любом чате.
+
+Ответ собирается из снимка каталога в памяти (catalog_cache). Готовые
+списки результатов лежат в LRU-кэше по (версия каталога, запрос, язык),
+поэтому частые нажатия клавиш не доходят до Postgres. В БД идем только
+за нечетким поиском, когда префиксный индекс ничего не нашел, и результат
+тоже кэшируется.
+"""
+
+import html
+from typing import List
+
+from aiogram import Router, types
+
+from app.database.database import get_session
+from app.repositories import ProductRepository
+from app.services.product_search import catalog_cache, CatalogProduct
+from app.translate import t
+from app.utils.cache import LRUCache
+from app.utils.translit import search_tokens
+
+router = Router()
+
+INLINE_PAGE_SIZE = 20       # Telegram принимает до 50 результатов за ответ
+INLINE_MAX_RESULTS = 100
+INLINE_CACHE_TIME = 300     # Кэш на стороне Telegram, секунды
+
+results_cache = LRUCache(max_size=512, ttl=600)
+
+def _inline_lang(inline_query: types.InlineQuery) -> str:
+    """Язык берем из клиента Telegram - без запроса к БД"""
+    return "uz" if inline_query.from_user.language_code == "uz" else "ru"
+
+async def _find_products(query: str, lang: str) -> List[CatalogProduct]:
+    """Товары по запросу: пустой запрос - весь каталог, иначе префиксы, затем нечеткий поиск"""
+    if not query:
+        return (await catalog_cache.get_products())[:INLINE_MAX_RESULTS]
+
+    products = await catalog_cache.suggest(query, INLINE_MAX_RESULTS)
+    if products or len(query) < 3:
+        return products
+
+    async for session in get_session():
+        found = await ProductRepository(session).search(query, INLINE_MAX_RESULTS)
+    return [p for p in [await catalog_cache.get(product.id) for product in found] if p]
+
+def _build_result(product: CatalogProduct, lang: str, bot_username: str):
+    """Карточка товара для inline-ответа"""
+    currency = t(lang, "currency")
+    name = html.escape(product.name(lang))
+    desc = html.escape(product.description(lang))
+    caption = "\n\n".join(part for part in (f"🌸 <b>{name}</b>", desc, f"💰 {product.price} {currency}") if part)
+    reply_markup = types.InlineKeyboardMarkup(inline_keyboard=[[
+        types.InlineKeyboardButton(
+            text=t(lang, "menu_catalog"),
+            url=f"https://t.me/{bot_username}?start=inline"
+        )
+    ]])
+
+    if product.photo_file_id:
+        return types.InlineQueryResultCachedPhoto(
+            id=str(product.id),
+            photo_file_id=product.photo_file_id,
+            title=product.name(lang),
+            description=f"{product.price} {currency}",
+            caption=caption,
+            parse_mode="HTML",
+            reply_markup=reply_markup
+        )
+
+    if product.photo_url:
+        return types.InlineQueryResultPhoto(
+            id=str(product.id),
+            photo_url=product.photo_url,
+            thumbnail_url=product.photo_url,
+            title=product.name(lang),
+            description=f"{product.price} {currency}",
+            caption=caption,
+            parse_mode="HTML",
+            reply_markup=reply_markup
+        )
+
+    return types.InlineQueryResultArticle(
+        id=str(product.id),
+        title=product.name(lang),
+        description=f"{product.price} {currency}",
+        input_message_content=types.InputTextMessageContent(message_text=caption, parse_mode="HTML"),
+        reply_markup=reply_markup
+    )
+
+@router.inline_query()
+async def inline_catalog(inline_query: types.InlineQuery):
+    """Поиск по каталогу в inline-режиме с постраничной выдачей"""
+    lang = _inline_lang(inline_query)
+    query = " ".join(search_tokens(inline_query.query))
+    offset = int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+    await catalog_cache.get_products()  # подгружает снимок, если устарел
+    cache_key = (catalog_cache.version, query, lang)
+
+    results = results_cache.get(cache_key)
+    if results is None:
+        try:
+            products = await _find_products(query, lang)
+        except Exception as e:
+            print(f"Inline search error: {e}")
+            products = []
+
+        bot_username = (await inline_query.bot.me()).username
+        results = [_build_result(product, lang, bot_username) for product in products]
+        results_cache.set(cache_key, results)
+
+    page = results[offset:offset + INLINE_PAGE_SIZE]
+    next_offset = str(offset + INLINE_PAGE_SIZE) if offset + INLINE_PAGE_SIZE < len(results) else ""
+
+    await inline_query.answer(
+        page,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=True,  # язык результатов зависит от пользователя
+        next_offset=next_offset
+    )
@@ -2,6 +2,8 @@ from aiogram import Router, types, F
 
 from app.database.database import get_session
 from app.services import UserService, OrderService
+from app.services.courier_dispatch import dispatcher
+from app.services.delivery_slots import slot_availability
 from app.models import RoleEnum, OrderStatusEnum
 from app.translate import t
 from app.exceptions import UserNotFoundError, OrderNotFoundError
@@ -18,9 +20,57 @@ async def _get_user_and_lang(session, tg_id: int):
     except UserNotFoundError:
         return None, "ru"
 
+ORDERS_PAGE_SIZE = 5
+ACTIVE_STATUSES = (
+    OrderStatusEnum.new, OrderStatusEnum.await_florist, OrderStatusEnum.accepted,
+    OrderStatusEnum.preparing, OrderStatusEnum.ready, OrderStatusEnum.delivering
+)
+STATUS_EMOJI = {
+    "new": "🆕",
+    "await_florist": "⏳", 
+    "accepted": "✅",
+    "preparing": "🔄",
+    "ready": "🎉",
+    "delivering": "🚚",
+    "delivered": "✅",
+    "canceled": "❌"
+}
+
+def _page_cursor(order) -> str:
+    """Курсор страницы: (created_at, id) заказа в callback_data"""
+    return f"{order.created_at.strftime('%Y%m%d%H%M%S%f')}_{order.id}"
+
+def _parse_page(data: str, prefix: str):
+    """prefix + 'b_<курсор>' - к старым, 'a_<курсор>' - к новым; без курсора - первая страница"""
+    try:
+        direction, stamp, order_id = data[len(prefix):].split("_")
+        cursor = (datetime.strptime(stamp, "%Y%m%d%H%M%S%f"), int(order_id))
+    except ValueError:
+        return None, None
+    return (cursor, None) if direction == "b" else (None, cursor)
+
+async def _load_orders_page(order_service, user_id: int, data: str, prefix: str, statuses=None):
+    """Страница заказов по callback_data и кнопки листания"""
+    before, after = _parse_page(data, prefix)
+    orders, has_more = await order_service.get_user_orders_page(
+        user_id, ORDERS_PAGE_SIZE, statuses=statuses, before=before, after=after
+    )
+    
+    # В сторону, откуда пришли, страницы точно есть
+    has_newer = has_more if after else before is not None
+    has_older = has_more if not after else True
+    
+    nav = []
+    if orders and has_newer:
+        nav.append(types.InlineKeyboardButton(text="⬅️ Новее", callback_data=f"{prefix}a_{_page_cursor(orders[0])}"))
+    if orders and has_older:
+        nav.append(types.InlineKeyboardButton(text="Старее ➡️", callback_data=f"{prefix}b_{_page_cursor(orders[-1])}"))
+    return orders, nav, not has_newer
+
 @router.callback_query(F.data == "my_orders")
+@router.callback_query(F.data.startswith("my_orders_"))
 async def show_my_orders(callback: types.CallbackQuery):
-    """Показать заказы пользователя (улучшенная версия)"""
+    """Мои заказы: сводка одним агрегатом и постраничный список"""
     async for session in get_session():
         user, lang = await _get_user_and_lang(session, callback.from_user.id)
         
@@ -30,9 +80,9 @@ async def show_my_orders(callback: types.CallbackQuery):
             return
         
         order_service = OrderService(session)
-        orders = await order_service.get_user_orders(user.id)
+        stats = await order_service.get_user_order_stats(user.id)
         
-        if not orders:
+        if not stats:
             kb = types.InlineKeyboardMarkup(inline_keyboard=[
                 [types.InlineKeyboardButton(text=t(lang, "back_to_menu"), callback_data="main_menu")]
             ])
@@ -44,79 +94,50 @@ async def show_my_orders(callback: types.CallbackQuery):
             await callback.answer()
             return
         
+        orders, nav, first_page = await _load_orders_page(order_service, user.id, callback.data, "my_orders_")
+        
         # Формируем информативный список заказов
-        lines = ["📋 <b>Мои заказы:</b>\n"]
+        total_orders = sum(count for count, _ in stats.values())
+        total_spent = sum(total for _, total in stats.values())
         
-        # Группируем заказы по статусам
-        status_groups = {}
-        total_spent = 0
+        lines = ["📋 <b>Мои заказы:</b>\n"]
+        lines.append(f"💼 <b>Всего заказов:</b> {total_orders}")
+        lines.append(f"💰 <b>Потрачено:</b> {total_spent:,.0f} сум")
+        lines.append(" | ".join(
+            f"{STATUS_EMOJI.get(status.value, '📦')} {stats[status][0]}" for status in OrderStatusEnum if status in stats
+        ) + "\n")
         
         for order in orders:
             status = order.status.value
-            if status not in status_groups:
-                status_groups[status] = []
-            status_groups[status].append(order)
-            total_spent += float(order.total_price or 0)
-        
-        # Показываем статистику
-        lines.append(f"💼 <b>Всего заказов:</b> {len(orders)}")
-        lines.append(f"💰 <b>Потрачено:</b> {total_spent:,.0f} сум\n")
-        
-        # Показываем заказы по статусам
-        status_emoji = {
-            "new": "🆕",
-            "await_florist": "⏳", 
-            "accepted": "✅",
-            "preparing": "🔄",
-            "ready": "🎉",
-            "delivering": "🚚",
-            "delivered": "✅",
-            "canceled": "❌"
-        }
-        
-        for status, group_orders in status_groups.items():
-            if not group_orders:
-                continue
-                
-            status_text = t(lang, f"order_status_{status}")
-            emoji = status_emoji.get(status, "📦")
-            lines.append(f"{emoji} <b>{status_text} ({len(group_orders)}):</b>")
+            date_str = order.created_at.strftime("%d.%m %H:%M") if order.created_at else ""
             
-            # Показываем последние 3 заказа в каждом статусе
-            for order in group_orders[:3]:
-                date_str = order.created_at.strftime("%d.%m %H:%M") if order.created_at else ""
-                
-                # Сокращаем адрес если длинный
-                address = order.address or "Не указан"
-                if len(address) > 30:
-                    address = address[:27] + "..."
-                
-                lines.append(
-                    f"  • <code>#{order.id}</code> | {order.total_price} сум\n"
-                    f"    📍 {address} | 📅 {date_str}"
-                )
+            # Сокращаем адрес если длинный
+            address = order.address or "Не указан"
+            if len(address) > 30:
+                address = address[:27] + "..."
             
-            if len(group_orders) > 3:
-                lines.append(f"    <i>... и еще {len(group_orders) - 3}</i>")
-            lines.append("")
+            lines.append(
+                f"{STATUS_EMOJI.get(status, '📦')} <code>#{order.id}</code> | {t(lang, f'order_status_{status}')}\n"
+                f"    💰 {order.total_price} сум | 📅 {date_str}\n"
+                f"    📍 {address}"
+            )
         
         text = "\n".join(lines)
         
         # Добавляем кнопки действий
         kb_rows = []
+        if nav:
+            kb_rows.append(nav)
         
         # Если есть активные заказы - показываем кнопку отслеживания  
-        active_statuses = ["new", "await_florist", "accepted", "preparing", "ready", "delivering"]
-        has_active = any(order.status.value in active_statuses for order in orders)
-        
-        if has_active:
+        if any(status in ACTIVE_STATUSES for status in stats):
             kb_rows.append([types.InlineKeyboardButton(
                 text="🔍 Отследить активные", 
                 callback_data="track_active_orders"
             )])
         
         # Кнопка повторить последний заказ
-        if orders:
+        if first_page and orders:
             last_order = orders[0]
             kb_rows.append([types.InlineKeyboardButton(
                 text=f"🔄 Повторить заказ #{last_order.id}", 
@@ -262,7 +283,9 @@ async def florist_accept_order(callback: types.CallbackQuery):
         order_service = OrderService(session)
         
         try:
-            order = await order_service.update_order_status(order_id, OrderStatusEnum.accepted)
+            if not await order_service.order_repo.claim(order_id, user.id):
+                await callback.answer("❌ Заказ уже обработан", show_alert=True)
+                return
             await session.commit()
             
             # Обновляем сообщение
@@ -307,6 +330,8 @@ async def florist_cancel_order(callback: types.CallbackQuery):
             # Отменяем заказ
             updated_order = await order_service.update_order_status(order_id, OrderStatusEnum.canceled)
             await session.commit()
+            if updated_order.slot_at:
+                slot_availability.invalidate()
             
             # Обновляем сообщение С КНОПКОЙ ВОЗВРАТА
             from datetime import datetime
@@ -356,6 +381,9 @@ async def florist_ready_order(callback: types.CallbackQuery):
             order = await order_service.update_order_status(order_id, OrderStatusEnum.ready)
             await session.commit()
             
+            # Сразу ищем курьера, не дожидаясь планового прохода диспетчера
+            dispatcher.kick(callback.bot)
+            
             await callback.answer("🎉 Заказ готов к доставке")
             await show_florist_orders(callback)
             
@@ -365,6 +393,7 @@ async def florist_ready_order(callback: types.CallbackQuery):
             await callback.answer(f"Ошибка: {str(e)}", show_alert=True)
 
 @router.callback_query(F.data == "track_active_orders")
+@router.callback_query(F.data.startswith("track_active_orders_"))
 async def track_active_orders(callback: types.CallbackQuery):
     """Отследить активные заказы"""
     async for session in get_session():
@@ -375,11 +404,9 @@ async def track_active_orders(callback: types.CallbackQuery):
             return
         
         order_service = OrderService(session)
-        orders = await order_service.get_user_orders(user.id)
-        
-        # Фильтруем только активные заказы
-        active_statuses = ["new", "await_florist", "accepted", "preparing", "ready", "delivering"]
-        active_orders = [o for o in orders if o.status.value in active_statuses]
+        active_orders, nav, _ = await _load_orders_page(
+            order_service, user.id, callback.data, "track_active_orders_", statuses=ACTIVE_STATUSES
+        )
         
         if not active_orders:
             await callback.answer("🎉 Нет активных заказов", show_alert=True)
@@ -409,9 +436,9 @@ async def track_active_orders(callback: types.CallbackQuery):
         
         text = "\n".join(lines)
         
-        kb = types.InlineKeyboardMarkup(inline_keyboard=[
-            [types.InlineKeyboardButton(text="⬅️ Назад к заказам", callback_data="my_orders")]
-        ])
+        kb_rows = [nav] if nav else []
+        kb_rows.append([types.InlineKeyboardButton(text="⬅️ Назад к заказам", callback_data="my_orders")])
+        kb = types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
         
         await callback.message.edit_text(text, reply_markup=kb, parse_mode="HTML")
         await callback.answer()
@@ -5,10 +5,12 @@ from aiogram.fsm.context import FSMContext
 
 from app.repositories import SettingsRepository
 from app.services import NotificationService
+from app.services.role_request_counter import pending_requests
 from app.models import RequestedRoleEnum, RoleRequest, RoleEnum, User
 from app.translate import t
 from app.utils.validators import validate_phone
 from datetime import datetime
+from functools import lru_cache
 
 router = Router()
 
@@ -208,13 +210,14 @@ async def _complete_registration(message, state: FSMContext, session, phone: str
             
             session.add(new_request)
             await session.commit()
+            pending_requests.increment()
             
             # Уведомляем админов
-            from app.services import NotificationService, UserService
+            from app.services import NotificationService
+            from app.services.staff_directory import staff_directory
             notification_service = NotificationService(message.bot)
-            user_service = UserService(session)
             
-            admins = await user_service.user_repo.get_by_role(RoleEnum.owner)
+            admins = await staff_directory.owners()
             if admins:
                 await notification_service.notify_admins_about_role_request(admins, new_request)
             
@@ -261,122 +264,118 @@ async def _delete_message_later(bot, chat_id: int, message_id: int, delay: int):
 # Вспомогательные функции
 async def _show_main_menu(message: types.Message, lang: str, role: str = "client"):
     """Показать главное меню"""
-    kb = await _create_main_menu_keyboard(message.bot, lang, role)
+    kb = _create_main_menu_keyboard(lang, role)
     await message.answer(t(lang, 'menu_title'), reply_markup=kb)
 
-async def _create_main_menu_keyboard(bot, lang: str, role: str) -> types.InlineKeyboardMarkup:
-    """Создать клавиатуру главного меню ПО РОЛЯМ"""
+def _create_main_menu_keyboard(lang: str, role: str) -> types.InlineKeyboardMarkup:
+    """Клавиатура главного меню ПО РОЛЯМ - без обращений к БД"""
+    pending_count = pending_requests.value if role == "owner" else 0
+    return _markup(_main_menu_rows(lang, role, pending_count))
+
+def _markup(rows) -> types.InlineKeyboardMarkup:
+    """Новая клавиатура из строк (текст, callback_data) - кэшируются только неизменяемые кортежи"""
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=text, callback_data=data) for text, data in row]
+        for row in rows
+    ])
+
+@lru_cache(maxsize=128)
+def _main_menu_rows(lang: str, role: str, pending_count: int) -> tuple:
+    """Строки меню один раз на (язык, роль, число заявок)"""
     
-    kb_rows = []
+    rows = ()
     
     if role == "client":
         # МЕНЮ КЛИЕНТА
-        kb_rows = [
-            [types.InlineKeyboardButton(text=t(lang, "menu_catalog"), callback_data="open_catalog")],
-            [types.InlineKeyboardButton(text=t(lang, "menu_cart"), callback_data="open_cart")],
-            [types.InlineKeyboardButton(text=t(lang, "menu_orders"), callback_data="my_orders")],
-            [types.InlineKeyboardButton(text=t(lang, "menu_consultation"), callback_data="consultation_start")],
-            [types.InlineKeyboardButton(text=t(lang, "history_consultations"), callback_data="consultation_history")]
-        ]
+        rows = (
+            ((t(lang, "menu_catalog"), "open_catalog"),),
+            ((t(lang, "menu_cart"), "open_cart"),),
+            ((t(lang, "menu_orders"), "my_orders"),),
+            ((t(lang, "menu_consultation"), "consultation_start"),),
+            ((t(lang, "history_consultations"), "consultation_history"),)
+        )
     
     elif role == "florist":
         # МЕНЮ ФЛОРИСТА
-        kb_rows = [
-            [types.InlineKeyboardButton(text="📋 Управление заказами", callback_data="manage_orders")],
-            [types.InlineKeyboardButton(text="💬 Консультации", callback_data="florist_consultations")],
-            [types.InlineKeyboardButton(text="📊 Мои статистика", callback_data="my_stats")],
-            [types.InlineKeyboardButton(text="📦 Склад", callback_data="warehouse_status")],
-            [types.InlineKeyboardButton(text="👤 Мой профиль", callback_data="my_profile")]
-        ]
+        rows = (
+            (("📋 Управление заказами", "manage_orders"),),
+            (("💬 Консультации", "florist_consultations"),),
+            (("📊 Мои статистика", "my_stats"),),
+            (("📦 Склад", "warehouse_status"),),
+            (("👤 Мой профиль", "my_profile"),)
+        )
+    
+    elif role == "courier":
+        # МЕНЮ КУРЬЕРА
+        rows = (
+            (("🚚 Мои рейсы", "courier_batches"),),
+        )
     
     elif role == "owner":
         # МЕНЮ ВЛАДЕЛЬЦА
-        pending_count = await _get_pending_requests_count(bot)
         requests_text = "📋 Заявки на роли"
         if pending_count > 0:
             requests_text += f" ({pending_count})"
         
-        kb_rows = [
-            [types.InlineKeyboardButton(text="📊 Аналитика", callback_data="analytics")],
-            [types.InlineKeyboardButton(text="📋 Управление заказами", callback_data="manage_orders")],
-            [types.InlineKeyboardButton(text="👥 Управление персоналом", callback_data="manage_florists")],
-            [types.InlineKeyboardButton(text="📦 Управление товарами", callback_data="manage_products")],
-            [types.InlineKeyboardButton(text="📦 Склад и поставки", callback_data="warehouse_management")],
-            [types.InlineKeyboardButton(text=requests_text, callback_data="manage_registration")],
-            [types.InlineKeyboardButton(text="⚙️ Настройки системы", callback_data="system_settings")]
-        ]
+        rows = (
+            (("📊 Аналитика", "analytics"),),
+            (("📋 Управление заказами", "manage_orders"),),
+            (("👥 Управление персоналом", "manage_florists"),),
+            (("📦 Управление товарами", "manage_products"),),
+            (("📦 Склад и поставки", "warehouse_management"),),
+            ((requests_text, "manage_registration"),),
+            (("⚙️ Настройки системы", "system_settings"),)
+        )
     
     # Кнопка смены языка для всех
-    kb_rows.append([types.InlineKeyboardButton(text=f"🌍 {lang.upper()}", callback_data="change_language")])
-    
-    return types.InlineKeyboardMarkup(inline_keyboard=kb_rows)
+    return rows + (((f"🌍 {lang.upper()}", "change_language"),),)
+
+# Статичные клавиатуры - строки заданы один раз, объект разметки новый на каждый ответ
+BACK_TO_MENU_ROWS = ((("⬅️ Назад", "main_menu"),),)
+
+def _back_to_menu_keyboard() -> types.InlineKeyboardMarkup:
+    return _markup(BACK_TO_MENU_ROWS)
+
+def _language_reply_keyboard() -> types.ReplyKeyboardMarkup:
+    return types.ReplyKeyboardMarkup(
+        keyboard=[
+            [types.KeyboardButton(text="🇷🇺 Русский"), types.KeyboardButton(text="🇺🇿 O'zbekcha")]
+        ],
+        resize_keyboard=True,
+        one_time_keyboard=True
+    )
 
 # ДОБАВИТЬ заглушки для новых кнопок флориста в app/handlers/start.py:
 
 @router.callback_query(F.data == "florist_consultations")
 async def florist_consultations_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("💬 Управление консультациями (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("💬 Управление консультациями (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "my_stats")
 async def my_stats_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("📊 Моя статистика (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("📊 Моя статистика (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "warehouse_status")
 async def warehouse_status_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("📦 Статус склада (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("📦 Статус склада (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "my_profile")
 async def my_profile_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("👤 Мой профиль флориста (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("👤 Мой профиль флориста (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "warehouse_management")
 async def warehouse_management_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("📦 Управление складом (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("📦 Управление складом (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "system_settings")
 async def system_settings_placeholder(callback: types.CallbackQuery):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("⚙️ Настройки системы (в разработке)", reply_markup=kb)
-
-async def _get_pending_requests_count(bot) -> int:
-    """Получить количество ожидающих заявок"""
-    try:
-        from app.database.database import get_session
-        from app.services import UserService
-        from sqlalchemy import select, func
-        from app.models import RoleRequest, RequestStatusEnum
-        
-        async for session in get_session():
-            result = await session.execute(
-                select(func.count(RoleRequest.id))
-                .where(RoleRequest.status == RequestStatusEnum.pending)
-            )
-            return result.scalar() or 0
-    except:
-        return 0
+    await callback.message.edit_text("⚙️ Настройки системы (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "main_menu")
 async def main_menu_callback(callback: types.CallbackQuery, user=None):
     """Возврат в главное меню"""
     if user:
-        kb = await _create_main_menu_keyboard(callback.bot, user.lang or "ru", user.role.value)
+        kb = _create_main_menu_keyboard(user.lang or "ru", user.role.value)
         await callback.message.edit_text(t(user.lang or "ru", 'menu_title'), reply_markup=kb)
         await callback.answer()
     else:
@@ -390,15 +389,7 @@ async def change_language_handler(callback: types.CallbackQuery, user=None):
         return
     
     # Показываем клавиатуру выбора языка
-    kb = types.ReplyKeyboardMarkup(
-        keyboard=[
-            [types.KeyboardButton(text="🇷🇺 Русский"), types.KeyboardButton(text="🇺🇿 O'zbekcha")]
-        ],
-        resize_keyboard=True,
-        one_time_keyboard=True
-    )
-    
-    await callback.message.answer(t(user.lang or "ru", "choose_language"), reply_markup=kb)
+    await callback.message.answer(t(user.lang or "ru", "choose_language"), reply_markup=_language_reply_keyboard())
     await callback.answer()
 
 @router.message(F.text.in_(["🇷🇺 Русский", "🇺🇿 O'zbekcha"]))
@@ -417,20 +408,44 @@ async def process_language_change(message: types.Message, user=None, session=Non
     await message.answer("✅", reply_markup=types.ReplyKeyboardRemove())
     await _show_main_menu(message, new_lang, user.role.value)
 
-# Заглушки (временно)
 @router.callback_query(F.data == "analytics")
-async def analytics_placeholder(callback: types.CallbackQuery, user=None):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("📊 Аналитика (в разработке)", reply_markup=kb)
+async def show_analytics(callback: types.CallbackQuery, user=None, session=None):
+    """Аналитика владельца: заказы и RFM-сегменты клиентов"""
+    from app.repositories import CustomerSegmentRepository
+    from app.services import OrderService
+    from app.services.customer_segments import SEGMENTS
+    
+    lang = (user.lang if user else None) or "ru"
+    if not user or user.role != RoleEnum.owner:
+        await callback.answer(t(lang, "access_denied"), show_alert=True)
+        return
+    
+    analytics = await OrderService(session).get_orders_analytics()
+    segment_repo = CustomerSegmentRepository(session)
+    counts = await segment_repo.get_segment_counts()
+    computed_at = await segment_repo.get_computed_at()
+    
+    lines = [
+        t(lang, "orders_analytics"),
+        f"📊 {t(lang, 'total_orders')}: {analytics['total_orders']}",
+        f"💰 {t(lang, 'total_revenue')}: {analytics['total_revenue']:.0f} {t(lang, 'currency')}",
+        "",
+        t(lang, "customer_segments")
+    ]
+    if counts:
+        lines += [f"{t(lang, f'segment_{name}')}: {counts[name]}" for name in SEGMENTS if counts.get(name)]
+        lines.append(f"🕒 {t(lang, 'segments_updated')}: {computed_at:%d.%m %H:%M} UTC")
+    else:
+        lines.append(t(lang, "segments_not_ready"))
+    
+    await callback.message.edit_text("\n".join(lines), reply_markup=_back_to_menu_keyboard())
+    await callback.answer()
+
+# Заглушки (временно)
 
 @router.callback_query(F.data == "manage_products") 
 async def manage_products_placeholder(callback: types.CallbackQuery, user=None):
-    kb = types.InlineKeyboardMarkup(inline_keyboard=[
-        [types.InlineKeyboardButton(text="⬅️ Назад", callback_data="main_menu")]
-    ])
-    await callback.message.edit_text("📦 Управление товарами (в разработке)", reply_markup=kb)
+    await callback.message.edit_text("📦 Управление товарами (в разработке)", reply_markup=_back_to_menu_keyboard())
 
 @router.callback_query(F.data == "main_menu")
 async def show_main_menu_callback(callback: types.CallbackQuery, user=None):
@@ -439,5 +454,5 @@ async def show_main_menu_callback(callback: types.CallbackQuery, user=None):
         await callback.answer("Пользователь не найден")
         return
     
-    kb = await _create_main_menu_keyboard(callback.bot, user.lang, user.role.value)
+    kb = _create_main_menu_keyboard(user.lang, user.role.value)
     await callback.message.edit_text(t(user.lang, 'menu_title'), reply_markup=kb)
\ No newline at end of file
@@ -12,6 +12,7 @@ from aiogram.fsm.context import FSMContext
 from app.database.database import get_session
 from app.models import Consultation, ConsultationStatusEnum
 from app.handlers.consultation import ConsultationStates
+from app.services.consultation_relay import participants_cache, finish_consultation
 
 
 class StateValidationMiddleware(BaseMiddleware):
@@ -84,6 +85,11 @@ class StateValidationMiddleware(BaseMiddleware):
             await state.clear()
             return await handler(event, data)
             
+        # Активная консультация уже в кэше участников - БД не трогаем
+        if (current_state == ConsultationStates.CHATTING.state and
+                participants_cache.get(consultation_id)):
+            return await handler(event, data)
+            
         # Проверяем консультацию в БД
         try:
             async for session in get_session():
@@ -119,7 +125,7 @@ class StateValidationMiddleware(BaseMiddleware):
                     
                     if consultation.expires_at and consultation.expires_at < datetime.utcnow():
                         # Истекла - обновляем в БД и очищаем состояние
-                        consultation.status = ConsultationStatusEnum.expired
+                        finish_consultation(consultation, ConsultationStatusEnum.expired)
                         await session.commit()
                         
                         await state.clear()
@@ -37,6 +37,13 @@ class RequestStatusEnum(enum.Enum):
     approved = "approved" 
     rejected = "rejected"
 
+class BatchStatusEnum(enum.Enum):
+    open = "open"              # ждет курьера
+    offered = "offered"        # предложен курьеру
+    accepted = "accepted"
+    delivering = "delivering"
+    completed = "completed"
+
 class ConsultationStatusEnum(enum.Enum):
     # Новые правильные статусы
     pending = "pending"                    # Ожидание ответа флориста
@@ -76,6 +83,7 @@ class User(Base):
     phone = Column(String(20))
     lang = Column(String(5))
     role = Column(Enum(RoleEnum), default=RoleEnum.client)
+    notify_digest_minutes = Column(Integer)  # уведомления о заказах сводкой раз в N минут (пусто - сразу)
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class Category(Base):
@@ -95,7 +103,7 @@ class Product(Base):
     __tablename__ = "products"
     id = Column(Integer, primary_key=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
-    name_ru = Column(String(255), nullable=False)
+    name_ru = Column(String(255), nullable=False)  # Ключ для импорта
     name_uz = Column(String(255), nullable=False)
     desc_ru = Column(Text)
     desc_uz = Column(Text)
@@ -107,6 +115,10 @@ class Product(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     category = relationship("Category", back_populates="products")
 
+    __table_args__ = (
+        sa.UniqueConstraint("name_ru", name="uq_products_name_ru"),
+    )
+
     @property
     def name(self):
         return self.name_ru  # Для обратной совместимости
@@ -115,6 +127,24 @@ class Product(Base):
     def description(self):
         return self.desc_ru  # Для обратной совместимости
 
+class ProductPopularity(Base):
+    """Популярность товара: проданные штуки с затуханием по времени"""
+    __tablename__ = "product_popularity"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(sa.Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ProductPair(Base):
+    """Часто берут вместе: не больше RELATED_KEEP лучших пар на товар"""
+    __tablename__ = "product_pairs"
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    related_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    score = Column(sa.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        sa.Index("idx_product_pairs_score", "product_id", "score"),
+    )
+
 class Order(Base):
     __tablename__ = "orders"
     id = Column(Integer, primary_key=True)
@@ -126,11 +156,44 @@ class Order(Base):
     phone = Column(String(20))
     slot_at = Column(DateTime)
     comment = Column(Text)
+    latitude = Column(sa.Float)
+    longitude = Column(sa.Float)
+    delivery_zone_id = Column(Integer, ForeignKey("delivery_zones.id"))
+    delivery_fee = Column(Numeric(10, 2))
+    batch_id = Column(Integer, ForeignKey("delivery_batches.id"))  # рейс курьера
+    offered_florist_id = Column(Integer, ForeignKey("users.id"))  # кому сейчас предложен заказ
+    offered_at = Column(DateTime)
+    offer_skipped = Column(sa.JSON, default=list)  # флористы, не ответившие или отказавшиеся
     created_at = Column(DateTime, default=datetime.utcnow)
     user = relationship("User", foreign_keys=[user_id])
     florist = relationship("User", foreign_keys=[florist_id])  # 🆕
     items = relationship("OrderItem", back_populates="order")
 
+class CustomerStats(Base):
+    """Сводка по клиенту: меняется вместе с заказами, читается по первичному ключу"""
+    __tablename__ = "customer_stats"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    orders_count = Column(Integer, nullable=False, default=0)       # оформлено, без отмененных
+    delivered_count = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Numeric(12, 2), nullable=False, default=0)  # по доставленным
+    first_order_at = Column(DateTime)
+    last_order_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @property
+    def average_check(self):
+        return self.total_spent / self.delivered_count if self.delivered_count else 0
+
+class CustomerSegment(Base):
+    """RFM-сегмент клиента: пересобирается задачей обслуживания по customer_stats"""
+    __tablename__ = "customer_segments"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    recency_score = Column(Integer, nullable=False)     # 1..5, 5 - покупал недавно
+    frequency_score = Column(Integer, nullable=False)   # 1..5, 5 - чаще всех
+    monetary_score = Column(Integer, nullable=False)    # 1..5, 5 - потратил больше всех
+    segment = Column(String(20), nullable=False, index=True)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True)
@@ -141,6 +204,44 @@ class OrderItem(Base):
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
 
+class DeliveryZone(Base):
+    """Зона доставки: многоугольник [[lat, lon], ...], стоимость и срок"""
+    __tablename__ = "delivery_zones"
+    id = Column(Integer, primary_key=True)
+    name_ru = Column(String(100), nullable=False)
+    name_uz = Column(String(100), nullable=False)
+    polygon = Column(sa.JSON, nullable=False)
+    fee = Column(Numeric(10, 2), nullable=False, default=0)
+    eta_minutes = Column(Integer, nullable=False, default=60)
+    priority = Column(Integer, nullable=False, default=0)  # при пересечении зон выигрывает больший
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class DeliveryBatch(Base):
+    """Рейс курьера: заказы одной зоны и слота в порядке маршрута"""
+    __tablename__ = "delivery_batches"
+    id = Column(Integer, primary_key=True)
+    status = Column(Enum(BatchStatusEnum), nullable=False, default=BatchStatusEnum.open)
+    delivery_zone_id = Column(Integer, ForeignKey("delivery_zones.id"))
+    slot_at = Column(DateTime)
+    route = Column(sa.JSON, nullable=False)  # id заказов в порядке объезда
+    distance_km = Column(Numeric(8, 2))
+    courier_id = Column(Integer, ForeignKey("users.id"))  # кому предложен / кто везет
+    declined_by = Column(sa.JSON, nullable=False, default=list)  # id курьеров, отказавшихся от рейса
+    offered_at = Column(DateTime)
+    accepted_at = Column(DateTime)
+    completed_at = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    courier = relationship("User")
+
+class DeliverySlot(Base):
+    """Счетчик бронирований слота доставки (одна строка на слот)"""
+    __tablename__ = "delivery_slots"
+    id = Column(Integer, primary_key=True)
+    slot_at = Column(DateTime, unique=True, nullable=False)  # начало периода доставки
+    booked = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class InventoryLog(Base):
     __tablename__ = "inventory_log"
     id = Column(Integer, primary_key=True)
@@ -224,15 +325,34 @@ class ConsultationMessage(Base):
     sender_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     message_text = Column(Text)
     photo_file_id = Column(String(255))
+    content_type = Column(String(32), default="text")  # text, photo, video, voice, document...
+    file_id = Column(String(255))  # file_id вложения любого типа
+    media_group_id = Column(String(64))  # Альбом
     created_at = Column(DateTime, default=datetime.utcnow)
     sent_at = Column(DateTime, default=datetime.utcnow)  
     consultation = relationship("Consultation", back_populates="messages")
     sender = relationship("User")
 
+class ConsultationArchivePart(Base):
+    """Часть архива консультации в канале (заголовок, текст или альбом)"""
+    __tablename__ = "consultation_archive_parts"
+    id = Column(Integer, primary_key=True)
+    consultation_id = Column(Integer, ForeignKey("consultations.id"), nullable=False)
+    part_no = Column(Integer, nullable=False)  # 0 - заголовок, дальше по порядку
+    kind = Column(String(16), nullable=False)  # header, text, photos
+    chat_id = Column(String(64), nullable=False)
+    message_ids = Column(sa.JSON, nullable=False)  # id сообщений части в канале
+    media = Column(sa.JSON)  # [[file_id, caption], ...] для альбомов
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        sa.UniqueConstraint("consultation_id", "part_no", name="uq_consultation_archive_parts_part"),
+    )
+
 class FloristReview(Base):
     __tablename__ = "florist_reviews"
     id = Column(Integer, primary_key=True)
-    consultation_id = Column(Integer, ForeignKey("consultations.id"), nullable=False)
+    consultation_id = Column(Integer, ForeignKey("consultations.id"), nullable=False, unique=True)  # Одна оценка на консультацию
     client_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     florist_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     rating = Column(Integer, nullable=False)  # 1-5 звезд
@@ -247,7 +367,7 @@ class Flower(Base):
     __tablename__ = "flowers"
     
     id = Column(Integer, primary_key=True)
-    name_ru = Column(String(255), nullable=False)
+    name_ru = Column(String(255), nullable=False)  # Ключ для импорта
     name_uz = Column(String(255), nullable=False)
     unit_type = Column(String(20), nullable=False)  # 'piece', 'bundle', 'kg'
     min_stock = Column(Integer, default=0)  # Минимальный остаток
@@ -261,12 +381,16 @@ class Flower(Base):
     movements = relationship("InventoryMovement", back_populates="flower")
     compositions = relationship("ProductComposition", back_populates="flower")
 
+    __table_args__ = (
+        sa.UniqueConstraint("name_ru", name="uq_flowers_name_ru"),
+    )
+
 class Supplier(Base):
     """Поставщики цветов"""
     __tablename__ = "suppliers"
     
     id = Column(Integer, primary_key=True)
-    name = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False)  # Ключ для импорта
     contact_person = Column(String(255))
     phone = Column(String(20))
     email = Column(String(255))
@@ -279,6 +403,10 @@ class Supplier(Base):
     supply_orders = relationship("SupplyOrder", back_populates="supplier")
     batches = relationship("InventoryBatch", back_populates="supplier")
 
+    __table_args__ = (
+        sa.UniqueConstraint("name", name="uq_suppliers_name"),
+    )
+
 class SupplyOrder(Base):
     """Заказы поставщикам"""
     __tablename__ = "supply_orders"
@@ -360,6 +488,9 @@ class InventoryMovement(Base):
 class ProductComposition(Base):
     """Состав продуктов (рецепты букетов)"""
     __tablename__ = "product_compositions"
+    __table_args__ = (
+        sa.UniqueConstraint("product_id", "flower_id", name="uq_product_compositions_product_flower"),
+    )
     
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -3,9 +3,15 @@
 from .user import UserRepository
 from .product import ProductRepository, CategoryRepository
 from .order import OrderRepository
+from .delivery_slot import DeliverySlotRepository
+from .delivery_zone import DeliveryZoneRepository
+from .delivery_batch import DeliveryBatchRepository
 from .settings import SettingsRepository
 from .florist import FloristRepository
 from .consultation import ConsultationRepository
+from .customer_stats import CustomerStatsRepository
+from .customer_segment import CustomerSegmentRepository
+from .recommendation import RecommendationRepository
 # 🆕 Новые репозитории склада
 from .inventory import (
     FlowerRepository, 
@@ -20,9 +26,15 @@ __all__ = [
     "ProductRepository", 
     "CategoryRepository",
     "OrderRepository",
+    "DeliverySlotRepository",
+    "DeliveryZoneRepository",
+    "DeliveryBatchRepository",
     "SettingsRepository",
     "FloristRepository",
     "ConsultationRepository",
+    "CustomerStatsRepository",
+    "CustomerSegmentRepository",
+    "RecommendationRepository",
     # Склад
     "FlowerRepository",
     "SupplierRepository", 
@@ -1,5 +1,7 @@
-from typing import List, Optional
-from sqlalchemy import select, and_
+import html
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import select, and_, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
@@ -11,6 +13,9 @@ from app.models import (
     ConsultationStatusEnum
 )
 
+# Маркеры подсветки в ts_headline: текст экранируется уже после подсветки
+_HL_START, _HL_STOP = "\x02", "\x03"
+
 class ConsultationRepository(BaseRepository[Consultation]):
     """Репозиторий для работы с консультациями"""
     
@@ -57,15 +62,15 @@ class ConsultationRepository(BaseRepository[Consultation]):
     
     async def complete_consultation(self, consultation_id: int, completed_by: str) -> Optional[Consultation]:
         """Завершить консультацию"""
+        from app.services.consultation_relay import finish_consultation, flush_consultation
+        
         consultation = await self.get(consultation_id)
         if consultation and consultation.status == ConsultationStatusEnum.active:
-            if completed_by == "client":
-                consultation.status = ConsultationStatusEnum.completed_by_client
-            elif completed_by == "florist":
-                consultation.status = ConsultationStatusEnum.completed_by_florist
-            
-            consultation.completed_at = datetime.utcnow()
+            status = (ConsultationStatusEnum.completed_by_client if completed_by == "client"
+                      else ConsultationStatusEnum.completed_by_florist)
+            finish_consultation(consultation, status)
             await self.session.flush()
+            await flush_consultation(consultation.id)
             return consultation
         return None
     
@@ -84,18 +89,21 @@ class ConsultationRepository(BaseRepository[Consultation]):
         return message
     
     async def add_review(self, consultation_id: int, client_id: int, 
-                        florist_id: int, rating: int) -> FloristReview:
-        """Добавить отзыв о флористе"""
-        review = FloristReview(
-            consultation_id=consultation_id,
-            client_id=client_id,
-            florist_id=florist_id,
-            rating=rating
+                        florist_id: int, rating: int) -> Optional[int]:
+        """Добавить отзыв о флористе, вернуть id или None, если консультация уже оценена"""
+        result = await self.session.execute(
+            pg_insert(FloristReview)
+            .values(
+                consultation_id=consultation_id,
+                client_id=client_id,
+                florist_id=florist_id,
+                rating=rating,
+                created_at=datetime.utcnow()
+            )
+            .on_conflict_do_nothing(index_elements=[FloristReview.consultation_id])
+            .returning(FloristReview.id)
         )
-        self.session.add(review)
-        await self.session.flush()
-        await self.session.refresh(review)
-        return review
+        return result.scalar_one_or_none()
     
     async def get_messages(self, consultation_id: int) -> List[ConsultationMessage]:
         """Получить сообщения консультации"""
@@ -123,4 +131,71 @@ class ConsultationRepository(BaseRepository[Consultation]):
                 )
             )
         )
-        return result.scalars().first()
\ No newline at end of file
+        return result.scalars().first()
+    
+    async def search_consultations(self, query: str, limit: int = 10,
+                                   after: Optional[Tuple[float, int]] = None) -> List[Dict[str, Any]]:
+        """Полнотекстовый поиск консультаций по переписке.
+
+        Консультации упорядочены по релевантности лучшего сообщения; after -
+        (rank, consultation_id) последней строки предыдущей страницы. Сниппет -
+        HTML с подсветкой совпадений в <b>.
+
+        Поиск идет по consultation_messages.search_vector (генерируемая колонка
+        tsvector с GIN-индексом, в модели не описана). Ищутся только консультации,
+        чьи сообщения еще в БД: задача prune_archived_messages удаляет переписку
+        старше TRANSCRIPT_RETENTION_DAYS (она остается в transcript_store), и такие
+        консультации в выдачу больше не попадают.
+        """
+        params = {"query": query, "limit": limit}
+        keyset = ""
+        if after:
+            keyset = "WHERE (h.rank, h.consultation_id) < (:after_rank, :after_id)"
+            params.update(after_rank=after[0], after_id=after[1])
+
+        result = await self.session.execute(
+            text(f"""
+                WITH q AS (
+                    SELECT websearch_to_tsquery('russian', :query) || websearch_to_tsquery('simple', :query) AS query
+                ),
+                hits AS (
+                    SELECT m.consultation_id,
+                           max(ts_rank(m.search_vector, q.query)) AS rank,
+                           (array_agg(m.id ORDER BY ts_rank(m.search_vector, q.query) DESC, m.id))[1] AS best_message_id,
+                           count(*) AS hits
+                    FROM consultation_messages m, q
+                    WHERE m.search_vector @@ q.query
+                    GROUP BY m.consultation_id
+                )
+                SELECT h.consultation_id, h.rank, h.hits,
+                       c.started_at, c.status,
+                       cl.first_name AS client_name, fl.first_name AS florist_name,
+                       ts_headline('russian', bm.message_text, q.query,
+                                   'StartSel=' || chr(2) || ', StopSel=' || chr(3) || ', MaxWords=25, MinWords=8') AS snippet
+                FROM hits h
+                JOIN consultations c ON c.id = h.consultation_id
+                JOIN consultation_messages bm ON bm.id = h.best_message_id
+                LEFT JOIN users cl ON cl.id = c.client_id
+                LEFT JOIN users fl ON fl.id = c.florist_id
+                CROSS JOIN q
+                {keyset}
+                ORDER BY h.rank DESC, h.consultation_id DESC
+                LIMIT :limit
+            """),
+            params
+        )
+
+        return [
+            {
+                "consultation_id": row.consultation_id,
+                "rank": row.rank,
+                "hits": row.hits,
+                "started_at": row.started_at,
+                "status": row.status,
+                "client_name": row.client_name or "Клиент",
+                "florist_name": row.florist_name or "Флорист",
+                "snippet": html.escape(row.snippet or "")
+                    .replace(_HL_START, "<b>").replace(_HL_STOP, "</b>"),
+            }
+            for row in result.all()
+        ]
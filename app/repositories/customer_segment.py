@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Callable, Dict, Optional, Sequence, Tuple
+from sqlalchemy import select, insert, delete, func, case, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from app.models import CustomerSegment, CustomerStats
+
+def _quintile(rank):
+    """percent_rank (0..1) -> балл 1..5; одинаковые значения получают одинаковый балл"""
+    return case((rank >= 0.8, 5), (rank >= 0.6, 4), (rank >= 0.4, 3), (rank >= 0.2, 2), else_=1)
+
+class CustomerSegmentRepository(BaseRepository[CustomerSegment]):
+    """Репозиторий RFM-сегментов.
+
+    Пересборка - один INSERT ... SELECT с оконными функциями по customer_stats:
+    строки клиентов не поднимаются в Python, квантили считает БД.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, CustomerSegment)
+
+    async def rebuild(self, rules: Sequence[Tuple[str, Callable]], default: str,
+                      computed_at: datetime) -> int:
+        """Пересчитать сегменты всех клиентов с заказами. rules - (сегмент, условие(r, f, m)) по приоритету"""
+        ranked = (
+            select(
+                CustomerStats.user_id,
+                func.percent_rank().over(order_by=CustomerStats.last_order_at).label("r"),
+                func.percent_rank().over(order_by=CustomerStats.orders_count).label("f"),
+                func.percent_rank().over(order_by=CustomerStats.total_spent).label("m")
+            )
+            .where(CustomerStats.orders_count > 0, CustomerStats.last_order_at.isnot(None))
+            .subquery()
+        )
+        scored = select(
+            ranked.c.user_id,
+            _quintile(ranked.c.r).label("r"),
+            _quintile(ranked.c.f).label("f"),
+            _quintile(ranked.c.m).label("m")
+        ).subquery()
+        segment = case(
+            *[(condition(scored.c.r, scored.c.f, scored.c.m), name) for name, condition in rules],
+            else_=default
+        )
+
+        await self.session.execute(delete(CustomerSegment))
+        result = await self.session.execute(
+            insert(CustomerSegment).from_select(
+                ["user_id", "recency_score", "frequency_score", "monetary_score", "segment", "computed_at"],
+                select(scored.c.user_id, scored.c.r, scored.c.f, scored.c.m, segment, literal(computed_at))
+            )
+        )
+        return result.rowcount
+
+    async def get_segment_counts(self) -> Dict[str, int]:
+        """Клиентов в каждом сегменте"""
+        result = await self.session.execute(
+            select(CustomerSegment.segment, func.count())
+            .group_by(CustomerSegment.segment)
+        )
+        return dict(result.all())
+
+    async def get_computed_at(self) -> Optional[datetime]:
+        result = await self.session.execute(select(func.max(CustomerSegment.computed_at)))
+        return result.scalar()
@@ -0,0 +1,76 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Sequence
+from sqlalchemy import select, update, func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from app.models import CustomerStats, Order
+
+class CustomerStatsRepository(BaseRepository[CustomerStats]):
+    """Репозиторий сводок по клиентам.
+    
+    Каждое изменение - один инкрементальный запрос в транзакции заказа,
+    поэтому сводка не расходится с заказами при откате.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, CustomerStats)
+    
+    async def record_order(self, user_id: int, created_at: datetime) -> None:
+        """Новый заказ: +1 к заказам и дата последнего"""
+        now = datetime.utcnow()
+        stmt = pg_insert(CustomerStats).values(
+            user_id=user_id, orders_count=1, delivered_count=0, total_spent=0,
+            first_order_at=created_at, last_order_at=created_at, updated_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CustomerStats.user_id],
+            set_={
+                "orders_count": CustomerStats.orders_count + 1,
+                "last_order_at": case(
+                    (CustomerStats.last_order_at > created_at, CustomerStats.last_order_at), else_=created_at
+                ),
+                "first_order_at": func.coalesce(CustomerStats.first_order_at, created_at),
+                "updated_at": now
+            }
+        )
+        await self.session.execute(stmt)
+    
+    async def record_canceled(self, user_id: int, delivered_total: Optional[Decimal] = None) -> None:
+        """Отмена заказа: -1 к заказам (и к доставленным, если отменили доставленный)"""
+        values = {
+            "orders_count": case((CustomerStats.orders_count > 0, CustomerStats.orders_count - 1), else_=0),
+            "updated_at": datetime.utcnow()
+        }
+        if delivered_total is not None:
+            values["delivered_count"] = CustomerStats.delivered_count - 1
+            values["total_spent"] = CustomerStats.total_spent - delivered_total
+        await self.session.execute(
+            update(CustomerStats).where(CustomerStats.user_id == user_id).values(**values)
+        )
+    
+    async def record_delivered(self, order_ids: Sequence[int]) -> None:
+        """Доставленные заказы: один UPDATE по всем их клиентам"""
+        if not order_ids:
+            return
+        delivered = (
+            select(
+                Order.user_id,
+                func.count(Order.id).label("delivered"),
+                func.sum(Order.total_price).label("spent")
+            )
+            .where(Order.id.in_(order_ids))
+            .group_by(Order.user_id)
+            .subquery()
+        )
+        await self.session.execute(
+            update(CustomerStats)
+            .where(CustomerStats.user_id == delivered.c.user_id)
+            .values(
+                delivered_count=CustomerStats.delivered_count + delivered.c.delivered,
+                total_spent=CustomerStats.total_spent + delivered.c.spent,
+                updated_at=datetime.utcnow()
+            )
+        )
@@ -0,0 +1,185 @@
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import select, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from .customer_stats import CustomerStatsRepository
+from app.models import (
+    DeliveryBatch, BatchStatusEnum, Order, OrderStatusEnum, User, RoleEnum
+)
+
+ACTIVE_BATCH_STATUSES = (BatchStatusEnum.offered, BatchStatusEnum.accepted, BatchStatusEnum.delivering)
+
+class DeliveryBatchRepository(BaseRepository[DeliveryBatch]):
+    """Репозиторий рейсов курьеров"""
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, DeliveryBatch)
+
+    async def get_unbatched_ready_orders(self, slot_before: datetime) -> List[Order]:
+        """Готовые заказы без рейса со слотом до slot_before (или без слота)"""
+        result = await self.session.execute(
+            select(Order)
+            .where(
+                Order.status == OrderStatusEnum.ready,
+                Order.batch_id.is_(None),
+                or_(Order.slot_at.is_(None), Order.slot_at < slot_before)
+            )
+            .order_by(Order.slot_at, Order.id)
+        )
+        return result.scalars().all()
+
+    async def create_batch(self, order_ids: List[int], zone_id: Optional[int], slot_at: Optional[datetime],
+                           distance_km: Optional[float]) -> Optional[DeliveryBatch]:
+        """Создать рейс и привязать к нему заказы одним UPDATE.
+
+        Заказы, которые успели попасть в другой рейс или сменить статус, пропускаются.
+        """
+        batch = DeliveryBatch(
+            status=BatchStatusEnum.open,
+            delivery_zone_id=zone_id,
+            slot_at=slot_at,
+            route=order_ids,
+            distance_km=distance_km,
+            declined_by=[]
+        )
+        self.session.add(batch)
+        await self.session.flush()
+
+        result = await self.session.execute(
+            update(Order)
+            .where(
+                Order.id.in_(order_ids),
+                Order.batch_id.is_(None),
+                Order.status == OrderStatusEnum.ready
+            )
+            .values(batch_id=batch.id)
+            .returning(Order.id)
+        )
+        attached = set(result.scalars().all())
+        if not attached:
+            await self.session.delete(batch)
+            return None
+
+        batch.route = [order_id for order_id in order_ids if order_id in attached]
+        return batch
+
+    async def get_open_batches(self) -> List[DeliveryBatch]:
+        """Рейсы без курьера, старые - первыми"""
+        result = await self.session.execute(
+            select(DeliveryBatch)
+            .where(DeliveryBatch.status == BatchStatusEnum.open)
+            .order_by(DeliveryBatch.slot_at, DeliveryBatch.id)
+            .execution_options(populate_existing=True)  # declined_by мог измениться UPDATE'ом в этой же сессии
+        )
+        return result.scalars().all()
+
+    async def get_free_couriers(self) -> List[User]:
+        """Курьеры без предложенного или активного рейса"""
+        busy = (
+            select(DeliveryBatch.courier_id)
+            .where(DeliveryBatch.status.in_(ACTIVE_BATCH_STATUSES), DeliveryBatch.courier_id.is_not(None))
+        )
+        result = await self.session.execute(
+            select(User)
+            .where(User.role == RoleEnum.courier, User.id.not_in(busy))
+            .order_by(User.id)
+        )
+        return result.scalars().all()
+
+    async def get_courier_batches(self, courier_id: int) -> List[DeliveryBatch]:
+        """Предложенные и активные рейсы курьера"""
+        result = await self.session.execute(
+            select(DeliveryBatch)
+            .where(DeliveryBatch.courier_id == courier_id, DeliveryBatch.status.in_(ACTIVE_BATCH_STATUSES))
+            .order_by(DeliveryBatch.id)
+        )
+        return result.scalars().all()
+
+    async def get_orders(self, batch_id: int, statuses: Tuple[OrderStatusEnum, ...] = None) -> List[Order]:
+        """Заказы рейса в порядке маршрута"""
+        query = select(Order).where(Order.batch_id == batch_id)
+        if statuses:
+            query = query.where(Order.status.in_(statuses))
+        result = await self.session.execute(query)
+        orders = {order.id: order for order in result.scalars().all()}
+
+        batch = await self.get(batch_id)
+        route = batch.route if batch else []
+        return [orders[order_id] for order_id in route if order_id in orders]
+
+    async def _transition(self, batch_id: int, from_status: BatchStatusEnum, values: dict,
+                          courier_id: int = None) -> bool:
+        """Условная смена статуса рейса: False, если рейс уже в другом состоянии"""
+        query = update(DeliveryBatch).where(
+            DeliveryBatch.id == batch_id,
+            DeliveryBatch.status == from_status
+        )
+        if courier_id is not None:
+            query = query.where(DeliveryBatch.courier_id == courier_id)
+        result = await self.session.execute(query.values(**values).returning(DeliveryBatch.id))
+        return result.scalar() is not None
+
+    async def offer(self, batch_id: int, courier_id: int) -> bool:
+        return await self._transition(batch_id, BatchStatusEnum.open, {
+            "status": BatchStatusEnum.offered, "courier_id": courier_id, "offered_at": datetime.utcnow()
+        })
+
+    async def accept(self, batch_id: int, courier_id: int) -> bool:
+        return await self._transition(batch_id, BatchStatusEnum.offered, {
+            "status": BatchStatusEnum.accepted, "accepted_at": datetime.utcnow()
+        }, courier_id)
+
+    async def decline(self, batch: DeliveryBatch, courier_id: int) -> bool:
+        """Вернуть рейс в очередь; курьер больше не получит его предложение"""
+        return await self._transition(batch.id, BatchStatusEnum.offered, {
+            "status": BatchStatusEnum.open,
+            "courier_id": None,
+            "offered_at": None,
+            "declined_by": list(batch.declined_by or []) + [courier_id]
+        }, courier_id)
+
+    async def get_expired_offers(self, offered_before: datetime) -> List[DeliveryBatch]:
+        """Предложения без ответа дольше таймаута"""
+        result = await self.session.execute(
+            select(DeliveryBatch)
+            .where(DeliveryBatch.status == BatchStatusEnum.offered, DeliveryBatch.offered_at < offered_before)
+        )
+        return result.scalars().all()
+
+    async def start(self, batch_id: int, courier_id: int) -> Optional[List[Tuple[int, int]]]:
+        """Курьер выехал: все готовые заказы рейса -> delivering одним UPDATE.
+        Возвращает [(id заказа, id клиента)] или None, если рейс не в статусе accepted"""
+        if not await self._transition(batch_id, BatchStatusEnum.accepted,
+                                      {"status": BatchStatusEnum.delivering}, courier_id):
+            return None
+        return await self._set_orders_status(batch_id, OrderStatusEnum.ready, OrderStatusEnum.delivering)
+
+    async def complete(self, batch_id: int, courier_id: int) -> Optional[List[Tuple[int, int]]]:
+        """Рейс доставлен: заказы в пути -> delivered одним UPDATE (None - рейс не в пути)"""
+        if not await self._transition(batch_id, BatchStatusEnum.delivering, {
+            "status": BatchStatusEnum.completed, "completed_at": datetime.utcnow()
+        }, courier_id):
+            return None
+        changed = await self._set_orders_status(batch_id, OrderStatusEnum.delivering, OrderStatusEnum.delivered)
+        await CustomerStatsRepository(self.session).record_delivered([order_id for order_id, _ in changed])
+        return changed
+
+    async def _set_orders_status(self, batch_id: int, from_status: OrderStatusEnum,
+                                 to_status: OrderStatusEnum) -> List[Tuple[int, int]]:
+        result = await self.session.execute(
+            update(Order)
+            .where(Order.batch_id == batch_id, Order.status == from_status)
+            .values(status=to_status)
+            .returning(Order.id, Order.user_id)
+        )
+        return [tuple(row) for row in result.all()]
+
+    async def close_empty(self, batch_id: int) -> None:
+        """Закрыть рейс, в котором не осталось заказов (все отменены)"""
+        await self.session.execute(
+            update(DeliveryBatch)
+            .where(DeliveryBatch.id == batch_id)
+            .values(status=BatchStatusEnum.completed, completed_at=datetime.utcnow())
+        )
@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import Dict
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from app.models import DeliverySlot
+
+class DeliverySlotRepository(BaseRepository[DeliverySlot]):
+    """Репозиторий счетчиков слотов доставки"""
+    
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, DeliverySlot)
+    
+    async def book(self, slot_at: datetime, capacity: int) -> bool:
+        """Занять место в слоте одним запросом: вставка или инкремент, если booked < capacity.
+        
+        False - слот заполнен. Откат транзакции заказа освобождает место.
+        """
+        if capacity <= 0:
+            return False
+        
+        stmt = pg_insert(DeliverySlot).values(slot_at=slot_at, booked=1, updated_at=datetime.utcnow())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DeliverySlot.slot_at],
+            set_={"booked": DeliverySlot.booked + 1, "updated_at": stmt.excluded.updated_at},
+            where=DeliverySlot.booked < capacity
+        ).returning(DeliverySlot.booked)
+        
+        result = await self.session.execute(stmt)
+        return result.scalar() is not None
+    
+    async def release(self, slot_at: datetime) -> None:
+        """Освободить место (отмена заказа)"""
+        await self.session.execute(
+            update(DeliverySlot)
+            .where(DeliverySlot.slot_at == slot_at, DeliverySlot.booked > 0)
+            .values(booked=DeliverySlot.booked - 1, updated_at=datetime.utcnow())
+        )
+    
+    async def get_booked(self, start: datetime, end: datetime) -> Dict[datetime, int]:
+        """Занятость слотов в интервале [start, end): {начало слота: бронирований}"""
+        result = await self.session.execute(
+            select(DeliverySlot.slot_at, DeliverySlot.booked)
+            .where(DeliverySlot.slot_at >= start, DeliverySlot.slot_at < end, DeliverySlot.booked > 0)
+        )
+        return {slot_at: booked for slot_at, booked in result.all()}
@@ -0,0 +1,29 @@
+from typing import List
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from app.models import DeliveryZone
+
+class DeliveryZoneRepository(BaseRepository[DeliveryZone]):
+    """Репозиторий зон доставки"""
+    
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, DeliveryZone)
+    
+    async def get_active(self) -> List[DeliveryZone]:
+        """Активные зоны"""
+        result = await self.session.execute(
+            select(DeliveryZone).where(DeliveryZone.is_active == True).order_by(DeliveryZone.id)
+        )
+        return result.scalars().all()
+    
+    async def replace_active(self, zones: List[dict]) -> List[DeliveryZone]:
+        """Заменить набор зон: старые деактивируются (на них ссылаются заказы)"""
+        await self.session.execute(
+            update(DeliveryZone).where(DeliveryZone.is_active == True).values(is_active=False)
+        )
+        created = [DeliveryZone(**zone) for zone in zones]
+        self.session.add_all(created)
+        await self.session.flush()
+        return created
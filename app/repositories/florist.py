@@ -1,10 +1,17 @@
-from typing import List, Optional
-from sqlalchemy import select, and_, func
+from typing import List, Optional, Sequence, Tuple
+from decimal import Decimal
+from sqlalchemy import select, update, and_, or_, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
 from .base import BaseRepository
-from app.models import FloristProfile, User, RoleEnum, FloristReview
+from app.models import (
+    FloristProfile, User, RoleEnum, FloristReview,
+    Order, OrderStatusEnum, Consultation, ConsultationStatusEnum
+)
+
+# Заказы, которые сейчас занимают флориста
+OPEN_ORDER_STATUSES = (OrderStatusEnum.accepted, OrderStatusEnum.preparing)
 
 class FloristRepository(BaseRepository[FloristProfile]):
     """Репозиторий для работы с флористами"""
@@ -34,6 +41,44 @@ class FloristRepository(BaseRepository[FloristProfile]):
         )
         return result.scalars().all()
     
+    async def get_least_loaded(self, online_since: datetime,
+                               exclude: Sequence[int] = ()) -> Optional[Tuple[User, int]]:
+        """Свободнейший активный флорист: (пользователь, нагрузка) или None.
+        
+        Нагрузка - заказы в работе + висящие на нем предложения + активные консультации.
+        Флористы, заходившие после online_since, идут раньше остальных.
+        """
+        open_orders = (
+            select(func.count(Order.id))
+            .where(Order.florist_id == User.id, Order.status.in_(OPEN_ORDER_STATUSES))
+            .scalar_subquery()
+        )
+        pending_offers = (
+            select(func.count(Order.id))
+            .where(Order.offered_florist_id == User.id, Order.status == OrderStatusEnum.new)
+            .scalar_subquery()
+        )
+        consultations = (
+            select(func.count(Consultation.id))
+            .where(Consultation.florist_id == User.id, Consultation.status == ConsultationStatusEnum.active)
+            .scalar_subquery()
+        )
+        load = (open_orders + pending_offers + consultations).label("load")
+        online = case((FloristProfile.last_seen >= online_since, 0), else_=1)
+        
+        query = (
+            select(User, load)
+            .join(FloristProfile, FloristProfile.user_id == User.id)
+            .where(User.role == RoleEnum.florist, FloristProfile.is_active == True)
+            .order_by(online, load, FloristProfile.last_seen.desc().nulls_last(), User.id)
+            .limit(1)
+        )
+        if exclude:
+            query = query.where(User.id.not_in(exclude))
+        
+        row = (await self.session.execute(query)).first()
+        return (row[0], row[1]) if row else None
+    
     async def update_last_seen(self, user_id: int) -> None:
         """Обновить время последней активности флориста"""
         profile = await self.get_by_user_id(user_id)
@@ -41,27 +86,63 @@ class FloristRepository(BaseRepository[FloristProfile]):
             profile.last_seen = datetime.utcnow()
             await self.session.flush()
     
-    async def update_rating(self, florist_id: int) -> None:
-        """Пересчитать рейтинг флориста на основе отзывов"""
-        # Получаем средний рейтинг и количество отзывов
+    async def add_rating(self, florist_id: int, rating: int) -> Optional[Tuple[Decimal, int]]:
+        """Учесть новую оценку одним атомарным UPDATE, вернуть (рейтинг, число отзывов)"""
+        count = func.coalesce(FloristProfile.reviews_count, 0)
         result = await self.session.execute(
+            update(FloristProfile)
+            .where(FloristProfile.user_id == florist_id)
+            .values(
+                rating=func.round(
+                    (func.coalesce(FloristProfile.rating, 0) * count + rating) / (count + 1), 2
+                ),
+                reviews_count=count + 1,
+                updated_at=datetime.utcnow()
+            )
+            .returning(FloristProfile.rating, FloristProfile.reviews_count)
+            .execution_options(synchronize_session=False)
+        )
+        row = result.first()
+        return (row.rating, row.reviews_count) if row else None
+    
+    async def update_rating(self, florist_id: int) -> None:
+        """Точно пересчитать рейтинг флориста по всем отзывам"""
+        await self.recompute_ratings(florist_id)
+    
+    async def recompute_ratings(self, florist_id: Optional[int] = None) -> int:
+        """Точный пересчет рейтингов по отзывам (исправляет накопленное округление).
+        
+        Обновляются только разошедшиеся профили, возвращается их количество.
+        """
+        stats = (
             select(
-                func.avg(FloristReview.rating).label('avg_rating'),
+                FloristReview.florist_id,
+                func.round(func.avg(FloristReview.rating), 2).label('avg_rating'),
                 func.count(FloristReview.id).label('reviews_count')
             )
-            .where(FloristReview.florist_id == florist_id)
+            .group_by(FloristReview.florist_id)
         )
+        if florist_id is not None:
+            stats = stats.where(FloristReview.florist_id == florist_id)
+        stats = stats.subquery()
         
-        stats = result.first()
-        avg_rating = float(stats.avg_rating) if stats.avg_rating else 0.0
-        reviews_count = stats.reviews_count or 0
-        
-        # Обновляем профиль флориста
-        profile = await self.get_by_user_id(florist_id)
-        if profile:
-            profile.rating = round(avg_rating, 2)
-            profile.reviews_count = reviews_count
-            await self.session.flush()
+        result = await self.session.execute(
+            update(FloristProfile)
+            .where(
+                FloristProfile.user_id == stats.c.florist_id,
+                or_(
+                    FloristProfile.rating.is_distinct_from(stats.c.avg_rating),
+                    FloristProfile.reviews_count.is_distinct_from(stats.c.reviews_count)
+                )
+            )
+            .values(
+                rating=stats.c.avg_rating,
+                reviews_count=stats.c.reviews_count,
+                updated_at=datetime.utcnow()
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
     
     async def create_or_get_profile(self, user_id: int) -> FloristProfile:
         """Создать или получить профиль флориста"""
@@ -1,7 +1,7 @@
 # app/repositories/inventory.py
 
-from typing import List, Optional, Dict, Any
-from datetime import datetime, date
+from typing import List, Optional, Dict, Any, AsyncIterator
+from datetime import datetime, date, time, timedelta
 from sqlalchemy import select, func, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
@@ -228,20 +228,67 @@ class MovementRepository(BaseRepository[InventoryMovement]):
         )
         return result.scalars().all()
     
+    @staticmethod
+    def _period_bounds(start_date: date, end_date: date):
+        """Полуоткрытый интервал [start, end + 1 день) для индекса по created_at"""
+        return (
+            datetime.combine(start_date, time.min),
+            datetime.combine(end_date + timedelta(days=1), time.min)
+        )
+    
     async def get_movements_by_period(self, start_date: date, end_date: date) -> List[InventoryMovement]:
         """Получить движения за период"""
+        period_start, period_end = self._period_bounds(start_date, end_date)
+        
         result = await self.session.execute(
             select(InventoryMovement)
             .where(
                 and_(
-                    func.date(InventoryMovement.created_at) >= start_date,
-                    func.date(InventoryMovement.created_at) <= end_date
+                    InventoryMovement.created_at >= period_start,
+                    InventoryMovement.created_at < period_end
                 )
             )
             .order_by(InventoryMovement.created_at.desc())
         )
         return result.scalars().all()
     
+    async def stream_movements_by_period(
+        self, start_date: date, end_date: date, chunk_size: int = 1000
+    ) -> AsyncIterator[Any]:
+        """Потоково выдать движения за период (серверный курсор, без загрузки в память)"""
+        period_start, period_end = self._period_bounds(start_date, end_date)
+        
+        # Берем только нужные колонки: строки, а не ORM объекты
+        query = (
+            select(
+                InventoryMovement.id,
+                InventoryMovement.created_at,
+                InventoryMovement.flower_id,
+                Flower.name_ru.label("flower_name"),
+                InventoryMovement.movement_type,
+                InventoryMovement.quantity,
+                InventoryMovement.batch_id,
+                InventoryMovement.order_id,
+                InventoryMovement.supply_order_id,
+                InventoryMovement.performed_by,
+                InventoryMovement.reason
+            )
+            .join(Flower, Flower.id == InventoryMovement.flower_id)
+            .where(
+                and_(
+                    InventoryMovement.created_at >= period_start,
+                    InventoryMovement.created_at < period_end
+                )
+            )
+            .order_by(InventoryMovement.created_at, InventoryMovement.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        
+        result = await self.session.stream(query)
+        async for partition in result.partitions(chunk_size):
+            for row in partition:
+                yield row
+    
     async def create_movement(self, movement_data: Dict[str, Any]) -> InventoryMovement:
         """Создать движение"""
         movement = InventoryMovement(**movement_data)
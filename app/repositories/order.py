@@ -1,5 +1,7 @@
-from typing import List, Optional
-from sqlalchemy import select
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import select, update, func, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base import BaseRepository
@@ -20,6 +22,44 @@ class OrderRepository(BaseRepository[Order]):
         )
         return result.scalars().all()
     
+    async def get_user_orders_page(self, user_id: int, limit: int,
+                                   statuses: Sequence[OrderStatusEnum] = None,
+                                   before: Tuple[datetime, int] = None,
+                                   after: Tuple[datetime, int] = None) -> Tuple[List[Order], bool]:
+        """Страница заказов пользователя, новые первыми (keyset по (created_at, id)).
+        
+        before - курсор последнего заказа предыдущей страницы (листаем к старым),
+        after - первого (листаем к новым). Возвращает (заказы, есть ли еще в ту же сторону).
+        """
+        key = tuple_(Order.created_at, Order.id)
+        query = select(Order).where(Order.user_id == user_id)
+        if statuses:
+            query = query.where(Order.status.in_(statuses))
+        
+        if after:
+            query = query.where(key > tuple_(*after)).order_by(Order.created_at, Order.id)
+        else:
+            if before:
+                query = query.where(key < tuple_(*before))
+            query = query.order_by(Order.created_at.desc(), Order.id.desc())
+        
+        result = await self.session.execute(query.limit(limit + 1))
+        orders = result.scalars().all()
+        has_more = len(orders) > limit
+        orders = orders[:limit]
+        if after:
+            orders.reverse()
+        return orders, has_more
+    
+    async def get_user_stats(self, user_id: int) -> Dict[OrderStatusEnum, Tuple[int, Decimal]]:
+        """Число заказов и сумма по статусам одним GROUP BY"""
+        result = await self.session.execute(
+            select(Order.status, func.count(Order.id), func.coalesce(func.sum(Order.total_price), 0))
+            .where(Order.user_id == user_id)
+            .group_by(Order.status)
+        )
+        return {status: (count, Decimal(str(total))) for status, count, total in result.all()}
+    
     async def get_orders_by_status(self, status: OrderStatusEnum) -> List[Order]:
         """Получить заказы по статусу"""
         result = await self.session.execute(
@@ -45,4 +85,87 @@ class OrderRepository(BaseRepository[Order]):
     
     async def update_status(self, order_id: int, status: OrderStatusEnum) -> Optional[Order]:
         """Обновить статус заказа"""
-        return await self.update(order_id, {"status": status})
\ No newline at end of file
+        return await self.update(order_id, {"status": status})
+    
+    async def claim(self, order_id: int, florist_id: int) -> bool:
+        """Принять заказ одним условным UPDATE: False, если его уже принял другой или он отменен"""
+        result = await self.session.execute(
+            update(Order)
+            .where(
+                Order.id == order_id,
+                Order.status.in_((OrderStatusEnum.new, OrderStatusEnum.await_florist))
+            )
+            .values(
+                status=OrderStatusEnum.accepted,
+                florist_id=florist_id,
+                offered_florist_id=None,
+                offered_at=None
+            )
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+    
+    async def offer_to(self, order_id: int, florist_id: int) -> bool:
+        """Закрепить предложение нового заказа за флористом (если оно еще ни за кем)"""
+        result = await self.session.execute(
+            update(Order)
+            .where(
+                Order.id == order_id,
+                Order.status == OrderStatusEnum.new,
+                Order.offered_florist_id.is_(None)
+            )
+            .values(offered_florist_id=florist_id, offered_at=datetime.utcnow())
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+    
+    async def skip_offer(self, order: Order, florist_id: int) -> bool:
+        """Снять предложение с флориста (отказ или таймаут); больше он этот заказ не получит"""
+        result = await self.session.execute(
+            update(Order)
+            .where(
+                Order.id == order.id,
+                Order.status == OrderStatusEnum.new,
+                Order.offered_florist_id == florist_id
+            )
+            .values(
+                offered_florist_id=None,
+                offered_at=None,
+                offer_skipped=list(order.offer_skipped or []) + [florist_id]
+            )
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+    
+    async def escalate(self, order_id: int) -> bool:
+        """Никто из флористов не взял заказ: new -> await_florist (в общий канал)"""
+        result = await self.session.execute(
+            update(Order)
+            .where(Order.id == order_id, Order.status == OrderStatusEnum.new)
+            .values(status=OrderStatusEnum.await_florist, offered_florist_id=None, offered_at=None)
+            .returning(Order.id)
+        )
+        return result.scalar() is not None
+    
+    async def get_expired_offers(self, offered_before: datetime) -> List[Order]:
+        """Предложения без ответа дольше таймаута"""
+        result = await self.session.execute(
+            select(Order)
+            .where(Order.status == OrderStatusEnum.new, Order.offered_at < offered_before)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().all()
+    
+    async def get_unoffered(self, created_after: datetime) -> List[Order]:
+        """Новые заказы, которые сейчас никому не предложены"""
+        result = await self.session.execute(
+            select(Order)
+            .where(
+                Order.status == OrderStatusEnum.new,
+                Order.offered_florist_id.is_(None),
+                Order.created_at >= created_after
+            )
+            .order_by(Order.id)
+            .execution_options(populate_existing=True)
+        )
+        return result.scalars().all()
@@ -1,9 +1,10 @@
 from typing import Optional, List
-from sqlalchemy import select
+from sqlalchemy import select, or_, func, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base import BaseRepository
 from app.models import Product, Category
+from app.utils.translit import transliterate
 
 class CategoryRepository(BaseRepository[Category]):
     """Репозиторий для работы с категориями"""
@@ -33,8 +34,8 @@ class ProductRepository(BaseRepository[Product]):
         result = await self.session.execute(query)
         return result.scalars().all()
     
-    async def get_active_products(self, limit: int = 100) -> List[Product]:
-        """Получить активные товары"""
+    async def get_active_products(self, limit: Optional[int] = 100) -> List[Product]:
+        """Получить активные товары (limit=None - все)"""
         result = await self.session.execute(
             select(Product)
             .where(Product.is_active == True)
@@ -42,6 +43,44 @@ class ProductRepository(BaseRepository[Product]):
         )
         return result.scalars().all()
     
+    async def get_by_ids(self, product_ids: List[int]) -> List[Product]:
+        """Получить активные товары по списку id в том же порядке"""
+        if not product_ids:
+            return []
+        result = await self.session.execute(
+            select(Product).where(Product.id.in_(product_ids), Product.is_active == True)
+        )
+        by_id = {product.id: product for product in result.scalars().all()}
+        return [by_id[product_id] for product_id in product_ids if product_id in by_id]
+    
+    async def search(self, query: str, limit: int = 20) -> List[Product]:
+        """Нечеткий поиск по названиям и описаниям на обоих языках (pg_trgm).
+        
+        Запрос и ключ поиска приводятся к латинице, поэтому «атиргул» находит
+        «atirgul». Подстрока ищется через LIKE, опечатки - через word similarity;
+        оба условия обслуживает GIN-индекс idx_products_search_trgm.
+        """
+        search_query = transliterate(query).strip()
+        if not search_query:
+            return []
+        
+        key = func.florange_product_search_key(
+            Product.name_ru, Product.name_uz, Product.desc_ru, Product.desc_uz
+        )
+        result = await self.session.execute(
+            select(Product)
+            .where(
+                Product.is_active == True,
+                or_(
+                    key.contains(search_query, autoescape=True),
+                    literal(search_query).op("<%")(key)
+                )
+            )
+            .order_by(func.word_similarity(search_query, key).desc(), Product.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+    
     async def update_stock(self, product_id: int, quantity: int) -> Optional[Product]:
         """Обновить количество на складе"""
         return await self.update(product_id, {"stock_qty": quantity})
\ No newline at end of file
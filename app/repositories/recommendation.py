@@ -0,0 +1,102 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .base import BaseRepository
+from app.models import ProductPopularity, ProductPair, Product, Order, OrderItem, OrderStatusEnum
+
+class RecommendationRepository(BaseRepository[ProductPopularity]):
+    """Репозиторий рекомендаций: популярность и пары товаров.
+    
+    Таблицы пополняются задачей обслуживания, каталог только читает из них
+    по индексу - без агрегаций по order_items.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        super().__init__(session, ProductPopularity)
+    
+    async def get_new_order_lines(self, after_order_id: int,
+                                  created_before: datetime) -> List[Tuple[int, datetime, int, int]]:
+        """Позиции неотмененных заказов после водяного знака: (заказ, создан, товар, штук)"""
+        result = await self.session.execute(
+            select(Order.id, Order.created_at, OrderItem.product_id, OrderItem.qty)
+            .join(OrderItem, OrderItem.order_id == Order.id)
+            .where(
+                Order.id > after_order_id,
+                Order.created_at < created_before,
+                Order.status != OrderStatusEnum.canceled
+            )
+            .order_by(Order.id)
+        )
+        return [tuple(row) for row in result.all()]
+    
+    async def decay(self, factor: float, min_score: float) -> None:
+        """Состарить все оценки одним UPDATE на таблицу и убрать выдохшиеся"""
+        for model in (ProductPopularity, ProductPair):
+            await self.session.execute(update(model).values(score=model.score * factor))
+            await self.session.execute(delete(model).where(model.score < min_score))
+    
+    async def add_popularity(self, scores: Dict[int, float]) -> None:
+        if not scores:
+            return
+        now = datetime.utcnow()
+        stmt = pg_insert(ProductPopularity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductPopularity.product_id],
+            set_={"score": ProductPopularity.score + stmt.excluded.score, "updated_at": now}
+        )
+        await self.session.execute(stmt, [
+            {"product_id": product_id, "score": score, "updated_at": now}
+            for product_id, score in scores.items()
+        ])
+    
+    async def add_pairs(self, scores: Dict[Tuple[int, int], float]) -> None:
+        if not scores:
+            return
+        stmt = pg_insert(ProductPair)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProductPair.product_id, ProductPair.related_id],
+            set_={"score": ProductPair.score + stmt.excluded.score}
+        )
+        await self.session.execute(stmt, [
+            {"product_id": product_id, "related_id": related_id, "score": score}
+            for (product_id, related_id), score in scores.items()
+        ])
+    
+    async def prune_pairs(self, keep: int) -> int:
+        """Оставить у каждого товара keep лучших пар"""
+        better = aliased(ProductPair)
+        rank = (
+            select(func.count())
+            .where(
+                better.product_id == ProductPair.product_id,
+                (better.score > ProductPair.score)
+                | ((better.score == ProductPair.score) & (better.related_id < ProductPair.related_id))
+            )
+            .scalar_subquery()
+        )
+        result = await self.session.execute(delete(ProductPair).where(rank >= keep))
+        return result.rowcount
+    
+    async def get_popular_products(self, limit: int) -> List[Product]:
+        result = await self.session.execute(
+            select(Product)
+            .join(ProductPopularity, ProductPopularity.product_id == Product.id)
+            .where(Product.is_active == True)
+            .order_by(ProductPopularity.score.desc(), Product.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
+    
+    async def get_related_products(self, product_id: int, limit: int) -> List[Product]:
+        result = await self.session.execute(
+            select(Product)
+            .join(ProductPair, ProductPair.related_id == Product.id)
+            .where(ProductPair.product_id == product_id, Product.is_active == True)
+            .order_by(ProductPair.score.desc(), Product.id)
+            .limit(limit)
+        )
+        return result.scalars().all()
@@ -36,4 +36,21 @@ class SettingsRepository(BaseRepository[Settings]):
         setting = await self.get_by_key(key)
         if not setting:
             return default
-        return setting.value.lower() in ("true", "1", "yes")
\ No newline at end of file
+        return setting.value.lower() in ("true", "1", "yes")
+    
+    async def get_int_value(self, key: str, default: int = 0) -> int:
+        """Получить целое значение настройки"""
+        setting = await self.get_by_key(key)
+        if not setting:
+            return default
+        try:
+            return int(setting.value)
+        except ValueError:
+            return default
+    
+    async def get_by_prefix(self, prefix: str) -> dict:
+        """Настройки, ключ которых начинается с prefix: {ключ: значение}"""
+        result = await self.session.execute(
+            select(Settings).where(Settings.key.startswith(prefix, autoescape=True))
+        )
+        return {setting.key: setting.value for setting in result.scalars().all()}
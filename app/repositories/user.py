@@ -1,5 +1,5 @@
 from typing import Optional
-from sqlalchemy import select
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base import BaseRepository
@@ -25,6 +25,13 @@ class UserRepository(BaseRepository[User]):
         )
         return result.scalars().all()
     
+    async def get_staff(self, roles) -> list[User]:
+        """Пользователи с любой из ролей одним запросом"""
+        result = await self.session.execute(
+            select(User).where(User.role.in_(roles)).order_by(User.id)
+        )
+        return result.scalars().all()
+    
     async def create_role_request(self, user_id: int, requested_role: str, reason: str) -> RoleRequest:
         """Создать заявку на роль"""
         request = RoleRequest(
@@ -40,4 +47,11 @@ class UserRepository(BaseRepository[User]):
         result = await self.session.execute(
             select(RoleRequest).where(RoleRequest.status == RequestStatusEnum.pending)
         )
-        return result.scalars().all()
\ No newline at end of file
+        return result.scalars().all()
+    
+    async def count_pending_requests(self) -> int:
+        """Количество ожидающих заявок"""
+        result = await self.session.execute(
+            select(func.count(RoleRequest.id)).where(RoleRequest.status == RequestStatusEnum.pending)
+        )
+        return result.scalar() or 0
@@ -23,6 +23,10 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     """Создание заказа"""
     slot_at: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    delivery_zone_id: Optional[int] = None
+    delivery_fee: Optional[Decimal] = None
 
 class OrderResponse(OrderBase):
     """Ответ с данными заказа"""
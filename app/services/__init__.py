@@ -5,6 +5,7 @@ from .notification_service import NotificationService
 from .florist_service import FloristService
 from .consultation_service import ConsultationService
 from .ai_archive_service import AIArchiveService
+from .inventory_export_service import InventoryExportService
 
 __all__ = [
     "UserService",
@@ -13,5 +14,6 @@ __all__ = [
     "NotificationService",
     "FloristService",
     "ConsultationService",
-    "AIArchiveService"
+    "AIArchiveService",
+    "InventoryExportService"
 ]
\ No newline at end of file
@@ -1,135 +1,473 @@
 # ✅ app/services/ai_archive_service.py
-# 
-# ИНСТРУКЦИЯ: СОЗДАЙТЕ НОВЫЙ ФАЙЛ
 
+"""Архивирование завершенных консультаций в канал.
+
+Полная переписка публикуется в архивном канале ответами на заголовок:
+тексты склеиваются до лимита Telegram, фото уходят альбомами. id каждой
+опубликованной части сохраняются в consultation_archive_parts, поэтому
+архивирование можно продолжить после сбоя, а восстановление отдает
+переписку страницами без повторного чтения сообщений из БД.
+
+Вся переписка также сохраняется сжатым файлом в transcript_store: просмотр
+истории читает его постранично, а строки consultation_messages после срока
+хранения удаляются.
+
+Архивирование идет в фоне через archive_queue - завершение консультации
+его не ждет.
+"""
+
+import asyncio
+import html
 import os
-from typing import Optional
 from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from aiogram import types
+from aiogram.exceptions import TelegramRetryAfter
+from sqlalchemy import select, func
+from sqlalchemy.orm import selectinload
 
 from app.database.database import get_session
-from app.models import Consultation, ConsultationMessage
+from app.models import (
+    Consultation, ConsultationMessage, ConsultationArchivePart, ConsultationStatusEnum
+)
+from app.services.consultation_relay import flush_consultation
+from app.services.transcript_store import transcript_store
+from app.utils.message_packing import pack_messages
+
+# Завершенные консультации, включая старые статусы "кто завершил"
+COMPLETED_STATUSES = (
+    ConsultationStatusEnum.completed,
+    ConsultationStatusEnum.completed_by_client,
+    ConsultationStatusEnum.completed_by_florist,
+)
+
+# Частей архива в канале на одной странице восстановления
+ARCHIVE_PAGE_SIZE = 10
+
+# Сообщений из файла переписки на одной странице восстановления
+ARCHIVE_PAGE_MESSAGES = 30
+
+# Подписи для вложений, которые не публикуются альбомом
+MEDIA_LABELS = {
+    "photo": "🖼 Фото",
+    "video": "🎬 Видео",
+    "animation": "🎞 GIF",
+    "document": "📎 Файл",
+    "audio": "🎵 Аудио",
+    "voice": "🎤 Голосовое сообщение",
+    "video_note": "📹 Видеосообщение",
+    "sticker": "🏷 Стикер",
+}
+
+def transcript_meta(consultation, messages) -> Dict[str, Any]:
+    """Сводка консультации для заголовка архива и файла переписки"""
+    return {
+        "consultation_id": consultation.id,
+        "client_id": consultation.client_id,
+        "client_name": consultation.client.first_name or "Клиент",
+        "florist_id": consultation.florist_id,
+        "florist_name": consultation.florist.first_name or "Флорист",
+        "started_at": consultation.started_at.isoformat() if consultation.started_at else None,
+        "completed_at": consultation.completed_at.isoformat() if consultation.completed_at else None,
+        "status": consultation.status.value,
+        "client_messages": sum(1 for msg in messages if msg.sender_id == consultation.client_id),
+        "florist_messages": sum(1 for msg in messages if msg.sender_id == consultation.florist_id),
+        "message_count": len(messages),
+    }
+
+def render_transcript_items(meta: Dict[str, Any], messages) -> List[Dict[str, Any]]:
+    """Сообщения консультации в элементы для pack_messages"""
+    names = {
+        meta["client_id"]: meta["client_name"],
+        meta["florist_id"]: meta["florist_name"],
+    }
+
+    items = []
+    for msg in messages:
+        name = names.get(msg.sender_id, "Участник")
+        time = msg.created_at.strftime("%H:%M") if msg.created_at else "--:--"
+        text = msg.message_text or ""
+        content_type = msg.content_type or ("photo" if msg.photo_file_id else "text")
+        file_id = msg.file_id or msg.photo_file_id
 
+        if content_type == "photo" and file_id:
+            caption = f"{name}, {time}: {text}" if text else f"{name}, {time}"
+            items.append({"photo": file_id, "text": caption})
+        elif content_type == "text":
+            items.append({"text": f"[{time}] {name}: {text}"})
+        else:
+            label = MEDIA_LABELS.get(content_type, "📎 Вложение")
+            items.append({"text": f"[{time}] {name}: {label}" + (f" - {text}" if text else "")})
+
+    return items
+
+async def _call_with_retry(method, **kwargs):
+    """Вызвать метод Bot API, при флуд-контроле ждать и повторять"""
+    for _ in range(3):
+        try:
+            return await method(**kwargs)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+    return await method(**kwargs)
+
+async def send_packet(bot, chat_id, packet: Dict[str, Any],
+                      reply_to_message_id: Optional[int] = None) -> List[types.Message]:
+    """Отправить пакет из pack_messages, вернуть отправленные сообщения"""
+    if packet["type"] == "text":
+        sent = await _call_with_retry(
+            bot.send_message, chat_id=chat_id, text=packet["text"],
+            reply_to_message_id=reply_to_message_id
+        )
+        return [sent]
+
+    if len(packet["photos"]) == 1:
+        file_id, caption = packet["photos"][0]
+        sent = await _call_with_retry(
+            bot.send_photo, chat_id=chat_id, photo=file_id, caption=caption,
+            reply_to_message_id=reply_to_message_id
+        )
+        return [sent]
+
+    media = [types.InputMediaPhoto(media=file_id, caption=caption) for file_id, caption in packet["photos"]]
+    return await _call_with_retry(
+        bot.send_media_group, chat_id=chat_id, media=media,
+        reply_to_message_id=reply_to_message_id
+    )
 
 class AIArchiveService:
     """
     Сервис для архивирования консультаций в канал
-    
-    Пока простая заглушка - в будущем можно добавить:
+
+    В будущем можно добавить:
     - Генерацию красивого отчета с помощью AI
-    - Отправку в специальный архивный канал
     - Поиск по архиву
     """
-    
+
     def __init__(self, bot):
         self.bot = bot
         self.archive_channel_id = os.getenv("ARCHIVE_CHANNEL_ID")
-    
+
     async def archive_consultation_to_channel(self, consultation_id: int) -> Optional[str]:
         """
-        Архивирует консультацию в канал
-        Возвращает ID архива или None при ошибке
+        Архивирует полную переписку консультации в канал и в transcript_store.
+        Возвращает ID архива или None, если консультация не найдена.
+
+        Уже опубликованные части пропускаются, поэтому повторный вызов после
+        ошибки продолжает с места остановки. Ошибки Telegram пробрасываются -
+        повторами занимается archive_queue.
         """
-        
-        try:
-            # Получаем данные консультации
-            async for session in get_session():
-                consultation = await session.get(Consultation, consultation_id)
-                if not consultation:
-                    return None
-                
-                await session.refresh(consultation, ['client', 'florist'])
-                
-                # Получаем сообщения
-                from sqlalchemy import select
-                messages_result = await session.execute(
-                    select(ConsultationMessage)
-                    .where(ConsultationMessage.consultation_id == consultation_id)
-                    .order_by(ConsultationMessage.created_at)
-                )
-                messages = messages_result.scalars().all()
-                
-                # Формируем архивный отчет
-                archive_text = self._generate_archive_text(consultation, messages)
-                
-                # Если есть канал - отправляем туда
+        async for session in get_session():
+            result = await session.execute(
+                select(Consultation)
+                .options(selectinload(Consultation.client), selectinload(Consultation.florist))
+                .where(Consultation.id == consultation_id)
+            )
+            consultation = result.scalars().first()
+            if not consultation:
+                return None
+
+            # archive_id выставляется только после записи переписки
+            if consultation.archive_id and await transcript_store.exists(consultation.archive_id):
+                return consultation.archive_id
+
+            messages_result = await session.execute(
+                select(ConsultationMessage)
+                .where(ConsultationMessage.consultation_id == consultation_id)
+                .order_by(ConsultationMessage.created_at, ConsultationMessage.id)
+            )
+            messages = messages_result.scalars().all()
+            meta = transcript_meta(consultation, messages)
+
+            archive_id = consultation.archive_id
+            if not archive_id:
                 if self.archive_channel_id:
-                    try:
-                        archive_message = await self.bot.send_message(
-                            chat_id=self.archive_channel_id,
-                            text=archive_text,
-                            parse_mode="HTML"
-                        )
-                        
-                        # Возвращаем ID сообщения как ID архива
-                        return f"archive_{archive_message.message_id}"
-                        
-                    except Exception as e:
-                        print(f"Error sending to archive channel: {e}")
-                        return None
+                    archive_id = await self._publish_to_channel(session, meta, messages)
                 else:
-                    # Если канала нет, просто логируем
-                    print(f"📋 Archive for consultation {consultation_id}:")
-                    print(archive_text)
-                    return f"local_archive_{consultation_id}_{int(datetime.utcnow().timestamp())}"
-                    
-        except Exception as e:
-            print(f"Archive error: {e}")
-            return None
-    
-    async def restore_consultation_from_archive(self, chat_id: int, archive_id: str) -> bool:
+                    archive_id = f"local_archive_{consultation_id}"
+
+            await transcript_store.save(archive_id, meta, messages)
+
+            consultation.archive_id = archive_id
+            await session.commit()
+
+            print(f"📦 Consultation {consultation_id} archived: {len(messages)} messages")
+            return archive_id
+
+    async def _publish_to_channel(self, session, meta: Dict[str, Any], messages) -> str:
+        """Опубликовать заголовок и переписку в канал, вернуть ID архива"""
+        consultation_id = meta["consultation_id"]
+        packets = pack_messages(render_transcript_items(meta, messages))
+
+        parts_result = await session.execute(
+            select(ConsultationArchivePart)
+            .where(ConsultationArchivePart.consultation_id == consultation_id)
+        )
+        done = {part.part_no: part for part in parts_result.scalars().all()}
+
+        header = done.get(0)
+        if not header:
+            sent = await _call_with_retry(
+                self.bot.send_message,
+                chat_id=self.archive_channel_id,
+                text=self._generate_archive_text(meta),
+                parse_mode="HTML"
+            )
+            header = self._add_part(session, consultation_id, 0, "header", [sent])
+            await session.commit()
+
+        header_message_id = header.message_ids[0]
+
+        # Переписка - ответами на заголовок
+        for part_no, packet in enumerate(packets, start=1):
+            if part_no in done:
+                continue
+            sent = await send_packet(
+                self.bot, self.archive_channel_id, packet,
+                reply_to_message_id=header_message_id
+            )
+            self._add_part(session, consultation_id, part_no, packet["type"], sent, packet)
+            await session.commit()
+
+        return f"archive_{header_message_id}"
+
+    def _add_part(self, session, consultation_id: int, part_no: int, kind: str,
+                  sent: List[types.Message], packet: Dict[str, Any] = None) -> ConsultationArchivePart:
+        """Записать опубликованную часть архива"""
+        media = None
+        if kind == "photos":
+            # file_id из канала + подписи - для восстановления альбомом
+            media = [
+                [msg.photo[-1].file_id, caption]
+                for msg, (_, caption) in zip(sent, packet["photos"])
+            ]
+
+        part = ConsultationArchivePart(
+            consultation_id=consultation_id,
+            part_no=part_no,
+            kind=kind,
+            chat_id=str(self.archive_channel_id),
+            message_ids=[msg.message_id for msg in sent],
+            media=media
+        )
+        session.add(part)
+        return part
+
+    async def restore_consultation_from_archive(self, chat_id: int, consultation_id: int, page: int = 0) -> bool:
         """
-        Восстанавливает консультацию из архива в чат
+        Восстанавливает страницу архива консультации в чат.
         Возвращает True если успешно
         """
-        
+
         try:
-            # Пока простая заглушка
-            await self.bot.send_message(
-                chat_id=chat_id,
-                text=f"📖 Восстановление архива {archive_id}\n\n"
-                     f"🔧 Функция в разработке. Скоро здесь будет полная история консультации.",
-                parse_mode="HTML"
-            )
-            return True
-            
+            async for session in get_session():
+                consultation = await session.get(Consultation, consultation_id)
+                if not consultation or not consultation.archive_id:
+                    return False
+
+                # Источники по порядку: файл переписки, части в канале, сообщения в БД
+                pages = await self._restore_from_transcript(chat_id, consultation.archive_id, page)
+                if pages is None:
+                    pages = await self._restore_from_parts(session, chat_id, consultation_id, page)
+                if pages is None:
+                    pages = await self._restore_from_messages(session, chat_id, consultation_id, page)
+                if pages is None:
+                    return False
+
+                if page + 1 < pages:
+                    await self.bot.send_message(
+                        chat_id=chat_id,
+                        text=f"📖 Страница {page + 1} из {pages}",
+                        reply_markup=types.InlineKeyboardMarkup(inline_keyboard=[[
+                            types.InlineKeyboardButton(
+                                text="▶️ Дальше",
+                                callback_data=f"archive_page_{consultation_id}_{page + 1}"
+                            )
+                        ]])
+                    )
+                return True
+
         except Exception as e:
             print(f"Restore error: {e}")
             return False
-    
-    def _generate_archive_text(self, consultation, messages) -> str:
-        """Генерирует текст архива консультации"""
-        
+
+    async def _restore_from_transcript(self, chat_id: int, archive_id: str, page: int) -> Optional[int]:
+        """Страница из сжатой переписки, вернуть число страниц"""
+        loaded = await transcript_store.read_page(
+            archive_id, page * ARCHIVE_PAGE_MESSAGES, ARCHIVE_PAGE_MESSAGES
+        )
+        if loaded is None:
+            return None
+        meta, messages = loaded
+
+        if page == 0:
+            await self.bot.send_message(chat_id=chat_id, text=self._generate_archive_text(meta), parse_mode="HTML")
+
+        for packet in pack_messages(render_transcript_items(meta, messages)):
+            await send_packet(self.bot, chat_id, packet)
+
+        return max((meta["message_count"] - 1) // ARCHIVE_PAGE_MESSAGES + 1, 1)
+
+    async def _restore_from_parts(self, session, chat_id: int, consultation_id: int, page: int) -> Optional[int]:
+        """Страница из частей архива в канале, вернуть число страниц"""
+        total_parts = (await session.execute(
+            select(func.count(ConsultationArchivePart.id))
+            .where(ConsultationArchivePart.consultation_id == consultation_id)
+        )).scalar() or 0
+        if not total_parts:
+            return None
+
+        result = await session.execute(
+            select(ConsultationArchivePart)
+            .where(ConsultationArchivePart.consultation_id == consultation_id)
+            .order_by(ConsultationArchivePart.part_no)
+            .offset(page * ARCHIVE_PAGE_SIZE)
+            .limit(ARCHIVE_PAGE_SIZE)
+        )
+        for part in result.scalars().all():
+            if part.kind == "photos" and part.media:
+                await send_packet(self.bot, chat_id, {"type": "photos", "photos": part.media})
+            else:
+                await _call_with_retry(
+                    self.bot.copy_message,
+                    chat_id=chat_id,
+                    from_chat_id=part.chat_id,
+                    message_id=part.message_ids[0]
+                )
+
+        return (total_parts - 1) // ARCHIVE_PAGE_SIZE + 1
+
+    async def _restore_from_messages(self, session, chat_id: int, consultation_id: int, page: int) -> Optional[int]:
+        """Страница из consultation_messages (архивы до появления файлов переписки)"""
+        result = await session.execute(
+            select(Consultation)
+            .options(selectinload(Consultation.client), selectinload(Consultation.florist))
+            .where(Consultation.id == consultation_id)
+        )
+        consultation = result.scalars().first()
+
+        messages_result = await session.execute(
+            select(ConsultationMessage)
+            .where(ConsultationMessage.consultation_id == consultation_id)
+            .order_by(ConsultationMessage.created_at, ConsultationMessage.id)
+        )
+        messages = messages_result.scalars().all()
+        meta = transcript_meta(consultation, messages)
+
+        page_messages = messages[page * ARCHIVE_PAGE_MESSAGES:(page + 1) * ARCHIVE_PAGE_MESSAGES]
+        if page == 0:
+            await self.bot.send_message(chat_id=chat_id, text=self._generate_archive_text(meta), parse_mode="HTML")
+
+        for packet in pack_messages(render_transcript_items(meta, page_messages)):
+            await send_packet(self.bot, chat_id, packet)
+
+        return max((len(messages) - 1) // ARCHIVE_PAGE_MESSAGES + 1, 1)
+
+    def _generate_archive_text(self, meta: Dict[str, Any]) -> str:
+        """Генерирует заголовок архива консультации по сводке transcript_meta"""
+
         # Базовая информация
-        start_time = consultation.started_at.strftime("%d.%m.%Y %H:%M")
-        end_time = consultation.completed_at.strftime("%d.%m.%Y %H:%M") if consultation.completed_at else "Не завершена"
-        
-        client_name = consultation.client.first_name or "Клиент"
-        florist_name = consultation.florist.first_name or "Флорист"
-        
-        # Подсчет сообщений
-        client_messages = sum(1 for msg in messages if msg.sender_id == consultation.client_id)
-        florist_messages = sum(1 for msg in messages if msg.sender_id == consultation.florist_id)
-        
+        start_time = _format_time(meta["started_at"]) or "—"
+        end_time = _format_time(meta["completed_at"]) or "Не завершена"
+
+        client_name = html.escape(meta["client_name"])
+        florist_name = html.escape(meta["florist_name"])
+
         archive_text = f"""
-📋 <b>Архив консультации #{consultation.id}</b>
+📋 <b>Архив консультации #{meta["consultation_id"]}</b>
 
 👤 <b>Клиент:</b> {client_name}
 🌸 <b>Флорист:</b> {florist_name}
 
 ⏰ <b>Начало:</b> {start_time}
 🏁 <b>Окончание:</b> {end_time}
-📊 <b>Статус:</b> {consultation.status.value}
+📊 <b>Статус:</b> {meta["status"]}
 
 💬 <b>Статистика сообщений:</b>
-• От клиента: {client_messages}
-• От флориста: {florist_messages}
-• Всего: {len(messages)}
-
-📝 <b>Краткое содержание:</b>
-{"Консультация прошла успешно" if consultation.status.value == "completed" else "Консультация завершена досрочно"}
+• От клиента: {meta["client_messages"]}
+• От флориста: {meta["florist_messages"]}
+• Всего: {meta["message_count"]}
 
 ---
-💡 Для полного восстановления истории используйте команду /restore_{consultation.id}
+💡 Полная переписка - в ответах на это сообщение
         """.strip()
-        
-        return archive_text
\ No newline at end of file
+
+        return archive_text
+
+def _format_time(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value).strftime("%d.%m.%Y %H:%M")
+
+class ArchiveQueue:
+    """Фоновая очередь архивирования с повторами при ошибках"""
+
+    def __init__(self, max_attempts: int = 5, retry_delay: float = 30):
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.bot = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._queued: set = set()
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self, bot) -> None:
+        """Запустить обработчик и поставить в очередь неархивированные консультации"""
+        self.bot = bot
+        self._worker = asyncio.create_task(self._run())
+
+        # Консультации, завершенные пока бот был остановлен
+        async for session in get_session():
+            result = await session.execute(
+                select(Consultation.id)
+                .where(
+                    Consultation.status.in_(COMPLETED_STATUSES),
+                    Consultation.archive_id.is_(None)
+                )
+                .order_by(Consultation.completed_at)
+                .limit(100)
+            )
+            for consultation_id in result.scalars().all():
+                self.enqueue(consultation_id)
+
+        print(f"✅ Очередь архивирования запущена ({self._queue.qsize()} в очереди)")
+
+    def enqueue(self, consultation_id: int, attempt: int = 1) -> None:
+        """Поставить консультацию в очередь"""
+        if attempt == 1 and consultation_id in self._queued:
+            return
+        self._queued.add(consultation_id)
+        self._queue.put_nowait((consultation_id, attempt))
+
+    async def _run(self) -> None:
+        while True:
+            consultation_id, attempt = await self._queue.get()
+            try:
+                # Хвост переписки из памяти - до чтения сообщений для архива
+                await flush_consultation(consultation_id)
+                archive_id = await AIArchiveService(self.bot).archive_consultation_to_channel(consultation_id)
+                self._queued.discard(consultation_id)
+                print(f"✅ Consultation {consultation_id} archived with ID: {archive_id}")
+            except Exception as e:
+                print(f"❌ Archive error for consultation {consultation_id} (attempt {attempt}): {e}")
+                if attempt < self.max_attempts:
+                    asyncio.get_running_loop().call_later(
+                        self.retry_delay * attempt, self.enqueue, consultation_id, attempt + 1
+                    )
+                else:
+                    self._queued.discard(consultation_id)
+            finally:
+                self._queue.task_done()
+
+    async def close(self, timeout: float = 10) -> None:
+        """Дождаться текущей очереди (не дольше timeout) и остановить обработчик"""
+        if not self._worker:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Архивирование не завершено для {self._queue.qsize()} консультаций")
+        self._worker.cancel()
+        self._worker = None
+
+# Глобальный экземпляр
+archive_queue = ArchiveQueue()
@@ -1,9 +1,10 @@
 from typing import List
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repositories import CategoryRepository, ProductRepository
+from app.repositories import CategoryRepository, ProductRepository, RecommendationRepository
 from app.models import Category, Product
 from app.exceptions import ProductNotFoundError
+from app.services.product_search import catalog_cache
 
 class CatalogService:
     """Сервис для работы с каталогом"""
@@ -12,6 +13,7 @@ class CatalogService:
         self.session = session
         self.category_repo = CategoryRepository(session)
         self.product_repo = ProductRepository(session)
+        self.rec_repo = RecommendationRepository(session)
     
     async def get_categories(self) -> List[Category]:
         """Получить все категории"""
@@ -29,11 +31,25 @@ class CatalogService:
         return product
     
     async def get_popular_products(self, limit: int = 10) -> List[Product]:
-        """Получить популярные товары"""
-        # TODO: реализовать логику популярности
-        return await self.product_repo.get_active_products(limit)
+        """Популярные товары (см. app/services/recommendations.py); пока продаж нет - первые активные"""
+        products = await self.rec_repo.get_popular_products(limit)
+        return products or await self.product_repo.get_active_products(limit)
     
-    async def search_products(self, query: str, lang: str = "ru") -> List[Product]:
-        """Поиск товаров"""
-        # TODO: реализовать поиск по названию/описанию
-        raise NotImplementedError("Search not implemented yet")
\ No newline at end of file
+    async def get_related_products(self, product_id: int, limit: int = 3) -> List[Product]:
+        """Часто покупают вместе с товаром"""
+        return await self.rec_repo.get_related_products(product_id, limit)
+    
+    async def search_products(self, query: str, lang: str = "ru", limit: int = 20) -> List[Product]:
+        """Поиск товаров по названию/описанию на русском и узбекском.
+        
+        Сначала префиксный индекс каталога в памяти, недостающее добирается
+        нечетким поиском pg_trgm (опечатки, слова из описания).
+        """
+        product_ids = [product.id for product in await catalog_cache.suggest(query, limit)]
+        
+        if len(product_ids) < limit:
+            for product in await self.product_repo.search(query, limit):
+                if product.id not in product_ids:
+                    product_ids.append(product.id)
+        
+        return await self.product_repo.get_by_ids(product_ids[:limit])
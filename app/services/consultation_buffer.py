@@ -1,88 +1,271 @@
 # app/services/consultation_buffer.py
 
 import asyncio
+import time
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from app.models import ConsultationBuffer
+from sqlalchemy import select, delete, func
+import redis.asyncio as redis
+
+from app.models import ConsultationBuffer, User
+
+# TTL буфера, если срок консультации неизвестен (15 минут ожидания + запас)
+DEFAULT_BUFFER_TTL = 20 * 60
+
+# Запас к сроку консультации, чтобы принятие в последнюю секунду не потеряло буфер
+BUFFER_TTL_GRACE = 60
+
+class PostgresBufferBackend:
+    """Буфер сообщений консультаций в таблице consultation_buffer"""
 
-class ConsultationBufferService:
-    """Сервис для буферизации сообщений консультаций в PostgreSQL"""
-    
     def __init__(self, session: AsyncSession):
         self.session = session
-    
-    async def add_message(self, consultation_id: int, sender_id: int, 
-                         message_text: str = None, photo_file_id: str = None) -> None:
-        """Добавить сообщение в буфер"""
-        
+
+    async def add_message(self, consultation_id: int, sender_id: int,
+                          message_text: str = None, photo_file_id: str = None,
+                          sender_name: str = None, expires_at: datetime = None) -> None:
         buffer_message = ConsultationBuffer(
             consultation_id=consultation_id,
             sender_id=sender_id,
             message_text=message_text,
             photo_file_id=photo_file_id
         )
-        
+
         self.session.add(buffer_message)
         await self.session.flush()
-        
-        print(f"✅ Message buffered in PostgreSQL for consultation {consultation_id}")
-    
+
     async def get_messages(self, consultation_id: int) -> List[Dict]:
-        """Получить все сообщения из буфера"""
-        
+        # Имя отправителя подтягиваем тем же запросом
         result = await self.session.execute(
-            select(ConsultationBuffer)
+            select(ConsultationBuffer, User.first_name)
+            .outerjoin(User, User.id == ConsultationBuffer.sender_id)
             .where(ConsultationBuffer.consultation_id == consultation_id)
-            .order_by(ConsultationBuffer.created_at)
+            .order_by(ConsultationBuffer.created_at, ConsultationBuffer.id)
         )
-        
-        buffer_messages = result.scalars().all()
-        
-        # Преобразуем в словари
-        messages = []
-        for msg in buffer_messages:
-            messages.append({
+
+        return [
+            {
                 'sender_id': msg.sender_id,
+                'sender_name': sender_name,
                 'message_text': msg.message_text,
                 'photo_file_id': msg.photo_file_id,
+                'created_at': msg.created_at,
                 'timestamp': msg.created_at.isoformat()
-            })
-        
-        print(f"📥 Retrieved {len(messages)} messages from PostgreSQL buffer")
-        return messages
-    
+            }
+            for msg, sender_name in result.all()
+        ]
+
     async def clear_buffer(self, consultation_id: int) -> None:
-        """Очистить буфер для конкретной консультации"""
-        
         await self.session.execute(
             delete(ConsultationBuffer)
             .where(ConsultationBuffer.consultation_id == consultation_id)
         )
-        
-        print(f"🧹 PostgreSQL buffer cleared for consultation {consultation_id}")
-    
+
     async def cleanup_old_buffers(self, hours: int = 24) -> int:
-        """Очистить старые буферы (старше N часов)"""
-        
         cutoff_time = datetime.utcnow() - timedelta(hours=hours)
-        
+
         result = await self.session.execute(
             delete(ConsultationBuffer)
             .where(ConsultationBuffer.created_at < cutoff_time)
         )
-        
-        deleted_count = result.rowcount
-        print(f"🧹 Cleaned {deleted_count} old buffer messages")
-        return deleted_count
-    
+        return result.rowcount
+
     async def get_buffer_size(self, consultation_id: int) -> int:
-        """Получить количество сообщений в буфере"""
-        
         result = await self.session.execute(
-            select(ConsultationBuffer.id)
+            select(func.count(ConsultationBuffer.id))
             .where(ConsultationBuffer.consultation_id == consultation_id)
         )
-        
-        return len(result.scalars().all())
\ No newline at end of file
+        return result.scalar() or 0
+
+class RedisStreamBufferBackend:
+    """Буфер сообщений консультаций в Redis Streams.
+
+    Одна консультация - один stream: XADD на сообщение, XRANGE при принятии,
+    XLEN для размера. TTL стрима равен сроку ожидания консультации, поэтому
+    брошенные буферы удаляет сам Redis.
+    """
+
+    KEY_PREFIX = "consultation_buffer:"
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def _key(self, consultation_id: int) -> str:
+        return f"{self.KEY_PREFIX}{consultation_id}"
+
+    async def add_message(self, consultation_id: int, sender_id: int,
+                          message_text: str = None, photo_file_id: str = None,
+                          sender_name: str = None, expires_at: datetime = None) -> None:
+        key = self._key(consultation_id)
+
+        if expires_at:
+            ttl = max(int((expires_at - datetime.utcnow()).total_seconds()), 0) + BUFFER_TTL_GRACE
+        else:
+            ttl = DEFAULT_BUFFER_TTL
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(key, {
+                'sender_id': sender_id,
+                'sender_name': sender_name or "",
+                'message_text': message_text or "",
+                'photo_file_id': photo_file_id or "",
+                'created_at': datetime.utcnow().isoformat()
+            })
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def get_messages(self, consultation_id: int) -> List[Dict]:
+        entries = await self.redis.xrange(self._key(consultation_id), "-", "+")
+
+        messages = []
+        for _, fields in entries:
+            created_at = datetime.fromisoformat(fields['created_at'])
+            messages.append({
+                'sender_id': int(fields['sender_id']),
+                'sender_name': fields.get('sender_name') or None,
+                'message_text': fields.get('message_text') or None,
+                'photo_file_id': fields.get('photo_file_id') or None,
+                'created_at': created_at,
+                'timestamp': fields['created_at']
+            })
+        return messages
+
+    async def clear_buffer(self, consultation_id: int) -> None:
+        await self.redis.delete(self._key(consultation_id))
+
+    async def cleanup_old_buffers(self, hours: int = 24) -> int:
+        # Старые стримы удаляются по TTL
+        return 0
+
+    async def get_buffer_size(self, consultation_id: int) -> int:
+        return await self.redis.xlen(self._key(consultation_id))
+
+class _BufferRedis:
+    """Общее подключение к Redis для буфера; при недоступности - пауза и повторная попытка"""
+
+    RETRY_AFTER = 60
+
+    def __init__(self):
+        self._client = None
+        self._failed_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    async def get_client(self):
+        if self._client:
+            return self._client
+        if self._failed_at and time.monotonic() - self._failed_at < self.RETRY_AFTER:
+            return None
+
+        async with self._lock:
+            if self._client:
+                return self._client
+
+            from app.config import config
+            try:
+                client = redis.from_url(config.REDIS_URL, decode_responses=True)
+                await client.ping()
+                self._client = client
+                self._failed_at = None
+                print("✅ Буфер консультаций: Redis Streams")
+            except Exception as e:
+                print(f"⚠️ Redis для буфера консультаций недоступен: {e}, используем PostgreSQL")
+                self._failed_at = time.monotonic()
+        return self._client
+
+    async def close(self):
+        if self._client:
+            try:
+                await self._client.aclose()
+            except Exception as e:
+                print(f"Buffer Redis close error: {e}")
+            finally:
+                self._client = None
+
+buffer_redis = _BufferRedis()
+
+class ConsultationBufferService:
+    """Сервис для буферизации сообщений консультаций до принятия флористом.
+
+    Хранилище выбирается настройкой CONSULTATION_BUFFER_BACKEND: redis (по умолчанию,
+    с откатом на PostgreSQL при недоступности Redis) или postgres.
+
+    Запись идет в то хранилище, что доступно сейчас, а чтение и очистка - по обоим:
+    сообщения, записанные в PostgreSQL во время сбоя Redis, доходят и после его
+    восстановления (и наоборот).
+    """
+
+    def __init__(self, session: AsyncSession, backend=None):
+        self.session = session
+        self.backend = backend
+        self._fixed = backend is not None       # явно заданное хранилище - только оно
+
+    async def _redis_backend(self) -> Optional[RedisStreamBufferBackend]:
+        from app.config import config
+
+        if config.CONSULTATION_BUFFER_BACKEND != "redis":
+            return None
+        client = await buffer_redis.get_client()
+        return RedisStreamBufferBackend(client) if client else None
+
+    async def _get_backend(self):
+        """Хранилище для записи"""
+        if self.backend is None:
+            self.backend = await self._redis_backend() or PostgresBufferBackend(self.session)
+        return self.backend
+
+    async def _read_backends(self) -> list:
+        """Хранилища для чтения и очистки"""
+        if self._fixed:
+            return [self.backend]
+        backends = [PostgresBufferBackend(self.session)]
+        redis_backend = await self._redis_backend()
+        if redis_backend:
+            backends.append(redis_backend)
+        return backends
+
+    async def add_message(self, consultation_id: int, sender_id: int,
+                         message_text: str = None, photo_file_id: str = None,
+                         sender_name: str = None, expires_at: datetime = None) -> None:
+        """Добавить сообщение в буфер"""
+        backend = await self._get_backend()
+        await backend.add_message(
+            consultation_id, sender_id,
+            message_text=message_text,
+            photo_file_id=photo_file_id,
+            sender_name=sender_name,
+            expires_at=expires_at
+        )
+
+        print(f"✅ Message buffered ({type(backend).__name__}) for consultation {consultation_id}")
+
+    async def get_messages(self, consultation_id: int) -> List[Dict]:
+        """Получить все сообщения из буфера вместе с именем отправителя"""
+        messages = []
+        for backend in await self._read_backends():
+            messages.extend(await backend.get_messages(consultation_id))
+        messages.sort(key=lambda message: message['created_at'])
+
+        print(f"📥 Retrieved {len(messages)} messages from buffer")
+        return messages
+
+    async def clear_buffer(self, consultation_id: int) -> None:
+        """Очистить буфер для конкретной консультации"""
+        for backend in await self._read_backends():
+            await backend.clear_buffer(consultation_id)
+
+        print(f"🧹 Buffer cleared for consultation {consultation_id}")
+
+    async def cleanup_old_buffers(self, hours: int = 24) -> int:
+        """Очистить старые буферы (старше N часов)"""
+        # Таблица чистится всегда: в ней могут остаться записи времен отката на PostgreSQL
+        deleted_count = await PostgresBufferBackend(self.session).cleanup_old_buffers(hours)
+        print(f"🧹 Cleaned {deleted_count} old buffer messages")
+        return deleted_count
+
+    async def get_buffer_size(self, consultation_id: int) -> int:
+        """Получить количество сообщений в буфере"""
+        total = 0
+        for backend in await self._read_backends():
+            total += await backend.get_buffer_size(consultation_id)
+        return total
@@ -0,0 +1,316 @@
+# app/services/consultation_relay.py
+
+"""Быстрый путь пересылки сообщений консультации.
+
+Участники активной консультации держатся в памяти, поэтому получатель
+определяется без обращения к БД. Сообщение пересылается сразу, а запись в
+consultation_messages идет через буфер, который пишет пачками.
+
+Кэш доверяет только себе, поэтому любой выход консультации из active должен
+идти через finish_consultation - иначе переписка продолжится по кэшу.
+"""
+
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aiogram import types
+from sqlalchemy import select, insert
+from sqlalchemy.orm import selectinload
+
+from app.models import Consultation, ConsultationMessage, ConsultationStatusEnum
+
+@dataclass(frozen=True)
+class ConsultationParticipants:
+    """Участники активной консультации"""
+    consultation_id: int
+    client_id: int
+    client_tg_id: str
+    client_name: str
+    florist_id: int
+    florist_tg_id: str
+    florist_name: str
+
+    def resolve(self, sender_tg_id) -> Optional[Tuple[int, str, str]]:
+        """По tg_id отправителя вернуть (id отправителя, имя отправителя, tg_id получателя)"""
+        sender_tg_id = str(sender_tg_id)
+        if sender_tg_id == self.client_tg_id:
+            return self.client_id, self.client_name, self.florist_tg_id
+        if sender_tg_id == self.florist_tg_id:
+            return self.florist_id, self.florist_name, self.client_tg_id
+        return None
+
+class ParticipantsCache:
+    """Кэш участников активных консультаций"""
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max_size
+        self._items: "OrderedDict[int, ConsultationParticipants]" = OrderedDict()
+        self._closed: "OrderedDict[int, None]" = OrderedDict()  # завершенные - в кэш больше не попадут
+
+    def get(self, consultation_id: int) -> Optional[ConsultationParticipants]:
+        return self._items.get(consultation_id)
+
+    def put(self, consultation: Consultation) -> ConsultationParticipants:
+        """Положить в кэш консультацию с загруженными client и florist"""
+        participants = ConsultationParticipants(
+            consultation_id=consultation.id,
+            client_id=consultation.client_id,
+            client_tg_id=str(consultation.client.tg_id),
+            client_name=consultation.client.first_name or "Клиент",
+            florist_id=consultation.florist_id,
+            florist_tg_id=str(consultation.florist.tg_id),
+            florist_name=consultation.florist.first_name or "Флорист"
+        )
+        if consultation.id in self._closed:
+            # Загрузка успела прочитать active до коммита завершения
+            return participants
+
+        self._items[consultation.id] = participants
+        self._items.move_to_end(consultation.id)
+
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+        return participants
+
+    def invalidate(self, consultation_id: int) -> None:
+        self._items.pop(consultation_id, None)
+
+    def close(self, consultation_id: int) -> None:
+        """Консультация завершена: убрать из кэша и не пускать обратно"""
+        self.invalidate(consultation_id)
+        self._closed[consultation_id] = None
+        self._closed.move_to_end(consultation_id)
+        while len(self._closed) > self.max_size:
+            self._closed.popitem(last=False)
+
+    async def load(self, session, consultation_id: int) -> Optional[ConsultationParticipants]:
+        """Загрузить участников активной консультации одним запросом (промах кэша)"""
+        result = await session.execute(
+            select(Consultation)
+            .options(selectinload(Consultation.client), selectinload(Consultation.florist))
+            .where(
+                Consultation.id == consultation_id,
+                Consultation.status == ConsultationStatusEnum.active
+            )
+        )
+        consultation = result.scalars().first()
+        if not consultation:
+            return None
+        return self.put(consultation)
+
+class ConsultationMessageWriter:
+    """Буфер записи сообщений консультаций: пишет пачками по времени или количеству"""
+
+    def __init__(self, flush_interval: float = 0.3, batch_size: int = 20, retry_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retry_interval = retry_interval
+        self._pending: Dict[int, List[dict]] = {}
+        self._timers: Dict[int, asyncio.Task] = {}
+        self._flushes: Set[asyncio.Task] = set()   # ссылки держим, иначе задачу может собрать GC
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._closing = False
+
+    def add(self, consultation_id: int, sender_id: int, **fields) -> None:
+        """Поставить сообщение в очередь на запись"""
+        now = datetime.utcnow()
+        row = {
+            "consultation_id": consultation_id,
+            "sender_id": sender_id,
+            "created_at": now,
+            "sent_at": now,
+            **fields
+        }
+        self._pending.setdefault(consultation_id, []).append(row)
+
+        if len(self._pending[consultation_id]) >= self.batch_size:
+            self._cancel_timer(consultation_id)
+            task = asyncio.create_task(self.flush(consultation_id))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif consultation_id not in self._timers:
+            self._arm(consultation_id, self.flush_interval)
+
+    def _arm(self, consultation_id: int, delay: float) -> None:
+        self._timers[consultation_id] = asyncio.create_task(self._flush_later(consultation_id, delay))
+
+    async def _flush_later(self, consultation_id: int, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._timers.pop(consultation_id, None)
+        await self.flush(consultation_id)
+
+    def _cancel_timer(self, consultation_id: int) -> None:
+        timer = self._timers.pop(consultation_id, None)
+        if timer and timer is not asyncio.current_task():
+            timer.cancel()
+
+    async def flush(self, consultation_id: int) -> int:
+        """Записать накопленные сообщения консультации одним INSERT"""
+        lock = self._locks.setdefault(consultation_id, asyncio.Lock())
+
+        async with lock:
+            self._cancel_timer(consultation_id)
+            rows = self._pending.pop(consultation_id, [])
+            if not rows:
+                return 0
+
+            from app.database.database import get_session
+
+            try:
+                async for session in get_session():
+                    await session.execute(insert(ConsultationMessage), rows)
+                    await session.commit()
+            except Exception as e:
+                print(f"❌ Consultation messages flush error: {e}")
+                # Возвращаем в начало очереди и повторяем позже
+                self._pending[consultation_id] = rows + self._pending.get(consultation_id, [])
+                if not self._closing and consultation_id not in self._timers:
+                    self._arm(consultation_id, self.retry_interval)
+                return 0
+
+        if not self._pending.get(consultation_id) and not lock.locked():
+            self._locks.pop(consultation_id, None)
+
+        return len(rows)
+
+    async def close(self) -> None:
+        """Сбросить все буферы (при остановке бота)"""
+        self._closing = True
+        for timer in list(self._timers.values()):
+            timer.cancel()
+        self._timers.clear()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+        total = 0
+        for consultation_id in list(self._pending):
+            total += await self.flush(consultation_id)
+
+        if total:
+            print(f"✅ Записано {total} сообщений консультаций при остановке")
+
+# Порядок важен: у анимации заполнен и document
+MEDIA_CONTENT_TYPES = ("photo", "video", "animation", "document", "audio", "voice", "video_note", "sticker")
+
+# Типы, для которых copy_message принимает подпись
+CAPTION_CONTENT_TYPES = {"photo", "video", "animation", "document", "audio", "voice"}
+
+# Типы, которые можно отправить альбомом
+_INPUT_MEDIA = {
+    "photo": types.InputMediaPhoto,
+    "video": types.InputMediaVideo,
+    "document": types.InputMediaDocument,
+    "audio": types.InputMediaAudio,
+}
+
+def extract_content(message: types.Message) -> Tuple[str, Optional[str]]:
+    """Тип содержимого и file_id вложения (для текста file_id = None)"""
+    for content_type in MEDIA_CONTENT_TYPES:
+        media = getattr(message, content_type, None)
+        if media:
+            file_id = media[-1].file_id if content_type == "photo" else media.file_id
+            return content_type, file_id
+
+    if message.text:
+        return "text", None
+
+    content_type = message.content_type
+    return getattr(content_type, "value", str(content_type)), None
+
+def build_input_media(content_type: str, file_id: str, caption: Optional[str] = None):
+    """InputMedia для send_media_group или None, если тип не группируется"""
+    media_class = _INPUT_MEDIA.get(content_type)
+    if not media_class:
+        return None
+    return media_class(media=file_id, caption=caption)
+
+class MediaGroupCollector:
+    """Собирает части альбома (media_group_id) и отдает их одной пачкой"""
+
+    def __init__(self, delay: float = 0.6):
+        self.delay = delay
+        self._groups: Dict[str, List[types.Message]] = {}
+        self._callbacks: Dict[str, Callable[[List[types.Message]], Awaitable[None]]] = {}
+        self._owners: Dict[str, Optional[int]] = {}     # group_id -> консультация
+        self._tasks: Dict[str, asyncio.Task] = {}       # ждут паузы без новых частей
+        self._sending: Dict[asyncio.Task, Optional[int]] = {}
+
+    def add(self, message: types.Message,
+            on_complete: Callable[[List[types.Message]], Awaitable[None]],
+            owner: Optional[int] = None) -> None:
+        """Добавить часть альбома; on_complete вызовется после паузы без новых частей"""
+        group_id = message.media_group_id
+        self._groups.setdefault(group_id, []).append(message)
+        self._callbacks[group_id] = on_complete
+        self._owners[group_id] = owner
+
+        task = self._tasks.pop(group_id, None)
+        if task:
+            task.cancel()
+        self._tasks[group_id] = asyncio.create_task(self._complete_later(group_id))
+
+    async def _complete_later(self, group_id: str) -> None:
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            return
+
+        # Дальше отмена не нужна - альбом уже уходит
+        self._tasks.pop(group_id, None)
+        task = asyncio.current_task()
+        self._sending[task] = self._owners.get(group_id)
+        try:
+            await self._complete(group_id)
+        finally:
+            self._sending.pop(task, None)
+
+    async def _complete(self, group_id: str) -> None:
+        messages = sorted(self._groups.pop(group_id, []), key=lambda m: m.message_id)
+        on_complete = self._callbacks.pop(group_id, None)
+        self._owners.pop(group_id, None)
+        if not messages or not on_complete:
+            return
+
+        try:
+            await on_complete(messages)
+        except Exception as e:
+            print(f"❌ Media group relay error: {e}")
+
+    async def flush(self, owner: int) -> None:
+        """Отдать альбомы консультации без паузы и дождаться уже уходящих"""
+        for group_id in [group_id for group_id, o in self._owners.items() if o == owner]:
+            task = self._tasks.pop(group_id, None)
+            if task:
+                task.cancel()
+                await self._complete(group_id)
+
+        sending = [task for task, o in self._sending.items() if o == owner]
+        if sending:
+            await asyncio.gather(*sending, return_exceptions=True)
+
+# Глобальные экземпляры
+participants_cache = ParticipantsCache()
+message_writer = ConsultationMessageWriter()
+album_collector = MediaGroupCollector()
+
+def finish_consultation(consultation: Consultation, status: ConsultationStatusEnum) -> None:
+    """Перевести консультацию в завершающий статус и закрыть ее в кэше участников"""
+    consultation.status = status
+    consultation.completed_at = datetime.utcnow()
+    participants_cache.close(consultation.id)
+
+async def flush_consultation(consultation_id: int) -> None:
+    """Дописать в БД все, что консультация держит в памяти: собираемые альбомы и буфер записи.
+
+    Вызывается после завершения и перед архивированием, иначе хвост переписки
+    попадет в consultation_messages уже после архива.
+    """
+    await album_collector.flush(consultation_id)
+    await message_writer.flush(consultation_id)
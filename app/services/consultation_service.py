@@ -12,6 +12,7 @@ from app.models import (
     FloristProfile, ConsultationMessage, ConsultationBuffer
 )
 from app.exceptions import ValidationError, UserNotFoundError
+from app.services.consultation_relay import finish_consultation, flush_consultation
 
 
 def generate_request_key(client_id: int, florist_id: int) -> str:
@@ -146,8 +147,7 @@ class ConsultationService:
             raise ValidationError("Консультация уже обработана")
         
         # Отклоняем консультацию
-        consultation.status = ConsultationStatusEnum.declined
-        consultation.completed_at = datetime.utcnow()
+        finish_consultation(consultation, ConsultationStatusEnum.declined)
         
         return consultation
     
@@ -165,8 +165,8 @@ class ConsultationService:
             raise ValidationError("Консультация не активна")
         
         # Завершаем консультацию
-        consultation.status = ConsultationStatusEnum.completed
-        consultation.completed_at = datetime.utcnow()
+        finish_consultation(consultation, ConsultationStatusEnum.completed)
+        await flush_consultation(consultation.id)
         
         return consultation
     
@@ -223,7 +223,6 @@ class ConsultationService:
         count = len(expired_consultations)
         
         for consultation in expired_consultations:
-            consultation.status = ConsultationStatusEnum.expired
-            consultation.completed_at = datetime.utcnow()
+            finish_consultation(consultation, ConsultationStatusEnum.expired)
         
         return count
\ No newline at end of file
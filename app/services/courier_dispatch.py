@@ -0,0 +1,192 @@
+# app/services/courier_dispatch.py
+
+"""Диспетчер доставок: готовые заказы -> рейсы -> курьеры.
+
+Раз в DISPATCH_INTERVAL (и сразу после "Готов" у флориста):
+1. предложения без ответа дольше OFFER_TIMEOUT считаются отказом;
+2. готовые заказы без рейса группируются по (зона, слот), упорядочиваются
+   маршрутом (ближайший сосед + 2-opt от магазина) и режутся на рейсы
+   не длиннее MAX_BATCH_SIZE - соседние по маршруту заказы едут вместе;
+3. каждый свободный рейс предлагается одному свободному курьеру, который
+   от него еще не отказывался.
+
+Смена статусов заказов рейса (delivering, delivered) - один UPDATE на рейс,
+см. DeliveryBatchRepository.start/complete.
+"""
+
+import asyncio
+import html
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from aiogram import types
+
+from app.config import config
+from app.database.database import get_session
+from app.models import DeliveryBatch, Order, OrderStatusEnum, User
+from app.utils.routing import Point, plan_route, route_length
+
+MAX_BATCH_SIZE = 5
+DISPATCH_INTERVAL = 120                # секунды
+DISPATCH_AHEAD = timedelta(hours=2)    # заказы на более поздние слоты ждут
+OFFER_TIMEOUT = timedelta(minutes=5)
+
+def _shop_origin() -> Optional[Point]:
+    if config.SHOP_LATITUDE is None or config.SHOP_LONGITUDE is None:
+        return None
+    return config.SHOP_LATITUDE, config.SHOP_LONGITUDE
+
+def _location(order) -> Optional[Point]:
+    if order.latitude is None or order.longitude is None:
+        return None
+    return order.latitude, order.longitude
+
+def build_batches(orders: Sequence, origin: Optional[Point],
+                  max_size: int = MAX_BATCH_SIZE) -> List[Tuple[Optional[int], Optional[datetime], List[int], Optional[float]]]:
+    """Разбить заказы на рейсы: [(зона, слот, id заказов по маршруту, км)]
+
+    Заказы без координат (адрес текстом) идут в конце маршрута своей группы.
+    """
+    groups: Dict[Tuple, List] = {}
+    for order in orders:
+        groups.setdefault((order.delivery_zone_id, order.slot_at), []).append(order)
+
+    batches = []
+    for (zone_id, slot_at), group in groups.items():
+        located = [order for order in group if _location(order)]
+        unlocated = [order for order in group if not _location(order)]
+
+        points = [_location(order) for order in located]
+        route = [located[i] for i in plan_route(origin, points)] + unlocated
+
+        for start in range(0, len(route), max_size):
+            chunk = route[start:start + max_size]
+            chunk_points = [_location(order) for order in chunk if _location(order)]
+            distance = None
+            if chunk_points:
+                chunk_origin = origin or chunk_points[0]
+                distance = round(route_length(chunk_origin, chunk_points, range(len(chunk_points))), 2)
+            batches.append((zone_id, slot_at, [order.id for order in chunk], distance))
+    return batches
+
+def route_url(orders: Sequence[Order]) -> Optional[str]:
+    """Ссылка на маршрут в Google Maps по точкам заказов"""
+    points = [_location(order) for order in orders if _location(order)]
+    if not points:
+        return None
+    origin = _shop_origin()
+    if origin:
+        points = [origin] + points
+    return "https://www.google.com/maps/dir/" + "/".join(f"{lat:.6f},{lon:.6f}" for lat, lon in points)
+
+def format_batch(batch: DeliveryBatch, orders: Sequence[Order]) -> str:
+    """Описание рейса для курьера"""
+    slot = batch.slot_at.strftime("%d.%m %H:%M") if batch.slot_at else "как можно скорее"
+    lines = [f"🚚 <b>Рейс #{batch.id}</b> — {len(orders)} заказ(ов)", f"🕐 Слот: {slot}"]
+    if batch.distance_km is not None:
+        lines.append(f"📏 Маршрут: ~{batch.distance_km} км")
+    lines.append("")
+
+    for n, order in enumerate(orders, 1):
+        lines.append(
+            f"{n}. <b>#{order.id}</b> {html.escape(order.address or 'Адрес не указан')}\n"
+            f"   📞 {html.escape(order.phone or '—')}"
+        )
+
+    url = route_url(orders)
+    if url:
+        lines.append(f"\n🗺 <a href=\"{url}\">Маршрут на карте</a>")
+    return "\n".join(lines)
+
+def offer_keyboard(batch_id: int) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text="✅ Беру рейс", callback_data=f"batch_accept_{batch_id}")],
+        [types.InlineKeyboardButton(text="❌ Отказаться", callback_data=f"batch_decline_{batch_id}")]
+    ])
+
+class CourierDispatcher:
+    """Формирование рейсов и предложения курьерам"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._kicks: Set[asyncio.Task] = set()   # ссылки держим, иначе задачу может собрать GC
+
+    async def run(self, bot) -> None:
+        """Один проход диспетчера (задача обслуживания)"""
+        from app.repositories import DeliveryBatchRepository
+
+        async with self._lock:
+            offers: List[Tuple[DeliveryBatch, User, List[Order]]] = []
+
+            async for session in get_session():
+                batch_repo = DeliveryBatchRepository(session)
+                now = datetime.utcnow()
+
+                # 1. Молчание курьера = отказ
+                for batch in await batch_repo.get_expired_offers(now - OFFER_TIMEOUT):
+                    await batch_repo.decline(batch, batch.courier_id)
+
+                # 2. Новые рейсы из готовых заказов
+                ready = await batch_repo.get_unbatched_ready_orders(datetime.now() + DISPATCH_AHEAD)
+                created = 0
+                for zone_id, slot_at, order_ids, distance in build_batches(ready, _shop_origin()):
+                    if await batch_repo.create_batch(order_ids, zone_id, slot_at, distance):
+                        created += 1
+
+                # 3. Предложения свободным курьерам
+                free_couriers = await batch_repo.get_free_couriers()
+                for batch in await batch_repo.get_open_batches():
+                    orders = await batch_repo.get_orders(batch.id, (OrderStatusEnum.ready,))
+                    if not orders:
+                        await batch_repo.close_empty(batch.id)
+                        continue
+
+                    declined = set(batch.declined_by or [])
+                    candidates = [courier for courier in free_couriers if courier.id not in declined]
+                    if not candidates and declined and free_couriers:
+                        # Отказались все свободные - начинаем круг заново
+                        candidates = free_couriers
+
+                    if not candidates:
+                        continue
+
+                    courier = candidates[0]
+                    if await batch_repo.offer(batch.id, courier.id):
+                        free_couriers.remove(courier)
+                        offers.append((batch, courier, orders))
+
+                await session.commit()
+
+            if created or offers:
+                print(f"🚚 Dispatch: {created} new batches, {len(offers)} offers")
+
+            for batch, courier, orders in offers:
+                await self.send_offer(bot, batch, courier, orders)
+
+    async def send_offer(self, bot, batch: DeliveryBatch, courier: User, orders: Sequence[Order]) -> None:
+        try:
+            await bot.send_message(
+                chat_id=int(courier.tg_id),
+                text="📦 <b>Новый рейс</b>\n\n" + format_batch(batch, orders),
+                reply_markup=offer_keyboard(batch.id),
+                parse_mode="HTML",
+                disable_web_page_preview=True
+            )
+        except Exception as e:
+            # Ответа не будет - предложение истечет по OFFER_TIMEOUT
+            print(f"❌ Batch offer to courier {courier.id} failed: {e}")
+
+    def kick(self, bot) -> None:
+        """Запустить проход сразу, не дожидаясь интервала"""
+        async def _run():
+            try:
+                await self.run(bot)
+            except Exception as e:
+                print(f"❌ Dispatch error: {e}")
+
+        task = asyncio.create_task(_run())
+        self._kicks.add(task)
+        task.add_done_callback(self._kicks.discard)
+
+# Глобальный экземпляр
+dispatcher = CourierDispatcher()
@@ -0,0 +1,50 @@
+# app/services/customer_segments.py
+
+"""RFM-сегментация клиентов для владельца.
+
+Три балла 1..5 по квинтилям среди клиентов с заказами (customer_stats):
+- R (recency) - давность последнего заказа, 5 - самые свежие;
+- F (frequency) - число заказов без отмен;
+- M (monetary) - сумма доставленных заказов.
+Сегмент - первое подходящее правило из SEGMENT_RULES, иначе "regular".
+
+Таблицу customer_segments целиком пересобирает задача обслуживания одним
+запросом в БД; аналитика читает только счетчики по сегментам.
+"""
+
+from datetime import datetime
+
+from app.database.database import get_session
+
+SEGMENTS_INTERVAL = 6 * 3600           # секунды
+
+# Условия работают и с колонками SQLAlchemy, и с обычными числами
+SEGMENT_RULES = (
+    ("champions", lambda r, f, m: (r >= 4) & (f >= 4) & (m >= 4)),
+    ("at_risk", lambda r, f, m: (r <= 2) & ((f >= 4) | (m >= 4))),   # ценные, но пропали
+    ("loyal", lambda r, f, m: f >= 4),
+    ("big_spenders", lambda r, f, m: m >= 4),
+    ("new", lambda r, f, m: (r >= 4) & (f <= 1)),
+    ("lapsed", lambda r, f, m: r <= 2),
+)
+DEFAULT_SEGMENT = "regular"
+SEGMENTS = tuple(name for name, _ in SEGMENT_RULES) + (DEFAULT_SEGMENT,)
+
+def classify(r: int, f: int, m: int) -> str:
+    """Сегмент по баллам - те же правила, что в запросе пересборки"""
+    for name, condition in SEGMENT_RULES:
+        if condition(r, f, m):
+            return name
+    return DEFAULT_SEGMENT
+
+async def refresh_customer_segments(bot=None) -> int:
+    """Пересобрать сегменты (задача обслуживания). Возвращает число клиентов"""
+    from app.repositories import CustomerSegmentRepository
+
+    async for session in get_session():
+        started = datetime.utcnow()
+        count = await CustomerSegmentRepository(session).rebuild(SEGMENT_RULES, DEFAULT_SEGMENT, started)
+        await session.commit()
+
+    print(f"🎯 RFM-сегменты: {count} клиентов за {(datetime.utcnow() - started).total_seconds():.1f} c")
+    return count
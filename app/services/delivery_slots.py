@@ -0,0 +1,144 @@
+# app/services/delivery_slots.py
+
+"""Слоты доставки и их вместимость.
+
+День делится на периоды SLOT_PERIODS, слот - (дата, период), в БД это
+строка delivery_slots со счетчиком booked (см. DeliverySlotRepository.book).
+
+Лимиты задаются в settings:
+- delivery_slot_capacity - для всех периодов (по умолчанию DEFAULT_SLOT_CAPACITY);
+- delivery_slot_capacity_<период> - для отдельного периода, например _morning.
+
+Календарь и выбор времени читают готовую карту доступности
+(slot_availability), которая перестраивается раз в ttl секунд или после
+бронирования/отмены - экраны checkout не считают заказы.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, FrozenSet, Optional
+
+SLOT_PERIODS: Dict[str, tuple] = {
+    "morning": (9, 12),
+    "day": (12, 15),
+    "evening": (15, 18),
+    "night": (18, 21),
+}
+
+DEFAULT_SLOT_CAPACITY = 5
+CAPACITY_SETTING = "delivery_slot_capacity"
+BOOKING_DAYS_AHEAD = 62
+
+def period_label(period: str) -> str:
+    start, end = SLOT_PERIODS[period]
+    return f"{start:02d}:00-{end:02d}:00"
+
+def period_for_time(value: dt_time) -> Optional[str]:
+    """Период, в который попадает время, или None вне часов доставки"""
+    for period, (start, end) in SLOT_PERIODS.items():
+        if start <= value.hour < end:
+            return period
+    return None
+
+def slot_start(day: date, period: str) -> datetime:
+    return datetime.combine(day, dt_time(SLOT_PERIODS[period][0]))
+
+def slot_period(slot_at: datetime) -> Optional[str]:
+    return period_for_time(slot_at.time())
+
+@dataclass(frozen=True)
+class SlotAvailability:
+    """Свободные места по слотам на BOOKING_DAYS_AHEAD дней вперед"""
+    capacities: Dict[str, int]
+    remaining: Dict[date, Dict[str, int]]
+    fully_booked: FrozenSet[date]
+
+    def free_periods(self, day: date) -> Dict[str, int]:
+        """Периоды дня, в которых есть места: {период: осталось}.
+        За горизонтом карты - полная вместимость."""
+        periods = self.remaining.get(day)
+        if periods is None:
+            periods = self.capacities
+        return {period: left for period, left in periods.items() if left > 0}
+
+    def is_free(self, day: date, period: str) -> bool:
+        return self.free_periods(day).get(period, 0) > 0
+
+def build_availability(now: datetime, capacities: Dict[str, int],
+                       booked: Dict[datetime, int], days: int = BOOKING_DAYS_AHEAD) -> SlotAvailability:
+    """Карта доступности: прошедшие и заполненные слоты - 0 мест"""
+    remaining = {}
+    fully_booked = set()
+
+    for offset in range(days):
+        day = now.date() + timedelta(days=offset)
+        periods = {}
+        for period, (_, end) in SLOT_PERIODS.items():
+            if datetime.combine(day, dt_time(end)) <= now:
+                periods[period] = 0
+            else:
+                start = slot_start(day, period)
+                periods[period] = max(0, capacities[period] - booked.get(start, 0))
+        remaining[day] = periods
+        if not any(periods.values()):
+            fully_booked.add(day)
+
+    return SlotAvailability(capacities, remaining, frozenset(fully_booked))
+
+async def load_capacities(session) -> Dict[str, int]:
+    """Лимиты периодов из settings"""
+    from app.repositories import SettingsRepository
+
+    values = await SettingsRepository(session).get_by_prefix(CAPACITY_SETTING)
+
+    def as_int(key: str, default: int) -> int:
+        try:
+            return int(values[key])
+        except (KeyError, ValueError):
+            return default
+
+    default = as_int(CAPACITY_SETTING, DEFAULT_SLOT_CAPACITY)
+    return {period: as_int(f"{CAPACITY_SETTING}_{period}", default) for period in SLOT_PERIODS}
+
+class SlotAvailabilityCache:
+    """Готовая карта доступности слотов"""
+
+    def __init__(self, ttl: float = 60):
+        self.ttl = ttl
+        self._availability: Optional[SlotAvailability] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get(self) -> SlotAvailability:
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._load()
+        return self._availability
+
+    async def _load(self) -> None:
+        from app.database.database import get_session
+        from app.repositories import DeliverySlotRepository
+
+        now = datetime.now()
+        start = datetime.combine(now.date(), dt_time())
+        async for session in get_session():
+            capacities = await load_capacities(session)
+            booked = await DeliverySlotRepository(session).get_booked(
+                start, start + timedelta(days=BOOKING_DAYS_AHEAD)
+            )
+
+        self._availability = build_availability(now, capacities, booked)
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Перестроить карту при следующем обращении"""
+        self._loaded_at = None
+
+# Глобальный экземпляр
+slot_availability = SlotAvailabilityCache()
@@ -0,0 +1,168 @@
+# app/services/delivery_zones.py
+
+"""Зоны доставки: точка -> зона, стоимость и срок.
+
+Многоугольники зон раскладываются по сетке ячеек GRID_CELL градусов
+(~1 км для Ташкента). Ячейка хранит только зоны, чей охватывающий
+прямоугольник ее задевает, поэтому поиск - одна ячейка словаря и
+проверка point-in-polygon для пары кандидатов.
+"""
+
+import asyncio
+import json
+import math
+import time
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Sequence, Tuple
+
+GRID_CELL = 0.01  # градусы
+
+Point = Tuple[float, float]  # (lat, lon)
+
+@dataclass(frozen=True)
+class Zone:
+    """Зона доставки из снимка"""
+    id: int
+    name_ru: str
+    name_uz: str
+    polygon: Tuple[Point, ...]
+    fee: Decimal
+    eta_minutes: int
+    priority: int = 0
+
+    def name(self, lang: str) -> str:
+        return self.name_ru if lang == "ru" else self.name_uz
+
+    @property
+    def bbox(self) -> Tuple[float, float, float, float]:
+        lats = [lat for lat, _ in self.polygon]
+        lons = [lon for _, lon in self.polygon]
+        return min(lats), min(lons), max(lats), max(lons)
+
+def point_in_polygon(lat: float, lon: float, polygon: Sequence[Point]) -> bool:
+    """Луч вдоль широты: нечетное число пересечений - точка внутри"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lon_i > lon) != (lon_j > lon):
+            cross_lat = lat_i + (lon - lon_i) * (lat_j - lat_i) / (lon_j - lon_i)
+            if lat < cross_lat:
+                inside = not inside
+        j = i
+    return inside
+
+def _cell(lat: float, lon: float, cell_size: float) -> Tuple[int, int]:
+    return math.floor(lat / cell_size), math.floor(lon / cell_size)
+
+class ZoneIndex:
+    """Сеточный индекс зон"""
+
+    def __init__(self, zones: List[Zone], cell_size: float = GRID_CELL):
+        self.cell_size = cell_size
+        self.zones = {zone.id: zone for zone in zones}
+        self._cells: Dict[Tuple[int, int], List[Zone]] = {}
+
+        for zone in sorted(zones, key=lambda z: (-z.priority, z.id)):
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            row_from, col_from = _cell(min_lat, min_lon, cell_size)
+            row_to, col_to = _cell(max_lat, max_lon, cell_size)
+            for row in range(row_from, row_to + 1):
+                for col in range(col_from, col_to + 1):
+                    self._cells.setdefault((row, col), []).append(zone)
+
+    def locate(self, lat: float, lon: float) -> Optional[Zone]:
+        """Зона с наибольшим приоритетом, содержащая точку"""
+        for zone in self._cells.get(_cell(lat, lon, self.cell_size), ()):
+            if point_in_polygon(lat, lon, zone.polygon):
+                return zone
+        return None
+
+def parse_zones(raw: str) -> List[dict]:
+    """Разобрать JSON со списком зон для DeliveryZoneRepository.replace_active.
+
+    [{"name_ru": "Центр", "name_uz": "Markaz", "fee": 20000, "eta_minutes": 60,
+      "priority": 0, "polygon": [[41.30, 69.24], [41.32, 69.24], [41.32, 69.28]]}]
+    """
+    try:
+        items = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Некорректный JSON: {e}")
+
+    if not isinstance(items, list) or not items:
+        raise ValueError("Ожидается непустой список зон")
+
+    zones = []
+    for n, item in enumerate(items, 1):
+        try:
+            polygon = [[float(lat), float(lon)] for lat, lon in item["polygon"]]
+            zone = {
+                "name_ru": str(item["name_ru"]),
+                "name_uz": str(item.get("name_uz") or item["name_ru"]),
+                "polygon": polygon,
+                "fee": Decimal(str(item.get("fee", 0))),
+                "eta_minutes": int(item.get("eta_minutes", 60)),
+                "priority": int(item.get("priority", 0)),
+            }
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise ValueError(f"Зона #{n}: нужны name_ru и polygon [[lat, lon], ...]")
+        if len(polygon) < 3:
+            raise ValueError(f"Зона #{n}: в многоугольнике меньше 3 точек")
+        zones.append(zone)
+    return zones
+
+class DeliveryZoneCache:
+    """Снимок активных зон с сеточным индексом"""
+
+    def __init__(self, ttl: float = 600):
+        self.ttl = ttl
+        self._index = ZoneIndex([])
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def get_index(self) -> ZoneIndex:
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._load()
+        return self._index
+
+    async def _load(self) -> None:
+        from app.database.database import get_session
+        from app.repositories import DeliveryZoneRepository
+
+        async for session in get_session():
+            rows = await DeliveryZoneRepository(session).get_active()
+            zones = [
+                Zone(
+                    id=row.id,
+                    name_ru=row.name_ru,
+                    name_uz=row.name_uz,
+                    polygon=tuple((float(lat), float(lon)) for lat, lon in row.polygon),
+                    fee=Decimal(row.fee or 0),
+                    eta_minutes=row.eta_minutes,
+                    priority=row.priority or 0
+                )
+                for row in rows
+            ]
+
+        self._index = ZoneIndex(zones)
+        self._loaded_at = time.monotonic()
+        print(f"🗺 Delivery zones loaded: {len(zones)}")
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    async def locate(self, lat: float, lon: float) -> Optional[Zone]:
+        return (await self.get_index()).locate(lat, lon)
+
+    async def get(self, zone_id: int) -> Optional[Zone]:
+        return (await self.get_index()).zones.get(zone_id)
+
+# Глобальный экземпляр
+delivery_zones = DeliveryZoneCache()
@@ -0,0 +1,56 @@
+import csv
+import os
+import tempfile
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.repositories import MovementRepository
+
+class InventoryExportService:
+    """Сервис выгрузки складских данных"""
+
+    CSV_HEADER = [
+        "id", "created_at", "flower_id", "flower_name", "movement_type",
+        "quantity", "batch_id", "order_id", "supply_order_id", "performed_by", "reason"
+    ]
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.movement_repo = MovementRepository(session)
+
+    async def export_movements_csv(self, start_date: date, end_date: date, chunk_size: int = 1000) -> str:
+        """Выгрузить движения за период во временный CSV файл, вернуть путь к файлу.
+
+        Строки пишутся по мере чтения с серверного курсора, поэтому память
+        не растет даже для выгрузки за год. Удалить файл - задача вызывающего.
+        """
+        fd, path = tempfile.mkstemp(prefix="movements_", suffix=".csv")
+
+        try:
+            # utf-8-sig чтобы Excel корректно открывал кириллицу
+            with os.fdopen(fd, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(self.CSV_HEADER)
+
+                async for row in self.movement_repo.stream_movements_by_period(
+                    start_date, end_date, chunk_size=chunk_size
+                ):
+                    movement_type = getattr(row.movement_type, "value", row.movement_type)
+                    writer.writerow([
+                        row.id,
+                        row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else "",
+                        row.flower_id,
+                        row.flower_name,
+                        movement_type,
+                        row.quantity,
+                        row.batch_id or "",
+                        row.order_id or "",
+                        row.supply_order_id or "",
+                        row.performed_by or "",
+                        row.reason or ""
+                    ])
+        except Exception:
+            os.remove(path)
+            raise
+
+        return path
@@ -0,0 +1,129 @@
+# app/services/maintenance.py
+
+"""Периодические фоновые задачи бота.
+
+Задача - корутина, принимающая bot. Планировщик запускает каждую задачу
+в своем цикле с заданным интервалом; ошибка одной итерации логируется и
+не останавливает цикл.
+"""
+
+import asyncio
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List
+
+from sqlalchemy import select, delete, exists
+
+from app.database.database import get_session
+from app.models import Consultation, ConsultationMessage
+from app.services.role_request_counter import pending_requests
+from app.services.courier_dispatch import dispatcher, DISPATCH_INTERVAL
+from app.services.order_assignment import order_assigner, ASSIGN_INTERVAL
+from app.services.notification_digest import notification_digest, DIGEST_CHECK_INTERVAL
+from app.services.staff_directory import staff_directory, STAFF_RESYNC_INTERVAL
+from app.services.recommendations import refresh_recommendations, RECOMMENDATIONS_INTERVAL
+from app.services.customer_segments import refresh_customer_segments, SEGMENTS_INTERVAL
+
+@dataclass
+class MaintenanceJob:
+    name: str
+    interval: float  # секунды
+    func: Callable[..., Awaitable[None]]
+    initial_delay: float = 60
+
+class MaintenanceScheduler:
+    """Планировщик периодических задач"""
+
+    def __init__(self):
+        self._jobs: List[MaintenanceJob] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(self, name: str, interval: float, func: Callable[..., Awaitable[None]],
+                initial_delay: float = 60) -> None:
+        self._jobs.append(MaintenanceJob(name, interval, func, initial_delay))
+
+    async def start(self, bot) -> None:
+        for job in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run(job, bot)))
+        print(f"✅ Фоновые задачи запущены: {', '.join(job.name for job in self._jobs)}")
+
+    async def _run(self, job: MaintenanceJob, bot) -> None:
+        await asyncio.sleep(job.initial_delay)
+        while True:
+            try:
+                await job.func(bot)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Maintenance job {job.name} error: {e}")
+            await asyncio.sleep(job.interval)
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+async def prune_archived_messages(bot, batch_size: int = 200) -> int:
+    """Удалить сообщения консультаций старше срока хранения, если переписка уже в transcript_store"""
+    from app.services.ai_archive_service import archive_queue
+    from app.services.transcript_store import transcript_store
+
+    retention_days = int(os.getenv("TRANSCRIPT_RETENTION_DAYS", "90"))
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    pruned = 0
+
+    async for session in get_session():
+        result = await session.execute(
+            select(Consultation.id, Consultation.archive_id)
+            .where(
+                Consultation.archive_id.is_not(None),
+                Consultation.completed_at < cutoff,
+                exists().where(ConsultationMessage.consultation_id == Consultation.id)
+            )
+            .limit(batch_size)
+        )
+
+        stored_ids = []
+        for consultation_id, archive_id in result.all():
+            if await transcript_store.exists(archive_id):
+                stored_ids.append(consultation_id)
+            else:
+                # Архив старого формата - сначала сохраняем переписку
+                archive_queue.enqueue(consultation_id)
+
+        if stored_ids:
+            delete_result = await session.execute(
+                delete(ConsultationMessage)
+                .where(ConsultationMessage.consultation_id.in_(stored_ids))
+            )
+            await session.commit()
+            pruned = delete_result.rowcount
+            print(f"🧹 Pruned {pruned} messages of {len(stored_ids)} archived consultations")
+
+    return pruned
+
+async def recompute_florist_ratings(bot) -> int:
+    """Точный пересчет рейтингов флористов - исправляет погрешность инкрементальных обновлений"""
+    from app.repositories import FloristRepository
+
+    async for session in get_session():
+        fixed = await FloristRepository(session).recompute_ratings()
+        await session.commit()
+        if fixed:
+            print(f"⭐ Corrected ratings of {fixed} florists")
+        return fixed
+
+# Глобальный экземпляр
+maintenance = MaintenanceScheduler()
+maintenance.add_job("prune_archived_messages", 6 * 3600, prune_archived_messages)
+maintenance.add_job("recompute_florist_ratings", 24 * 3600, recompute_florist_ratings)
+maintenance.add_job("refresh_pending_requests", 600, pending_requests.refresh)
+maintenance.add_job("resync_staff_directory", STAFF_RESYNC_INTERVAL, staff_directory.refresh)
+maintenance.add_job("dispatch_deliveries", DISPATCH_INTERVAL, dispatcher.run, initial_delay=30)
+maintenance.add_job("assign_orders", ASSIGN_INTERVAL, order_assigner.run, initial_delay=30)
+maintenance.add_job("flush_notification_digests", DIGEST_CHECK_INTERVAL, notification_digest.flush)
+maintenance.add_job("refresh_recommendations", RECOMMENDATIONS_INTERVAL, refresh_recommendations)
+maintenance.add_job("refresh_customer_segments", SEGMENTS_INTERVAL, refresh_customer_segments)
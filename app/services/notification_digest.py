@@ -0,0 +1,166 @@
+# app/services/notification_digest.py
+
+"""Сводки вместо мгновенных уведомлений о статусах заказов.
+
+У получателя (users.notify_digest_minutes) два режима:
+- пусто / 0 - каждое изменение приходит сразу, как раньше;
+- N - изменения копятся в буфере и раз в N минут приходят одной сводкой.
+
+Буфер - список в Redis на получателя (с откатом в память процесса, если Redis
+недоступен). Сводку по истечении окна отправляет задача обслуживания
+flush_notification_digests. Отмены заказов (CRITICAL_STATUSES) приходят
+сразу в любом режиме.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.utils.message_packing import split_text
+
+CRITICAL_STATUSES = frozenset({"canceled"})
+DIGEST_CHECK_INTERVAL = 60             # секунды
+DIGEST_BUFFER_TTL = 24 * 3600          # брошенные буферы удаляет Redis
+
+STATUS_LABELS = {
+    "accepted": "✅ ПРИНЯТ",
+    "canceled": "❌ ОТМЕНЕН",
+    "preparing": "🔄 ГОТОВИТСЯ",
+    "ready": "🎉 ГОТОВ",
+    "delivering": "🚚 ДОСТАВЛЯЕТСЯ",
+    "delivered": "✅ ДОСТАВЛЕН"
+}
+
+def status_label(status: str) -> str:
+    return STATUS_LABELS.get(status, status.upper())
+
+def render_digest(events: List[Dict], minutes: int) -> str:
+    """Одна сводка по событиям окна: цепочка статусов и кто менял - по каждому заказу"""
+    orders: Dict[int, Dict] = {}
+    for event in events:
+        entry = orders.setdefault(event["order_id"], {"statuses": [], "by": set()})
+        if not entry["statuses"] or entry["statuses"][-1] != event["status"]:
+            entry["statuses"].append(event["status"])
+        if event.get("by"):
+            entry["by"].add(event["by"])
+
+    lines = [
+        f"📊 <b>Сводка за {minutes} мин</b>",
+        f"Изменений: {len(events)}, заказов: {len(orders)}",
+        ""
+    ]
+    for order_id in sorted(orders):
+        entry = orders[order_id]
+        chain = " → ".join(status_label(status) for status in entry["statuses"])
+        by = f" ({', '.join(sorted(entry['by']))})" if entry["by"] else ""
+        lines.append(f"#{order_id}: {chain}{by}")
+    return "\n".join(lines)
+
+class NotificationDigest:
+    """Буфер событий для получателей в режиме сводки"""
+
+    KEY_PREFIX = "notify_digest:"
+
+    def __init__(self):
+        self._memory: Dict[str, List[str]] = {}
+
+    def _key(self, tg_id: str) -> str:
+        return f"{self.KEY_PREFIX}{tg_id}"
+
+    async def _redis(self):
+        from app.services.consultation_buffer import buffer_redis
+        return await buffer_redis.get_client()
+
+    async def defer(self, recipient, order_id: int, status: str, changed_by: str = None) -> bool:
+        """Положить событие в сводку получателя. False - отправлять сразу"""
+        if not recipient.notify_digest_minutes or status in CRITICAL_STATUSES:
+            return False
+
+        event = json.dumps({
+            "order_id": order_id,
+            "status": status,
+            "by": changed_by,
+            "at": datetime.utcnow().isoformat()
+        }, ensure_ascii=False)
+
+        client = await self._redis()
+        if client:
+            try:
+                key = self._key(recipient.tg_id)
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.rpush(key, event)
+                    pipe.expire(key, DIGEST_BUFFER_TTL)
+                    await pipe.execute()
+                return True
+            except Exception as e:
+                print(f"⚠️ Digest Redis error: {e}, буферизуем в памяти")
+
+        self._memory.setdefault(recipient.tg_id, []).append(event)
+        return True
+
+    async def oldest(self, tg_id: str) -> Optional[datetime]:
+        """Время самого раннего события в буфере получателя"""
+        raw = []
+        if self._memory.get(tg_id):
+            raw.append(self._memory[tg_id][0])
+
+        client = await self._redis()
+        if client:
+            try:
+                first = await client.lindex(self._key(tg_id), 0)
+                if first:
+                    raw.append(first)
+            except Exception as e:
+                print(f"⚠️ Digest Redis error: {e}")
+
+        times = [datetime.fromisoformat(json.loads(item)["at"]) for item in raw]
+        return min(times) if times else None
+
+    async def drain(self, tg_id: str) -> List[Dict]:
+        """Забрать и очистить буфер получателя"""
+        raw = self._memory.pop(tg_id, [])
+
+        client = await self._redis()
+        if client:
+            try:
+                key = self._key(tg_id)
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.lrange(key, 0, -1)
+                    pipe.delete(key)
+                    stored, _ = await pipe.execute()
+                raw = list(stored) + raw
+            except Exception as e:
+                print(f"⚠️ Digest Redis error: {e}")
+
+        events = [json.loads(item) for item in raw]
+        events.sort(key=lambda event: event["at"])
+        return events
+
+    async def flush(self, bot) -> int:
+        """Отправить сводки, у которых истекло окно (задача обслуживания). Возвращает число сводок"""
+        from app.services.staff_directory import staff_directory
+
+        recipients = await staff_directory.digest_recipients()
+        now = datetime.utcnow()
+        sent = 0
+        for recipient in recipients:
+            oldest = await self.oldest(recipient.tg_id)
+            if not oldest or (now - oldest).total_seconds() < recipient.notify_digest_minutes * 60:
+                continue
+
+            events = await self.drain(recipient.tg_id)
+            if not events:
+                continue
+            for part in split_text(render_digest(events, recipient.notify_digest_minutes)):
+                try:
+                    await bot.send_message(chat_id=int(recipient.tg_id), text=part, parse_mode="HTML")
+                except Exception as e:
+                    print(f"Failed to send digest to {recipient.tg_id}: {e}")
+            sent += 1
+
+        if sent:
+            print(f"📊 Отправлено сводок: {sent}")
+        return sent
+
+# Глобальный экземпляр
+notification_digest = NotificationDigest()
@@ -6,6 +6,37 @@ from datetime import datetime
 
 from app.models import User, Order, RoleRequest
 from app.translate import t
+from app.services.notification_digest import notification_digest, status_label
+
+def _order_details(order, lang: str) -> str:
+    """Карточка заказа: клиент, контакты, сумма, состав"""
+    user_name = getattr(order.user, 'first_name', 'Неизвестно') or 'Неизвестно'
+    
+    # ПОЛУЧАЕМ ДЕТАЛИ ЗАКАЗА (позиции) - ИСПРАВЛЕННАЯ ЛОГИКА
+    order_items = []
+    try:
+        if hasattr(order, 'items') and order.items:
+            for item in order.items:
+                if hasattr(item, 'product') and item.product:
+                    product_name = item.product.name_ru if lang == "ru" else item.product.name_uz
+                    order_items.append(f"• {product_name} × {item.qty}")
+                else:
+                    order_items.append(f"• Товар ID:{item.product_id} × {item.qty}")
+    except Exception as e:
+        print(f"Error getting order items: {e}")
+    
+    items_text = "\n".join(order_items) if order_items else "Позиции заказа недоступны"
+    
+    return (
+        f"🆕 <b>Новый заказ #{order.id}</b>\n\n"
+        f"👤 <b>Клиент:</b> {user_name}\n"
+        f"📞 <b>Телефон:</b> {order.phone or 'Не указан'}\n"
+        f"📍 <b>Адрес:</b> {order.address or 'Не указан'}\n"
+        f"💰 <b>Сумма:</b> {order.total_price} сум\n"
+        f"🗓 <b>Создан:</b> {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
+        f"🛍 <b>Состав заказа:</b>\n{items_text}\n\n"
+        f"💬 <b>Комментарий:</b> {order.comment or 'Нет'}"
+    )
 
 class NotificationService:
     """Сервис уведомлений"""
@@ -56,35 +87,7 @@ class NotificationService:
     
     async def notify_florists_about_order(self, florists: list, order, lang: str):
         """Уведомить флористов о новом заказе С ПОДРОБНОСТЯМИ"""
-        user_name = getattr(order.user, 'first_name', 'Неизвестно') or 'Неизвестно'
-        
-        # ПОЛУЧАЕМ ДЕТАЛИ ЗАКАЗА (позиции) - ИСПРАВЛЕННАЯ ЛОГИКА
-        order_items = []
-        try:
-            if hasattr(order, 'items') and order.items:
-                for item in order.items:
-                    if hasattr(item, 'product') and item.product:
-                        product_name = item.product.name_ru if lang == "ru" else item.product.name_uz
-                        order_items.append(f"• {product_name} × {item.qty}")
-                    else:
-                        order_items.append(f"• Товар ID:{item.product_id} × {item.qty}")
-        except Exception as e:
-            print(f"Error getting order items: {e}")
-        
-        items_text = "\n".join(order_items) if order_items else "Позиции заказа недоступны"
-        
-        # ИНФОРМАТИВНОЕ УВЕДОМЛЕНИЕ
-        message = (
-            f"🆕 <b>Новый заказ #{order.id}</b>\n\n"
-            f"👤 <b>Клиент:</b> {user_name}\n"
-            f"📞 <b>Телефон:</b> {order.phone}\n"
-            f"📍 <b>Адрес:</b> {order.address}\n"
-            f"💰 <b>Сумма:</b> {order.total_price} сум\n"
-            f"🗓 <b>Создан:</b> {order.created_at.strftime('%d.%m.%Y %H:%M')}\n\n"
-            f"🛍 <b>Состав заказа:</b>\n{items_text}\n\n"
-            f"💬 <b>Комментарий:</b> {order.comment or 'Нет'}\n\n"
-            f"📋 Управляйте заказом через меню 'Управление заказами'"
-        )
+        message = _order_details(order, lang) + "\n\n📋 Управляйте заказом через меню 'Управление заказами'"
         
         print(f"📧 Отправляем уведомление: {message[:100]}...")
         
@@ -99,6 +102,63 @@ class NotificationService:
             except Exception as e:
                 print(f"❌ Failed to notify florist {florist.tg_id}: {e}")
     
+    async def send_order_offer(self, florist: User, order, timeout_minutes: int) -> bool:
+        """Предложить заказ одному флористу (Принять / Отказаться)"""
+        lang = florist.lang or "ru"
+        text = (
+            _order_details(order, lang)
+            + f"\n\n⏳ Заказ предложен вам. Если не ответить за {timeout_minutes} мин, он уйдет другому флористу."
+        )
+        kb = types.InlineKeyboardMarkup(inline_keyboard=[
+            [types.InlineKeyboardButton(text="✅ Принять в работу", callback_data=f"accept_order_{order.id}")],
+            [types.InlineKeyboardButton(text="↪️ Отказаться", callback_data=f"decline_offer_{order.id}")]
+        ])
+        try:
+            await self.bot.send_message(chat_id=int(florist.tg_id), text=text, reply_markup=kb, parse_mode="HTML")
+            return True
+        except Exception as e:
+            print(f"❌ Failed to offer order #{order.id} to florist {florist.tg_id}: {e}")
+            return False
+    
+    async def send_order_to_channel(self, order, channel_id: str) -> None:
+        """Отправить заказ в канал флористов С ПОДРОБНОСТЯМИ"""
+        from app.services.delivery_zones import delivery_zones
+        
+        try:
+            # Проверяем настройки канала
+            if not channel_id:
+                print("⚠️ FLORIST_CHANNEL_ID не настроен в .env")
+                return
+                
+            if not channel_id.startswith("-"):
+                print(f"⚠️ Неверный формат FLORIST_CHANNEL_ID: {channel_id}")
+                return
+            
+            zone_text = ""
+            zone = await delivery_zones.get(order.delivery_zone_id) if order.delivery_zone_id else None
+            if zone:
+                zone_text = f"\n🚚 <b>Зона:</b> {zone.name_ru} (доставка {order.delivery_fee} сум)"
+            
+            text = _order_details(order, "ru") + zone_text
+            
+            kb = types.InlineKeyboardMarkup(inline_keyboard=[
+                [types.InlineKeyboardButton(text="✅ Принять в работу", callback_data=f"accept_order_{order.id}")],
+                [types.InlineKeyboardButton(text="❌ Отменить заказ", callback_data=f"cancel_order_{order.id}")]
+            ])
+            
+            await self.bot.send_message(
+                chat_id=int(channel_id),
+                text=text,
+                reply_markup=kb,
+                parse_mode="HTML"
+            )
+            print(f"✅ Заказ #{order.id} отправлен в канал {channel_id}")
+            
+        except Exception as e:
+            print(f"❌ Ошибка отправки в канал {channel_id}: {e}")
+            import traceback
+            traceback.print_exc()
+    
     async def notify_user_about_order_status(self, user: User, order: Order) -> None:
         """Уведомить пользователя об изменении статуса заказа"""
         lang = user.lang or "ru"
@@ -114,96 +174,64 @@ class NotificationService:
         except Exception:
             pass
 
-    async def notify_order_status_change(self, order, new_status: str, changed_by_user, lang: str = "ru"):
-        """Уведомить о смене статуса заказа"""
+    async def notify_order_status_change(self, order, new_status: str, changed_by_user, lang: str = "ru",
+                                         notify_florists: bool = True):
+        """Уведомить о смене статуса заказа.
+        
+        notify_florists=False - только владельцам: заказ, назначенный одному флористу,
+        остальные и не видели.
+        """
         from app.models import RoleEnum
+        from app.services.staff_directory import staff_directory
         
-        # Получаем всех владельцев для уведомления
-        from app.database.database import get_session
-        from app.services import UserService
+        # Получатели - из справочника персонала, без запросов к БД
+        owners = await staff_directory.owners()
+        florists = await staff_directory.florists()
         
-        async for session in get_session():
-            user_service = UserService(session)
-            owners = await user_service.user_repo.get_by_role(RoleEnum.owner)
-            florists = await user_service.user_repo.get_by_role(RoleEnum.florist)
-            
-            status_emoji = {
-                "accepted": "✅ ПРИНЯТ",
-                "canceled": "❌ ОТМЕНЕН", 
-                "preparing": "🔄 ГОТОВИТСЯ",
-                "ready": "🎉 ГОТОВ",
-                "delivering": "🚚 ДОСТАВЛЯЕТСЯ",
-                "delivered": "✅ ДОСТАВЛЕН"
-            }
-            
-            status_text = status_emoji.get(new_status, new_status.upper())
-            changer_name = f"{changed_by_user.first_name} {changed_by_user.last_name or ''}".strip()
-            changer_role = "👑 Владелец" if changed_by_user.role == RoleEnum.owner else "🌸 Флорист"
-            
-            message = (
-                f"📢 <b>Изменение статуса заказа</b>\n\n"
-                f"🆔 <b>Заказ:</b> #{order.id}\n"
-                f"📊 <b>Статус:</b> {status_text}\n"
-                f"👤 <b>Изменил:</b> {changer_name} ({changer_role})\n"
-                f"🕐 <b>Время:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
-                f"💰 Сумма: {order.total_price} сум\n"
-                f"📍 Адрес: {order.address}"
-            )
-            
-            # Уведомляем владельцев (они видят кто принял)
-            for owner in owners:
-                try:
-                    await self.bot.send_message(
-                        chat_id=int(owner.tg_id),
-                        text=message,
-                        parse_mode="HTML"
-                    )
-                except Exception as e:
-                    print(f"Failed to notify owner {owner.tg_id}: {e}")
-            
-            # Флористов уведомляем только если заказ принят (чтобы они знали что заказ занят)
-            if new_status in ["accepted", "canceled"]:
-                simple_message = (
-                    f"📢 Заказ #{order.id} {status_text}\n"
-                    f"👤 Принял: {changer_name}"
+        status_text = status_label(new_status)
+        changer_name = f"{changed_by_user.first_name} {changed_by_user.last_name or ''}".strip()
+        changer_role = "👑 Владелец" if changed_by_user.role == RoleEnum.owner else "🌸 Флорист"
+        
+        message = (
+            f"📢 <b>Изменение статуса заказа</b>\n\n"
+            f"🆔 <b>Заказ:</b> #{order.id}\n"
+            f"📊 <b>Статус:</b> {status_text}\n"
+            f"👤 <b>Изменил:</b> {changer_name} ({changer_role})\n"
+            f"🕐 <b>Время:</b> {datetime.now().strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"💰 Сумма: {order.total_price} сум\n"
+            f"📍 Адрес: {order.address}"
+        )
+        
+        # Уведомляем владельцев (они видят кто принял); в режиме сводки - позже одним сообщением
+        for owner in owners:
+            if await notification_digest.defer(owner, order.id, new_status, changer_name):
+                continue
+            try:
+                await self.bot.send_message(
+                    chat_id=int(owner.tg_id),
+                    text=message,
+                    parse_mode="HTML"
                 )
-                
-                for florist in florists:
-                    # НЕ уведомляем того кто принял заказ
-                    if florist.id != changed_by_user.id:
-                        try:
-                            await self.bot.send_message(
-                                chat_id=int(florist.tg_id),
-                                text=simple_message,
-                                parse_mode="HTML"
-                            )
-                        except Exception as e:
-                            print(f"Failed to notify florist {florist.tg_id}: {e}")
-
-    async def hide_order_from_other_florists(self, order_id: int, taken_by_user):
-        """Скрыть заказ у других флористов после принятия"""
-        from app.database.database import get_session
-        from app.services import UserService
-        from app.models import RoleEnum
+            except Exception as e:
+                print(f"Failed to notify owner {owner.tg_id}: {e}")
         
-        async for session in get_session():
-            user_service = UserService(session)
-            florists = await user_service.user_repo.get_by_role(RoleEnum.florist)
-            
-            hide_message = (
-                f"🔒 <b>Заказ #{order_id} принят</b>\n\n"
-                f"👤 Принял: {taken_by_user.first_name}\n"
-                f"📊 Заказ больше недоступен для принятия"
+        # Флористов уведомляем только если заказ принят (чтобы они знали что заказ занят)
+        if notify_florists and new_status in ["accepted", "canceled"]:
+            simple_message = (
+                f"📢 Заказ #{order.id} {status_text}\n"
+                f"👤 Принял: {changer_name}"
             )
             
             for florist in florists:
-                # НЕ отправляем тому кто принял
-                if florist.id != taken_by_user.id:
+                # НЕ уведомляем того кто принял заказ
+                if florist.id != changed_by_user.id:
+                    if await notification_digest.defer(florist, order.id, new_status, changer_name):
+                        continue
                     try:
                         await self.bot.send_message(
                             chat_id=int(florist.tg_id),
-                            text=hide_message,
+                            text=simple_message,
                             parse_mode="HTML"
                         )
                     except Exception as e:
-                        print(f"Failed to hide order from florist {florist.tg_id}: {e}")
\ No newline at end of file
+                        print(f"Failed to notify florist {florist.tg_id}: {e}")
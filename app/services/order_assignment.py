@@ -0,0 +1,131 @@
+# app/services/order_assignment.py
+
+"""Назначение новых заказов флористам.
+
+Вместо рассылки всем флористам и владельцам заказ предлагается одному -
+наименее загруженному (заказы в работе + висящие предложения + активные
+консультации, недавно заходившие - раньше). Дальше:
+- отказ или молчание дольше OFFER_TIMEOUT -> следующий флорист;
+- после MAX_OFFERS попыток или если предлагать некому -> статус await_florist
+  и публикация в канале флористов (без канала - прежняя рассылка всем).
+
+Итого на заказ 1-3 личных сообщения вместо двух рассылок по всему персоналу.
+Принятие - условный UPDATE (OrderRepository.claim), поэтому заказ из канала
+и из личного предложения не может достаться двоим.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional, Set, Tuple
+
+from app.config import config
+from app.database.database import get_session
+from app.models import Order, User
+
+ASSIGN_INTERVAL = 60                     # секунды
+OFFER_TIMEOUT = timedelta(minutes=3)
+MAX_OFFERS = 3
+ONLINE_WINDOW = timedelta(minutes=30)    # "в сети" для приоритета при выборе
+LOST_ORDER_WINDOW = timedelta(days=1)    # новые заказы без предложения старше этого не трогаем
+
+class OrderAssigner:
+    """Предложения заказов флористам по одному"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._kicks: Set[asyncio.Task] = set()   # ссылки держим, иначе задачу может собрать GC
+
+    async def _next_step(self, session, order: Order) -> Tuple[str, Optional[User]]:
+        """Предложить заказ следующему флористу или отдать в канал.
+        Возвращает ("offer", флорист), ("escalate", None) или ("skip", None)"""
+        from app.repositories import OrderRepository, FloristRepository
+
+        order_repo = OrderRepository(session)
+        skipped = list(order.offer_skipped or [])
+
+        if len(skipped) < MAX_OFFERS:
+            candidate = await FloristRepository(session).get_least_loaded(
+                datetime.utcnow() - ONLINE_WINDOW, exclude=skipped
+            )
+            if candidate:
+                florist, load = candidate
+                if await order_repo.offer_to(order.id, florist.id):
+                    print(f"🌸 Заказ #{order.id} -> флорист {florist.id} (нагрузка {load})")
+                    return "offer", florist
+                return "skip", None
+
+        if await order_repo.escalate(order.id):
+            return "escalate", None
+        return "skip", None
+
+    async def run(self, bot) -> None:
+        """Один проход: истекшие предложения -> следующему, непредложенные заказы -> первому"""
+        from app.repositories import OrderRepository
+        from app.services import OrderService, NotificationService
+        from app.services.staff_directory import staff_directory
+
+        async with self._lock:
+            async for session in get_session():
+                order_repo = OrderRepository(session)
+                now = datetime.utcnow()
+
+                # 1. Молчание флориста = отказ
+                for order in await order_repo.get_expired_offers(now - OFFER_TIMEOUT):
+                    await order_repo.skip_offer(order, order.offered_florist_id)
+
+                # 2. Следующий шаг для всех непредложенных (новые и после отказа)
+                steps = []
+                for order in await order_repo.get_unoffered(now - LOST_ORDER_WINDOW):
+                    action, florist = await self._next_step(session, order)
+                    if action != "skip":
+                        steps.append((order.id, action, florist))
+
+                await session.commit()
+
+                if not steps:
+                    return
+
+                order_service = OrderService(session)
+                notification_service = NotificationService(bot)
+
+                for order_id, action, florist in steps:
+                    order = await order_service.get_order_with_details(order_id)
+                    if action == "offer":
+                        # Ответа не будет - предложение истечет по OFFER_TIMEOUT
+                        await notification_service.send_order_offer(
+                            florist, order, int(OFFER_TIMEOUT.total_seconds() // 60)
+                        )
+                    elif config.FLORIST_CHANNEL_ID:
+                        print(f"📢 Заказ #{order_id} никто не взял - в канал {config.FLORIST_CHANNEL_ID}")
+                        await notification_service.send_order_to_channel(order, config.FLORIST_CHANNEL_ID)
+                    else:
+                        # Канала нет - остается рассылка всем, как раньше
+                        staff = await staff_directory.florists() + await staff_directory.owners()
+                        await notification_service.notify_florists_about_order(staff, order, "ru")
+
+    async def decline(self, order_id: int, florist_id: int) -> bool:
+        """Флорист отказался от предложения"""
+        from app.repositories import OrderRepository
+
+        async for session in get_session():
+            order_repo = OrderRepository(session)
+            order = await order_repo.get(order_id)
+            if not order or not await order_repo.skip_offer(order, florist_id):
+                return False
+            await session.commit()
+            return True
+
+    def kick(self, bot) -> None:
+        """Запустить проход сразу, не дожидаясь интервала"""
+        async def _run():
+            try:
+                await self.run(bot)
+            except Exception as e:
+                print(f"❌ Order assignment error: {e}")
+
+        task = asyncio.create_task(_run())
+        self._kicks.add(task)
+        task.add_done_callback(self._kicks.discard)
+
+# Глобальный экземпляр
+order_assigner = OrderAssigner()
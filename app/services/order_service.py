@@ -1,11 +1,13 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from decimal import Decimal
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.repositories import OrderRepository, ProductRepository
+from app.repositories import OrderRepository, ProductRepository, DeliverySlotRepository, CustomerStatsRepository
+from app.services.delivery_slots import slot_availability, slot_period
 from app.models import Order, OrderStatusEnum
 from app.schemas.order import OrderCreate, OrderResponse
-from app.exceptions import OrderNotFoundError, ProductNotFoundError
+from app.exceptions import OrderNotFoundError, ProductNotFoundError, SlotUnavailableError
 
 class OrderService:
     """Сервис для работы с заказами"""
@@ -14,6 +16,8 @@ class OrderService:
         self.session = session
         self.order_repo = OrderRepository(session)
         self.product_repo = ProductRepository(session)
+        self.slot_repo = DeliverySlotRepository(session)
+        self.stats_repo = CustomerStatsRepository(session)
     
     async def create_order(self, user_id: int, cart_items: Dict[int, int], 
                           order_data: OrderCreate) -> Order:
@@ -47,7 +51,12 @@ class OrderService:
             "status": OrderStatusEnum.new
         })
         
+        # Место в слоте доставки - условный инкремент, без подсчета заказов
+        if order_data.slot_at:
+            await self._book_slot(order_data.slot_at)
+        
         order = await self.order_repo.create_with_items(order_dict, items_data)
+        await self.stats_repo.record_order(user_id, order.created_at)
         
         # Обновление остатков
         for product_id, quantity in cart_items.items():
@@ -61,17 +70,57 @@ class OrderService:
         """Получить заказы пользователя"""
         return await self.order_repo.get_user_orders(user_id)
     
+    async def get_user_orders_page(self, user_id: int, limit: int, statuses=None,
+                                   before=None, after=None) -> Tuple[List[Order], bool]:
+        """Страница заказов пользователя по курсору (см. OrderRepository.get_user_orders_page)"""
+        return await self.order_repo.get_user_orders_page(user_id, limit, statuses, before, after)
+    
+    async def get_user_order_stats(self, user_id: int) -> Dict[OrderStatusEnum, Tuple[int, Decimal]]:
+        """Число заказов и сумма по статусам"""
+        return await self.order_repo.get_user_stats(user_id)
+    
+    async def get_customer_stats(self, user_id: int):
+        """Сводка по клиенту (None - заказов не было)"""
+        return await self.stats_repo.get(user_id)
+    
     async def get_orders_for_florist(self) -> List[Order]:
         """Получить заказы для флориста"""
         new_orders = await self.order_repo.get_orders_by_status(OrderStatusEnum.new)
         pending_orders = await self.order_repo.get_orders_by_status(OrderStatusEnum.await_florist)
         return new_orders + pending_orders
     
+    async def _book_slot(self, slot_at: datetime) -> None:
+        """Занять место в слоте или SlotUnavailableError.
+
+        Кэш доступности сбрасывает вызывающий после коммита: сброс до коммита
+        позволил бы параллельной загрузке закэшировать старое число мест.
+        """
+        period = slot_period(slot_at)
+        if period is None:
+            raise SlotUnavailableError(slot_at)
+        
+        availability = await slot_availability.get()
+        booked = await self.slot_repo.book(slot_at, availability.capacities[period])
+        if not booked:
+            raise SlotUnavailableError(slot_at)
+    
     async def update_order_status(self, order_id: int, status: OrderStatusEnum) -> Order:
         """Обновить статус заказа"""
-        order = await self.order_repo.update_status(order_id, status)
+        order = await self.order_repo.get(order_id)
         if not order:
             raise OrderNotFoundError(order_id)
+        
+        previous = order.status
+        order = await self.order_repo.update_status(order_id, status)
+        
+        if status == OrderStatusEnum.canceled and previous != OrderStatusEnum.canceled:
+            # Отмена освобождает место в слоте доставки (кэш сбрасывает вызывающий после коммита)
+            if order.slot_at:
+                await self.slot_repo.release(order.slot_at)
+            delivered_total = order.total_price if previous == OrderStatusEnum.delivered else None
+            await self.stats_repo.record_canceled(order.user_id, delivered_total)
+        elif status == OrderStatusEnum.delivered and previous != OrderStatusEnum.delivered:
+            await self.stats_repo.record_delivered([order_id])
         return order
     
     async def get_all_orders(self, limit: int = 100) -> List[Order]:
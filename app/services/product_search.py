@@ -0,0 +1,144 @@
+# app/services/product_search.py
+
+"""Каталог в памяти и префиксный индекс для подсказок при наборе.
+
+Снимок активных товаров перечитывается из БД не чаще раза в ttl секунд.
+По нему строится отсортированный список слов названий (в латинице, см.
+app/utils/translit.py) - поиск по префиксу это bisect без обращения к БД.
+"""
+
+import asyncio
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional, Set
+
+from app.utils.translit import search_tokens, transliterate
+
+@dataclass(frozen=True)
+class CatalogProduct:
+    """Товар из снимка каталога"""
+    id: int
+    category_id: int
+    name_ru: str
+    name_uz: str
+    desc_ru: Optional[str]
+    desc_uz: Optional[str]
+    price: Decimal
+    photo_file_id: Optional[str]
+    photo_url: Optional[str]
+
+    def name(self, lang: str) -> str:
+        return self.name_ru if lang == "ru" else self.name_uz
+
+    def description(self, lang: str) -> str:
+        return (self.desc_ru if lang == "ru" else self.desc_uz) or ""
+
+class PrefixIndex:
+    """Поиск товаров по префиксам слов названия"""
+
+    def __init__(self, products: List[CatalogProduct]):
+        entries = sorted(
+            (token, product.id)
+            for product in products
+            for token in set(search_tokens(f"{product.name_ru} {product.name_uz}"))
+        )
+        self._tokens = [token for token, _ in entries]
+        self._ids = [product_id for _, product_id in entries]
+        self._names = {product.id: transliterate(product.name_ru) for product in products}
+
+    def _ids_with_prefix(self, prefix: str) -> Set[int]:
+        ids = set()
+        i = bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            ids.add(self._ids[i])
+            i += 1
+        return ids
+
+    def search(self, query: str, limit: int = 20) -> List[int]:
+        """id товаров, в названии которых каждое слово запроса - начало какого-то слова"""
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+
+        ids = self._ids_with_prefix(tokens[0])
+        for token in tokens[1:]:
+            if not ids:
+                break
+            ids &= self._ids_with_prefix(token)
+
+        # Выше - названия, которые начинаются с запроса
+        normalized = " ".join(tokens)
+        ranked = sorted(ids, key=lambda i: (not self._names[i].startswith(normalized), self._names[i]))
+        return ranked[:limit]
+
+class CatalogCache:
+    """Снимок активных товаров с префиксным индексом"""
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._products: Dict[int, CatalogProduct] = {}
+        self._index = PrefixIndex([])
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        # Растет при каждой перезагрузке - ключ для производных кэшей
+        self.version = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    async def _ensure_loaded(self) -> None:
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if self._is_fresh():
+                return
+            await self._load()
+
+    async def _load(self) -> None:
+        from app.database.database import get_session
+        from app.repositories import ProductRepository
+
+        async for session in get_session():
+            products = await ProductRepository(session).get_active_products(limit=None)
+            snapshot = [
+                CatalogProduct(
+                    id=p.id,
+                    category_id=p.category_id,
+                    name_ru=p.name_ru,
+                    name_uz=p.name_uz,
+                    desc_ru=p.desc_ru,
+                    desc_uz=p.desc_uz,
+                    price=p.price,
+                    photo_file_id=p.photo_file_id,
+                    photo_url=p.photo_url
+                )
+                for p in products
+            ]
+
+        self._products = {product.id: product for product in snapshot}
+        self._index = PrefixIndex(snapshot)
+        self._loaded_at = time.monotonic()
+        self.version += 1
+        print(f"📚 Catalog cache loaded: {len(snapshot)} products")
+
+    def invalidate(self) -> None:
+        """Перечитать каталог при следующем обращении"""
+        self._loaded_at = None
+
+    async def get_products(self) -> List[CatalogProduct]:
+        await self._ensure_loaded()
+        return list(self._products.values())
+
+    async def get(self, product_id: int) -> Optional[CatalogProduct]:
+        await self._ensure_loaded()
+        return self._products.get(product_id)
+
+    async def suggest(self, query: str, limit: int = 20) -> List[CatalogProduct]:
+        """Подсказки по префиксу без обращения к БД"""
+        await self._ensure_loaded()
+        return [self._products[product_id] for product_id in self._index.search(query, limit)]
+
+# Глобальный экземпляр
+catalog_cache = CatalogCache()
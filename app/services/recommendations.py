@@ -0,0 +1,86 @@
+# app/services/recommendations.py
+
+"""Рекомендации по истории заказов: "Популярное" и "Часто берут вместе".
+
+Задача обслуживания раз в RECOMMENDATIONS_INTERVAL берет только заказы после
+водяного знака (настройка recommendations_last_order_id) и:
+1. старит накопленные оценки множителем 2^(-прошло/HALF_LIFE) - так старые
+   продажи затухают без пересчета всей истории;
+2. добавляет вклад новых заказов: популярность - штуки товара, пары - по
+   каждой паре разных товаров одного заказа, с тем же затуханием по возрасту;
+3. обрезает пары до RELATED_KEEP лучших на товар.
+
+Матрица совместных покупок разреженная (только встречавшиеся пары), поэтому
+считается словарями в памяти, без numpy. Каталог читает готовые таблицы
+product_popularity и product_pairs по индексу.
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+
+from app.database.database import get_session
+
+RECOMMENDATIONS_INTERVAL = 3600          # секунды
+HALF_LIFE = timedelta(days=30)
+SETTLE_DELAY = timedelta(hours=1)        # свежие заказы ждут - большинство отмен происходит раньше
+RELATED_KEEP = 10
+MIN_SCORE = 0.01
+WATERMARK_SETTING = "recommendations_last_order_id"
+UPDATED_SETTING = "recommendations_updated_at"
+
+def decay_factor(elapsed: timedelta, half_life: timedelta = HALF_LIFE) -> float:
+    """Во сколько раз ослабевает оценка за elapsed"""
+    return math.pow(0.5, max(elapsed.total_seconds(), 0) / half_life.total_seconds())
+
+def accumulate(lines: Iterable[Tuple[int, datetime, int, int]], now: datetime,
+               half_life: timedelta = HALF_LIFE) -> Tuple[Dict[int, float], Dict[Tuple[int, int], float]]:
+    """Вклад позиций заказов (заказ, создан, товар, штук) в популярность и пары на момент now"""
+    orders: Dict[int, Tuple[float, Dict[int, int]]] = {}
+    for order_id, created_at, product_id, qty in lines:
+        weight, items = orders.setdefault(order_id, (decay_factor(now - created_at, half_life), {}))
+        items[product_id] = items.get(product_id, 0) + qty
+
+    popularity: Dict[int, float] = defaultdict(float)
+    pairs: Dict[Tuple[int, int], float] = defaultdict(float)
+    for weight, items in orders.values():
+        for product_id, qty in items.items():
+            popularity[product_id] += qty * weight
+        products = sorted(items)
+        for i, product_id in enumerate(products):
+            for related_id in products[i + 1:]:
+                pairs[(product_id, related_id)] += weight
+                pairs[(related_id, product_id)] += weight
+    return dict(popularity), dict(pairs)
+
+async def refresh_recommendations(bot=None) -> int:
+    """Учесть новые заказы (задача обслуживания). Возвращает число обработанных заказов"""
+    from app.repositories import RecommendationRepository, SettingsRepository
+
+    async for session in get_session():
+        settings_repo = SettingsRepository(session)
+        rec_repo = RecommendationRepository(session)
+        now = datetime.utcnow()
+
+        watermark = await settings_repo.get_int_value(WATERMARK_SETTING, 0)
+        updated = await settings_repo.get_by_key(UPDATED_SETTING)
+        if updated and updated.value:
+            await rec_repo.decay(decay_factor(now - datetime.fromisoformat(updated.value)), MIN_SCORE)
+
+        lines = await rec_repo.get_new_order_lines(watermark, now - SETTLE_DELAY)
+        popularity, pairs = accumulate(lines, now)
+        await rec_repo.add_popularity(popularity)
+        await rec_repo.add_pairs(pairs)
+        if pairs:
+            await rec_repo.prune_pairs(RELATED_KEEP)
+
+        processed = len({line[0] for line in lines})
+        if lines:
+            await settings_repo.set_value(WATERMARK_SETTING, str(max(line[0] for line in lines)))
+        await settings_repo.set_value(UPDATED_SETTING, now.isoformat())
+        await session.commit()
+
+    if processed:
+        print(f"🔥 Рекомендации: учтено заказов {processed}")
+    return processed
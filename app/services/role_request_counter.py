@@ -0,0 +1,41 @@
+# app/services/role_request_counter.py
+
+"""Счетчик ожидающих заявок на роли для меню владельца.
+
+Значение читается из БД при старте и сверяется задачей обслуживания, а
+между сверками меняется в обработчиках после commit: создание заявки +1,
+одобрение/отклонение -1. Меню владельца берет число из памяти без I/O.
+"""
+
+from app.database.database import get_session
+
+class PendingRequestsCounter:
+    """Число заявок со статусом pending"""
+
+    def __init__(self):
+        self._value = 0
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+    def increment(self) -> None:
+        self._value += 1
+
+    def decrement(self) -> None:
+        self._value = max(0, self._value - 1)
+
+    async def refresh(self, bot=None) -> int:
+        """Перечитать точное значение из БД (bot - для задачи обслуживания)"""
+        from app.repositories import UserRepository
+
+        async for session in get_session():
+            count = await UserRepository(session).count_pending_requests()
+
+        if count != self._value:
+            print(f"📋 Pending role requests: {self._value} -> {count}")
+        self._value = count
+        return count
+
+# Глобальный экземпляр
+pending_requests = PendingRequestsCounter()
@@ -0,0 +1,98 @@
+# app/services/staff_directory.py
+
+"""Справочник персонала для рассылок.
+
+Владельцы, флористы и курьеры (id, tg_id, язык, режим уведомлений) держатся
+в памяти, поэтому рассылки о заказах и заявках начинаются без запросов к БД.
+Справочник читается при старте, перечитывается после смены роли или
+настроек уведомлений в обработчиках и сверяется задачей обслуживания.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.database.database import get_session
+from app.models import RoleEnum
+
+STAFF_ROLES = (RoleEnum.owner, RoleEnum.florist, RoleEnum.courier)
+STAFF_RESYNC_INTERVAL = 600            # секунды
+
+@dataclass(frozen=True)
+class StaffMember:
+    id: int
+    tg_id: str
+    role: RoleEnum
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    lang: Optional[str] = None
+    notify_digest_minutes: Optional[int] = None
+
+    @classmethod
+    def from_user(cls, user) -> "StaffMember":
+        return cls(
+            id=user.id,
+            tg_id=user.tg_id,
+            role=user.role,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            lang=user.lang,
+            notify_digest_minutes=user.notify_digest_minutes
+        )
+
+class StaffDirectory:
+    """Персонал по ролям в памяти процесса"""
+
+    def __init__(self):
+        self._by_role: Dict[RoleEnum, Tuple[StaffMember, ...]] = {}
+        self._loaded = False
+        self._lock = asyncio.Lock()
+
+    async def get(self, role: RoleEnum) -> Tuple[StaffMember, ...]:
+        if not self._loaded:
+            await self.refresh()
+        return self._by_role.get(role, ())
+
+    async def owners(self) -> Tuple[StaffMember, ...]:
+        return await self.get(RoleEnum.owner)
+
+    async def florists(self) -> Tuple[StaffMember, ...]:
+        return await self.get(RoleEnum.florist)
+
+    async def digest_recipients(self) -> List[StaffMember]:
+        """Персонал в режиме сводки уведомлений"""
+        if not self._loaded:
+            await self.refresh()
+        return [
+            member
+            for members in self._by_role.values()
+            for member in members
+            if member.notify_digest_minutes
+        ]
+
+    def load(self, users) -> None:
+        """Заменить справочник списком пользователей"""
+        by_role: Dict[RoleEnum, List[StaffMember]] = {role: [] for role in STAFF_ROLES}
+        for user in users:
+            if user.role in by_role:
+                by_role[user.role].append(StaffMember.from_user(user))
+        self._by_role = {role: tuple(members) for role, members in by_role.items()}
+        self._loaded = True
+
+    async def refresh(self, bot=None) -> int:
+        """Перечитать персонал из БД одним запросом (bot - для задачи обслуживания)"""
+        from app.repositories import UserRepository
+
+        async with self._lock:
+            async for session in get_session():
+                users = await UserRepository(session).get_staff(STAFF_ROLES)
+
+            before = {role: len(members) for role, members in self._by_role.items()}
+            self.load(users)
+            after = {role: len(members) for role, members in self._by_role.items()}
+            if before and before != after:
+                print("👥 Staff directory: " + ", ".join(f"{role.value}={count}" for role, count in after.items()))
+            return len(users)
+
+# Глобальный экземпляр
+staff_directory = StaffDirectory()
@@ -0,0 +1,184 @@
+# app/services/transcript_store.py
+
+"""Сжатое хранилище переписки завершенных консультаций.
+
+Переписка консультации - один JSONL-файл, сжатый zstd (если установлен
+zstandard) или gzip, по ключу Consultation.archive_id. Первая строка -
+сводка консультации, дальше по строке на сообщение. Страница читается
+потоково: распаковываются только строки до конца нужной страницы.
+
+Где лежат файлы, решает backend: по умолчанию локальный диск, для
+объектного хранилища достаточно реализовать TranscriptBackend.
+"""
+
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, BinaryIO, Dict, List, NamedTuple, Optional, Tuple
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+class TranscriptMessage(NamedTuple):
+    """Сообщение из сохраненной переписки"""
+    sender_id: int
+    message_text: Optional[str]
+    content_type: str
+    file_id: Optional[str]
+    photo_file_id: Optional[str]
+    media_group_id: Optional[str]
+    created_at: Optional[datetime]
+
+class TranscriptBackend(ABC):
+    """Интерфейс хранилища сжатых файлов переписки"""
+
+    @abstractmethod
+    async def put(self, name: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    def open(self, name: str) -> BinaryIO:
+        """Открыть файл на чтение (вызывается в отдельном потоке)"""
+
+    @abstractmethod
+    async def exists(self, name: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete(self, name: str) -> None:
+        ...
+
+class LocalTranscriptBackend(TranscriptBackend):
+    """Файлы переписки на локальном диске"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    async def put(self, name: str, data: bytes) -> None:
+        def write():
+            os.makedirs(self.root, exist_ok=True)
+            tmp_path = self._path(name) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            # Атомарная замена - читатель не увидит недописанный файл
+            os.replace(tmp_path, self._path(name))
+
+        await asyncio.to_thread(write)
+
+    def open(self, name: str) -> BinaryIO:
+        return open(self._path(name), "rb")
+
+    async def exists(self, name: str) -> bool:
+        return os.path.exists(self._path(name))
+
+    async def delete(self, name: str) -> None:
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+# Расширение -> (сжатие, потоковое чтение)
+_CODECS = {
+    "gz": (gzip.compress, lambda raw: gzip.GzipFile(fileobj=raw)),
+}
+if zstandard:
+    _CODECS["zst"] = (
+        lambda data: zstandard.ZstdCompressor(level=10).compress(data),
+        lambda raw: zstandard.ZstdDecompressor().stream_reader(raw)
+    )
+
+def _serialize_message(msg) -> Dict[str, Any]:
+    return {
+        "sender_id": msg.sender_id,
+        "message_text": msg.message_text,
+        "content_type": msg.content_type or ("photo" if msg.photo_file_id else "text"),
+        "file_id": msg.file_id or msg.photo_file_id,
+        "media_group_id": msg.media_group_id,
+        "created_at": msg.created_at.isoformat() if msg.created_at else None,
+    }
+
+def _deserialize_message(record: Dict[str, Any]) -> TranscriptMessage:
+    content_type = record.get("content_type") or "text"
+    created_at = record.get("created_at")
+    return TranscriptMessage(
+        sender_id=record["sender_id"],
+        message_text=record.get("message_text"),
+        content_type=content_type,
+        file_id=record.get("file_id"),
+        photo_file_id=record.get("file_id") if content_type == "photo" else None,
+        media_group_id=record.get("media_group_id"),
+        created_at=datetime.fromisoformat(created_at) if created_at else None
+    )
+
+class TranscriptStore:
+    """Чтение и запись сжатой переписки по archive_id"""
+
+    def __init__(self, backend: TranscriptBackend, codec: str = None):
+        self.backend = backend
+        self.codec = codec or ("zst" if zstandard else "gz")
+
+    @staticmethod
+    def _base_name(archive_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", archive_id) + ".jsonl"
+
+    async def _find(self, archive_id: str) -> Optional[Tuple[str, str]]:
+        """Имя файла и сжатие для archive_id (файл мог быть записан другим сжатием)"""
+        base_name = self._base_name(archive_id)
+        for codec in (self.codec, *[c for c in _CODECS if c != self.codec]):
+            name = f"{base_name}.{codec}"
+            if await self.backend.exists(name):
+                return name, codec
+        return None
+
+    async def exists(self, archive_id: str) -> bool:
+        return await self._find(archive_id) is not None
+
+    async def save(self, archive_id: str, meta: Dict[str, Any], messages) -> None:
+        """Записать сводку и сообщения консультации"""
+        lines = [json.dumps(meta, ensure_ascii=False)]
+        lines += [json.dumps(_serialize_message(msg), ensure_ascii=False) for msg in messages]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        compress, _ = _CODECS[self.codec]
+        compressed = await asyncio.to_thread(compress, data)
+        await self.backend.put(f"{self._base_name(archive_id)}.{self.codec}", compressed)
+
+        print(f"💾 Transcript {archive_id}: {len(messages)} messages, {len(data)} -> {len(compressed)} bytes")
+
+    async def read_page(self, archive_id: str, offset: int,
+                        limit: int) -> Optional[Tuple[Dict[str, Any], List[TranscriptMessage]]]:
+        """Сводка и сообщения [offset, offset + limit) или None, если переписки нет"""
+        found = await self._find(archive_id)
+        if not found:
+            return None
+        name, codec = found
+        _, open_stream = _CODECS[codec]
+
+        def read():
+            with self.backend.open(name) as raw:
+                lines = io.TextIOWrapper(open_stream(raw), encoding="utf-8")
+                meta = json.loads(next(lines))
+                # Строки до offset распаковываются, но не разбираются
+                records = [json.loads(line) for line in islice(lines, offset, offset + limit)]
+            return meta, [_deserialize_message(record) for record in records]
+
+        return await asyncio.to_thread(read)
+
+    async def delete(self, archive_id: str) -> None:
+        found = await self._find(archive_id)
+        if found:
+            await self.backend.delete(found[0])
+
+# Глобальный экземпляр
+transcript_store = TranscriptStore(LocalTranscriptBackend(os.getenv("TRANSCRIPTS_DIR", "data/transcripts")))
@@ -1,5 +1,9 @@
 # -*- coding: utf-8 -*-
-from typing import Dict
+import json
+import os
+import re
+import string
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 TRANSLATIONS: Dict[str, Dict[str, str]] = {
     # Общие
@@ -54,6 +58,36 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "ru": "<b>{name}</b>\n\n{desc}\nЦена: {price} {currency}",
         "uz": "<b>{name}</b>\n\n{desc}\nNarxi: {price} {currency}"
     },
+    "catalog_search": {
+        "ru": "🔍 Поиск",
+        "uz": "🔍 Qidiruv"
+    },
+    "search_prompt": {
+        "ru": "Введите название букета или цветка:",
+        "uz": "Guldasta yoki gul nomini kiriting:"
+    },
+    "search_results": {
+        # {query}
+        "ru": "🔍 Результаты по запросу «{query}»:",
+        "uz": "🔍 «{query}» boʻyicha natijalar:"
+    },
+    "search_no_results": {
+        # {query}
+        "ru": "По запросу «{query}» ничего не найдено.",
+        "uz": "«{query}» boʻyicha hech narsa topilmadi."
+    },
+    "catalog_popular": {
+        "ru": "🔥 Популярное",
+        "uz": "🔥 Ommabop"
+    },
+    "popular_title": {
+        "ru": "🔥 Популярные букеты:",
+        "uz": "🔥 Ommabop guldastalar:"
+    },
+    "often_bought_with": {
+        "ru": "🤝 Часто берут вместе:",
+        "uz": "🤝 Koʻpincha birga olishadi:"
+    },
 
     # Корзина
     "cart_empty": {
@@ -403,6 +437,46 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
         "ru": "📊 Аналитика заказов:",
         "uz": "📊 Buyurtmalar analitikasi:"
     },
+    "customer_segments": {
+        "ru": "🎯 Сегменты клиентов (RFM):",
+        "uz": "🎯 Mijozlar segmentlari (RFM):"
+    },
+    "segments_not_ready": {
+        "ru": "Сегменты еще не рассчитаны",
+        "uz": "Segmentlar hali hisoblanmagan"
+    },
+    "segments_updated": {
+        "ru": "Обновлено",
+        "uz": "Yangilangan"
+    },
+    "segment_champions": {
+        "ru": "🏆 Лучшие",
+        "uz": "🏆 Eng yaxshilar"
+    },
+    "segment_at_risk": {
+        "ru": "⚠️ Ценные, но пропали",
+        "uz": "⚠️ Qimmatli, lekin yoʻqolgan"
+    },
+    "segment_loyal": {
+        "ru": "💚 Постоянные",
+        "uz": "💚 Doimiy"
+    },
+    "segment_big_spenders": {
+        "ru": "💎 Крупные покупки",
+        "uz": "💎 Yirik xaridlar"
+    },
+    "segment_new": {
+        "ru": "🌱 Новые",
+        "uz": "🌱 Yangi"
+    },
+    "segment_lapsed": {
+        "ru": "💤 Давно не заказывали",
+        "uz": "💤 Anchadan beri buyurtma bermagan"
+    },
+    "segment_regular": {
+        "ru": "👤 Обычные",
+        "uz": "👤 Oddiy"
+    },
     "total_orders": {
         "ru": "Всего заказов",
         "uz": "Jami buyurtmalar"
@@ -601,18 +675,154 @@ TRANSLATIONS: Dict[str, Dict[str, str]] = {
 
 }
 
+# ========== КОМПИЛЯЦИЯ ==========
+#
+# При импорте TRANSLATIONS разворачивается в плоские таблицы {язык: {ключ: шаблон}}.
+# Шаблон без подстановок хранится строкой, с подстановками - заранее
+# разобранным на части, поэтому t() это один поиск в словаре и склейка.
+# Недостающие в языке ключи берутся из русского при компиляции.
+
+DEFAULT_LANG = "ru"
+BASE_LANGS = ("ru", "uz")
+
+# Дополнительные языки: <LOCALES_DIR>/<код>.json с плоским {ключ: текст}
+LOCALES_DIR = os.getenv("LOCALES_DIR", os.path.join(os.path.dirname(__file__), "locales"))
+
+_formatter = string.Formatter()
+
+class _Template:
+    """Шаблон с заранее разобранными подстановками"""
+    __slots__ = ("raw", "parts", "fields")
+
+    def __init__(self, raw: str):
+        self.raw = raw
+        self.parts: List[Tuple[str, Optional[str], str]] = []
+        for literal, field, spec, conversion in _formatter.parse(raw):
+            if field is not None and (conversion or not field.isidentifier()):
+                raise ValueError(f"Неподдерживаемая подстановка {{{field}}} в шаблоне: {raw!r}")
+            self.parts.append((literal, field, spec or ""))
+        self.fields = frozenset(field for _, field, _ in self.parts if field is not None)
+
+    def render(self, kwargs: Dict[str, Any]) -> str:
+        try:
+            return "".join(
+                literal + (format(kwargs[field], spec) if field is not None else "")
+                for literal, field, spec in self.parts
+            )
+        except (KeyError, ValueError, TypeError):
+            # если не хватает плейсхолдеров — вернём как есть
+            return self.raw
+
+def _compile(text: str) -> Union[str, _Template]:
+    template = _Template(text)
+    if not template.fields:
+        # Без подстановок - сразу готовая строка ({{ }} уже раскрыты)
+        return "".join(literal for literal, _, _ in template.parts)
+    return template
+
+def _load_locale_files() -> Dict[str, Dict[str, str]]:
+    """Языки из файлов LOCALES_DIR"""
+    languages: Dict[str, Dict[str, str]] = {}
+    if not os.path.isdir(LOCALES_DIR):
+        return languages
+
+    for filename in sorted(os.listdir(LOCALES_DIR)):
+        lang, ext = os.path.splitext(filename)
+        if ext != ".json":
+            continue
+        with open(os.path.join(LOCALES_DIR, filename), encoding="utf-8") as f:
+            languages[lang] = json.load(f)
+    return languages
+
+def _build_sources() -> Dict[str, Dict[str, str]]:
+    """{язык: {ключ: текст}} из TRANSLATIONS и файлов языков"""
+    sources: Dict[str, Dict[str, str]] = {}
+    for key, entry in TRANSLATIONS.items():
+        for lang, text in entry.items():
+            sources.setdefault(lang, {})[key] = text
+    for lang, texts in _load_locale_files().items():
+        sources.setdefault(lang, {}).update(texts)
+    return sources
+
+def _compile_tables(sources: Dict[str, Dict[str, str]]) -> Dict[str, Dict[str, Union[str, _Template]]]:
+    default = {key: _compile(text) for key, text in sources.get(DEFAULT_LANG, {}).items()}
+    tables = {DEFAULT_LANG: default}
+    for lang, texts in sources.items():
+        if lang != DEFAULT_LANG:
+            tables[lang] = {**default, **{key: _compile(text) for key, text in texts.items()}}
+    return tables
+
+_SOURCES = _build_sources()
+_TABLES = _compile_tables(_SOURCES)
+_missing_reported = set()
+
+def available_languages() -> List[str]:
+    return list(_TABLES)
+
 def t(lang: str, key: str, **kwargs) -> str:
     """
     Безопасный доступ к переводу.
-    - lang: 'ru' | 'uz' (иначе fallback на 'ru')
-    - key: ключ из TRANSLATIONS
-    - kwargs: подстановки в шаблон (format)
+    - lang: код языка (неизвестный - fallback на 'ru')
+    - key: ключ перевода
+    - kwargs: подстановки в шаблон
     """
-    lang = lang if lang in ("ru", "uz") else "ru"
-    entry = TRANSLATIONS.get(key, {})
-    template = entry.get(lang) or entry.get("ru") or key
-    try:
-        return template.format(**kwargs)
-    except Exception:
-        # если не хватает плейсхолдеров — вернём как есть
+    template = (_TABLES.get(lang) or _TABLES[DEFAULT_LANG]).get(key)
+    if template is None:
+        if key not in _missing_reported:
+            _missing_reported.add(key)
+            print(f"⚠️ Нет перевода для ключа {key!r}")
+        return key
+    if template.__class__ is str:
         return template
+    return template.render(kwargs)
+
+# ========== ПРОВЕРКА ПРИ СТАРТЕ ==========
+
+_USAGE_RE = re.compile(r"""\bt\(\s*[^,()]+,\s*["']([A-Za-z0-9_]+)["']""")
+
+def _fields(text: str) -> frozenset:
+    return frozenset(field for _, field, _, _ in _formatter.parse(text) if field is not None)
+
+def _used_keys(source_dir: str) -> Dict[str, str]:
+    """Ключи, которые код передает в t() строковым литералом: {ключ: файл}"""
+    used = {}
+    for root, _, files in os.walk(source_dir):
+        for filename in files:
+            if filename.endswith(".py"):
+                path = os.path.join(root, filename)
+                with open(path, encoding="utf-8") as f:
+                    for key in _USAGE_RE.findall(f.read()):
+                        used.setdefault(key, path)
+    return used
+
+def validate_translations(source_dir: str = None) -> None:
+    """Проверить переводы, при ошибках - ValueError со списком проблем.
+
+    - в базовых языках (ru, uz) есть все ключи;
+    - плейсхолдеры перевода совпадают с русским (для всех языков);
+    - все ключи, используемые в коде через t(lang, "ключ"), существуют.
+    """
+    errors = []
+    default = _SOURCES.get(DEFAULT_LANG, {})
+
+    for lang, texts in _SOURCES.items():
+        if lang in BASE_LANGS:
+            for key in sorted(set(default) - set(texts)):
+                errors.append(f"[{lang}] нет ключа {key}")
+        for key, text in texts.items():
+            if key not in default:
+                errors.append(f"[{lang}] ключ {key} отсутствует в {DEFAULT_LANG}")
+            elif _fields(text) != _fields(default[key]):
+                errors.append(
+                    f"[{lang}] {key}: плейсхолдеры {sorted(_fields(text))} "
+                    f"не совпадают с {DEFAULT_LANG} {sorted(_fields(default[key]))}"
+                )
+
+    for key, path in sorted(_used_keys(source_dir or os.path.dirname(__file__)).items()):
+        if key not in default:
+            errors.append(f"{path}: неизвестный ключ {key}")
+
+    if errors:
+        raise ValueError("Ошибки переводов:\n" + "\n".join(errors))
+
+    print(f"✅ Переводы проверены: {len(default)} ключей, языки: {', '.join(_TABLES)}")
@@ -0,0 +1,420 @@
+# app/utils/bulk_import.py
+
+"""Массовый импорт склада и каталога из CSV/JSONL.
+
+Файл читается потоково, строки приводятся к типам и через COPY попадают во
+временную staging-таблицу. Дальше все делает Postgres: проверка внешних
+ключей, дубликаты и upsert выполняются set-based запросами, а не построчно.
+
+Использование:
+    python -m app.utils.bulk_import <flowers|suppliers|batches|products|compositions> <файл.csv|файл.jsonl> [--dry-run]
+"""
+
+import asyncio
+import csv
+import json
+import sys
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.exceptions import ValidationError
+
+# Размер пачки для COPY - ограничивает память при больших файлах
+COPY_CHUNK_SIZE = 5000
+
+@dataclass(frozen=True)
+class Reference:
+    """Ссылка на другую таблицу.
+
+    column - колонка во входном файле, target - колонка целевой таблицы.
+    Если column != target, значение ищется по ref_key (натуральный ключ),
+    иначе это уже id и проверяется только его существование.
+    """
+    column: str
+    target: str
+    ref_table: str
+    ref_key: str
+
+@dataclass(frozen=True)
+class ImportSpec:
+    """Описание импортируемой сущности"""
+    table: str
+    columns: Dict[str, str]                      # колонка -> тип (text/int/numeric/date/bool)
+    required: Tuple[str, ...]
+    conflict: Tuple[str, ...] = ()               # натуральный ключ для ON CONFLICT, пусто - только вставка
+    references: Tuple[Reference, ...] = ()
+    defaults: Dict[str, str] = field(default_factory=dict)  # SQL значения по умолчанию
+    has_created_at: bool = True
+
+IMPORT_SPECS: Dict[str, ImportSpec] = {
+    "flowers": ImportSpec(
+        table="flowers",
+        columns={
+            "name_ru": "text", "name_uz": "text", "unit_type": "text",
+            "min_stock": "int", "max_stock": "int", "shelf_life_days": "int", "is_active": "bool",
+        },
+        required=("name_ru", "name_uz", "unit_type"),
+        conflict=("name_ru",),
+        defaults={"min_stock": "0", "max_stock": "100", "shelf_life_days": "7", "is_active": "true"},
+    ),
+    "suppliers": ImportSpec(
+        table="suppliers",
+        columns={
+            "name": "text", "contact_person": "text", "phone": "text", "email": "text",
+            "rating": "numeric", "is_active": "bool", "notes": "text",
+        },
+        required=("name",),
+        conflict=("name",),
+        defaults={"rating": "0", "is_active": "true"},
+    ),
+    "batches": ImportSpec(
+        table="inventory_batches",
+        columns={
+            "flower": "text", "supplier": "text", "quantity": "int",
+            "purchase_price": "numeric", "batch_date": "date", "expire_date": "date",
+        },
+        required=("flower", "quantity"),
+        references=(
+            Reference("flower", "flower_id", "flowers", "name_ru"),
+            Reference("supplier", "supplier_id", "suppliers", "name"),
+        ),
+        defaults={"batch_date": "CURRENT_DATE"},
+    ),
+    "products": ImportSpec(
+        table="products",
+        columns={
+            "category_id": "int", "name_ru": "text", "name_uz": "text", "desc_ru": "text",
+            "desc_uz": "text", "price": "numeric", "photo_url": "text",
+            "stock_qty": "int", "is_active": "bool",
+        },
+        required=("category_id", "name_ru", "name_uz", "price"),
+        conflict=("name_ru",),
+        references=(
+            Reference("category_id", "category_id", "categories", "id"),
+        ),
+        defaults={"stock_qty": "0", "is_active": "true"},
+    ),
+    "compositions": ImportSpec(
+        table="product_compositions",
+        columns={"product": "text", "flower": "text", "quantity": "int", "is_required": "bool"},
+        required=("product", "flower", "quantity"),
+        conflict=("product_id", "flower_id"),
+        references=(
+            Reference("product", "product_id", "products", "name_ru"),
+            Reference("flower", "flower_id", "flowers", "name_ru"),
+        ),
+        defaults={"is_required": "true"},
+        has_created_at=False,
+    ),
+}
+
+_PG_TYPES = {"text": "text", "int": "integer", "numeric": "numeric(10, 2)", "date": "date", "bool": "boolean"}
+
+@dataclass
+class RowError:
+    """Ошибка в строке входного файла"""
+    line_no: int
+    message: str
+
+@dataclass
+class ImportReport:
+    """Итог импорта"""
+    entity: str
+    total_rows: int = 0
+    imported: int = 0
+    errors: List[RowError] = field(default_factory=list)
+
+    @property
+    def failed(self) -> int:
+        return len({error.line_no for error in self.errors})
+
+def _convert(value: Any, type_name: str) -> Any:
+    """Привести значение из файла к типу колонки"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value == "":
+            return None
+
+    if type_name == "text":
+        return str(value)
+    if type_name == "int":
+        if isinstance(value, bool):
+            raise ValueError("ожидалось целое число")
+        if isinstance(value, str):
+            value = value.replace(" ", "")
+        return int(value)
+    if type_name == "numeric":
+        try:
+            return Decimal(str(value).replace(" ", "").replace(",", "."))
+        except InvalidOperation:
+            raise ValueError("ожидалось число")
+    if type_name == "date":
+        if isinstance(value, date):
+            return value
+        value = str(value)
+        if "." in value:  # 31.12.2025
+            day, month, year = value.split(".")
+            return date(int(year), int(month), int(day))
+        return date.fromisoformat(value)
+    if type_name == "bool":
+        if isinstance(value, bool):
+            return value
+        lowered = str(value).lower()
+        if lowered in ("1", "true", "yes", "да", "ha", "+"):
+            return True
+        if lowered in ("0", "false", "no", "нет", "yo'q", "-"):
+            return False
+        raise ValueError("ожидалось да/нет")
+    raise ValueError(f"неизвестный тип {type_name}")
+
+def _iter_raw_rows(path: str) -> Tuple[List[str], Iterator[Tuple[int, Dict[str, Any]]]]:
+    """Прочитать заголовок CSV или JSONL и вернуть (заголовок, итератор (номер строки, данные)).
+
+    Файл для строк открывает сам итератор: если до чтения строк дело не дойдет
+    (например, не хватает колонок), открытых файлов не останется.
+    """
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        # Колонки JSONL определяем по первой непустой строке
+        header: List[str] = []
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        header = list(json.loads(line).keys())
+                    except (json.JSONDecodeError, AttributeError):
+                        pass
+                    break
+
+        def jsonl_rows():
+            with open(path, "r", encoding="utf-8-sig") as f:
+                for line_no, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, ValueError(f"некорректный JSON: {e.msg}")
+
+        return header, jsonl_rows()
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        header = [name.strip() for name in (next(csv.reader(f, dialect=dialect), None) or [])]
+
+    def csv_rows():
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f, dialect=dialect)
+            reader.fieldnames = [name.strip() for name in (reader.fieldnames or [])]
+            for row in reader:
+                yield reader.line_num, row
+
+    return header, csv_rows()
+
+def parse_rows(spec: ImportSpec, header: List[str], rows, report: ImportReport) -> Iterator[Tuple]:
+    """Привести строки к типам колонок; ошибочные строки попадают в отчет"""
+    columns = [name for name in spec.columns if name in header]
+    missing = [name for name in spec.required if name not in header]
+    if missing:
+        raise ValidationError(f"В файле нет обязательных колонок: {', '.join(missing)}", "import_missing_columns")
+
+    for line_no, raw in rows:
+        report.total_rows += 1
+
+        if isinstance(raw, Exception):
+            report.errors.append(RowError(line_no, str(raw)))
+            continue
+        if not isinstance(raw, dict):
+            report.errors.append(RowError(line_no, "ожидался объект"))
+            continue
+
+        record = [line_no]
+        row_ok = True
+        for name in columns:
+            try:
+                value = _convert(raw.get(name), spec.columns[name])
+            except (ValueError, TypeError) as e:
+                report.errors.append(RowError(line_no, f"{name}: {e}"))
+                row_ok = False
+                continue
+
+            if value is None and name in spec.required:
+                report.errors.append(RowError(line_no, f"{name}: обязательное поле"))
+                row_ok = False
+            record.append(value)
+
+        if row_ok:
+            yield tuple(record)
+
+class BulkImporter:
+    """Массовый загрузчик через COPY в staging-таблицу"""
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def _copy_records(self, stage: str, columns: List[str], records: Iterator[Tuple]):
+        """Потоково залить записи в staging-таблицу через COPY"""
+        connection = await self.session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver = raw_connection.driver_connection  # asyncpg.Connection
+
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= COPY_CHUNK_SIZE:
+                await driver.copy_records_to_table(stage, records=chunk, columns=columns)
+                chunk = []
+        if chunk:
+            await driver.copy_records_to_table(stage, records=chunk, columns=columns)
+
+    async def _reject(self, stage: str, where_sql: str, message_sql: str, report: ImportReport):
+        """Удалить из staging строки по условию и записать их в отчет"""
+        result = await self.session.execute(
+            text(f"DELETE FROM {stage} s WHERE {where_sql} RETURNING s.line_no, {message_sql}")
+        )
+        for line_no, message in result.all():
+            report.errors.append(RowError(line_no, message))
+
+    async def import_file(self, entity: str, path: str) -> ImportReport:
+        """Импортировать файл. Коммит/откат - на вызывающем."""
+        spec = IMPORT_SPECS.get(entity)
+        if not spec:
+            raise ValidationError(f"Неизвестная сущность: {entity}", "import_unknown_entity")
+
+        report = ImportReport(entity=entity)
+        header, rows = _iter_raw_rows(path)
+        columns = [name for name in spec.columns if name in header]
+        stage = f"stage_{entity}"
+
+        # 1. Staging-таблица живет до конца транзакции
+        resolved = [ref.target for ref in spec.references if ref.column != ref.target and ref.column in columns]
+        column_defs = ", ".join(
+            [f"{name} {_PG_TYPES[spec.columns[name]]}" for name in columns] +
+            [f"{name} integer" for name in resolved]
+        )
+        await self.session.execute(
+            text(f"CREATE TEMP TABLE {stage} (line_no integer, {column_defs}) ON COMMIT DROP")
+        )
+
+        # 2. COPY
+        await self._copy_records(stage, ["line_no"] + columns, parse_rows(spec, header, rows, report))
+
+        # 3. Проверка внешних ключей одним запросом на ссылку
+        for ref in spec.references:
+            if ref.column not in columns:
+                continue
+
+            if ref.column == ref.target:
+                await self._reject(
+                    stage,
+                    f"s.{ref.column} IS NOT NULL AND NOT EXISTS "
+                    f"(SELECT 1 FROM {ref.ref_table} r WHERE r.{ref.ref_key} = s.{ref.column})",
+                    f"'{ref.column}: не найден ' || s.{ref.column}",
+                    report
+                )
+            else:
+                await self.session.execute(text(
+                    f"UPDATE {stage} s SET {ref.target} = r.id "
+                    f"FROM {ref.ref_table} r WHERE r.{ref.ref_key} = s.{ref.column}"
+                ))
+                await self._reject(
+                    stage,
+                    f"s.{ref.column} IS NOT NULL AND s.{ref.target} IS NULL",
+                    f"'{ref.column}: не найден ' || s.{ref.column}",
+                    report
+                )
+
+        # 4. Дубликаты ключа внутри файла - побеждает последняя строка
+        if spec.conflict:
+            key_match = " AND ".join(f"s.{name} = d.{name}" for name in spec.conflict)
+            await self._reject(
+                stage,
+                f"EXISTS (SELECT 1 FROM {stage} d WHERE {key_match} AND d.line_no > s.line_no)",
+                "'дубликат ключа, используется более поздняя строка'",
+                report
+            )
+
+        # 5. Upsert
+        target_columns = [name for name in columns if name not in {ref.column for ref in spec.references if ref.column != ref.target}]
+        target_columns += resolved
+
+        insert_columns = list(target_columns)
+        select_values = [
+            f"COALESCE(s.{name}, {spec.defaults[name]})" if name in spec.defaults else f"s.{name}"
+            for name in target_columns
+        ]
+        for name, default in spec.defaults.items():
+            if name not in insert_columns:
+                insert_columns.append(name)
+                select_values.append(default)
+        if spec.has_created_at:
+            insert_columns.append("created_at")
+            select_values.append("NOW()")
+
+        sql = (
+            f"INSERT INTO {spec.table} ({', '.join(insert_columns)}) "
+            f"SELECT {', '.join(select_values)} FROM {stage} s"
+        )
+        if spec.conflict:
+            update_columns = [name for name in target_columns if name not in spec.conflict]
+            if update_columns:
+                assignments = ", ".join(f"{name} = EXCLUDED.{name}" for name in update_columns)
+                sql += f" ON CONFLICT ({', '.join(spec.conflict)}) DO UPDATE SET {assignments}"
+            else:
+                sql += f" ON CONFLICT ({', '.join(spec.conflict)}) DO NOTHING"
+
+        result = await self.session.execute(text(sql))
+        report.imported = result.rowcount or 0
+
+        report.errors.sort(key=lambda error: error.line_no)
+        return report
+
+async def run_import(entity: str, path: str, dry_run: bool = False) -> Optional[ImportReport]:
+    """Импорт из командной строки"""
+    from app.database.database import get_session
+
+    async for session in get_session():
+        try:
+            report = await BulkImporter(session).import_file(entity, path)
+        except ValidationError as e:
+            print(f"❌ {e.message}")
+            await session.rollback()
+            return None
+        except Exception as e:
+            print(f"❌ Ошибка импорта: {e}")
+            await session.rollback()
+            raise
+
+        if dry_run:
+            await session.rollback()
+        else:
+            await session.commit()
+
+        print(f"📥 {entity}: строк {report.total_rows}, загружено {report.imported}, с ошибками {report.failed}")
+        for error in report.errors[:50]:
+            print(f"   ⚠️ строка {error.line_no}: {error.message}")
+        if len(report.errors) > 50:
+            print(f"   ... и еще {len(report.errors) - 50} ошибок")
+        if dry_run:
+            print("🔍 Пробный запуск - изменения не сохранены")
+        return report
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if len(args) < 2:
+        print("Использование: python -m app.utils.bulk_import <сущность> <файл.csv|файл.jsonl> [--dry-run]")
+        print(f"Сущности: {', '.join(IMPORT_SPECS)}")
+        sys.exit(1)
+
+    asyncio.run(run_import(args[0], args[1], dry_run="--dry-run" in sys.argv))
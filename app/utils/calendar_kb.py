@@ -0,0 +1,89 @@
+# app/utils/calendar_kb.py
+
+"""Календарь выбора даты доставки.
+
+Клавиатура месяца зависит только от (год, месяц, язык, первая доступная
+дата, занятые даты месяца), поэтому собирается один раз и берется из
+ограниченного lru_cache. Листание месяцев в checkout не строит сетку заново.
+В кэше лежат неизменяемые строки (текст, callback_data); разметка aiogram
+изменяемая, поэтому на каждый вызов создается новая.
+"""
+
+import calendar
+from datetime import date
+from functools import lru_cache
+from typing import AbstractSet
+
+from aiogram import types
+
+MONTH_NAMES = {
+    "ru": ("Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+           "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь"),
+    "uz": ("Yanvar", "Fevral", "Mart", "Aprel", "May", "Iyun",
+           "Iyul", "Avgust", "Sentabr", "Oktabr", "Noyabr", "Dekabr"),
+}
+
+WEEKDAY_NAMES = {
+    "ru": ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"),
+    "uz": ("Du", "Se", "Ch", "Pa", "Ju", "Sh", "Ya"),
+}
+
+BLANK = (" ", "ignore")
+
+def _shift_month(year: int, month: int, delta: int):
+    index = year * 12 + month - 1 + delta
+    return index // 12, index % 12 + 1
+
+def calendar_keyboard(year: int, month: int, lang: str, earliest: date,
+                      unavailable: AbstractSet[date] = frozenset()) -> types.InlineKeyboardMarkup:
+    """Календарь на месяц.
+
+    - earliest: первая дата, которую можно выбрать (раньше - пустые клетки)
+    - unavailable: полностью занятые даты; в ключ кэша попадают только даты этого месяца
+    """
+    if lang not in MONTH_NAMES:
+        lang = "ru"
+    booked = frozenset(d for d in unavailable if d.year == year and d.month == month)
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=text, callback_data=data) for text, data in row]
+        for row in _build_calendar(year, month, lang, earliest, booked)
+    ])
+
+@lru_cache(maxsize=256)
+def _build_calendar(year: int, month: int, lang: str, earliest: date,
+                    booked: frozenset) -> tuple:
+    kb_rows = []
+
+    # Заголовок месяца
+    kb_rows.append(((f"{MONTH_NAMES[lang][month - 1]} {year}", "ignore"),))
+
+    # Дни недели
+    kb_rows.append(tuple((name, "ignore") for name in WEEKDAY_NAMES[lang]))
+
+    # Дни месяца: прошедшие и занятые - пустые клетки
+    for week in calendar.monthcalendar(year, month):
+        week_row = []
+        for day in week:
+            if day == 0:
+                week_row.append(BLANK)
+                continue
+
+            date_obj = date(year, month, day)
+            if date_obj < earliest or date_obj in booked:
+                week_row.append(BLANK)
+            else:
+                week_row.append((str(day), f"date_{year}_{month}_{day}"))
+        kb_rows.append(tuple(week_row))
+
+    # Навигация по месяцам - назад не дальше месяца первой доступной даты
+    prev_year, prev_month = _shift_month(year, month, -1)
+    next_year, next_month = _shift_month(year, month, 1)
+
+    if (prev_year, prev_month) < (earliest.year, earliest.month):
+        prev_button = BLANK
+    else:
+        prev_button = ("◀️", f"cal_{prev_year}_{prev_month}")
+
+    kb_rows.append((prev_button, ("▶️", f"cal_{next_year}_{next_month}")))
+
+    return tuple(kb_rows)
@@ -0,0 +1,80 @@
+# app/utils/message_packing.py
+
+"""Упаковка пачки сообщений в минимум вызовов Telegram API.
+
+Соседние тексты склеиваются в сообщения до 4096 символов, соседние фото
+собираются в альбомы до 10 штук. Порядок исходных сообщений сохраняется.
+"""
+
+from typing import Any, Dict, List, Optional
+
+TELEGRAM_TEXT_LIMIT = 4096
+TELEGRAM_CAPTION_LIMIT = 1024
+MEDIA_GROUP_LIMIT = 10
+
+def split_text(text: str, limit: int = TELEGRAM_TEXT_LIMIT) -> List[str]:
+    """Разбить текст на части не длиннее limit, по возможности по переносам строк"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip("\n ")
+    if text:
+        parts.append(text)
+    return parts
+
+def truncate_caption(caption: Optional[str], limit: int = TELEGRAM_CAPTION_LIMIT) -> Optional[str]:
+    """Обрезать подпись до лимита Telegram"""
+    if not caption:
+        return None
+    if len(caption) <= limit:
+        return caption
+    return caption[:limit - 1] + "…"
+
+def pack_messages(items: List[Dict[str, Any]], limit: int = TELEGRAM_TEXT_LIMIT,
+                  separator: str = "\n\n") -> List[Dict[str, Any]]:
+    """Упаковать сообщения в пакеты для отправки.
+
+    items - словари с ключами text и/или photo (file_id). Фото с текстом
+    уходит в альбом с подписью. Результат - список пакетов:
+    {"type": "text", "text": ...} или {"type": "photos", "photos": [(file_id, caption), ...]}.
+    """
+    packets: List[Dict[str, Any]] = []
+    text_buffer = ""
+
+    def flush_text():
+        nonlocal text_buffer
+        if text_buffer:
+            packets.extend({"type": "text", "text": part} for part in split_text(text_buffer, limit))
+            text_buffer = ""
+
+    for item in items:
+        photo = item.get("photo")
+        text = item.get("text") or ""
+
+        if photo:
+            flush_text()
+            last = packets[-1] if packets else None
+            if not last or last["type"] != "photos" or len(last["photos"]) >= MEDIA_GROUP_LIMIT:
+                last = {"type": "photos", "photos": []}
+                packets.append(last)
+            last["photos"].append((photo, truncate_caption(text)))
+            continue
+
+        if not text:
+            continue
+
+        if not text_buffer:
+            text_buffer = text
+        elif len(text_buffer) + len(separator) + len(text) <= limit:
+            text_buffer += separator + text
+        else:
+            flush_text()
+            text_buffer = text
+
+    flush_text()
+    return packets
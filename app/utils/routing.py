@@ -0,0 +1,70 @@
+# app/utils/routing.py
+
+"""Маршрут курьера: ближайший сосед + улучшение 2-opt.
+
+Точки - (lat, lon). Маршрут открытый: старт в origin, возврат не считается.
+Рейс - несколько заказов, поэтому O(n^2) за проход 2-opt не важно, а
+результат обычно близок к оптимальному без полного перебора.
+"""
+
+import math
+from typing import List, Optional, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(a: Point, b: Point) -> float:
+    """Расстояние по дуге большого круга, км"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def route_length(origin: Point, points: Sequence[Point], order: Sequence[int]) -> float:
+    length, current = 0.0, origin
+    for i in order:
+        length += haversine_km(current, points[i])
+        current = points[i]
+    return length
+
+def nearest_neighbor(origin: Point, points: Sequence[Point]) -> List[int]:
+    """Жадный маршрут: каждый раз в ближайшую непосещенную точку"""
+    left = set(range(len(points)))
+    order, current = [], origin
+    while left:
+        nearest = min(left, key=lambda i: (haversine_km(current, points[i]), i))
+        order.append(nearest)
+        left.remove(nearest)
+        current = points[nearest]
+    return order
+
+def two_opt(origin: Point, points: Sequence[Point], order: List[int], max_rounds: int = 50) -> List[int]:
+    """Разворачивать отрезки маршрута, пока это его сокращает"""
+    nodes = [origin] + [points[i] for i in order]
+    order = list(order)
+
+    for _ in range(max_rounds):
+        improved = False
+        for i in range(len(nodes) - 2):
+            for j in range(i + 2, len(nodes)):
+                # Ребра (i, i+1) и (j, j+1) -> (i, j) и (i+1, j+1); у последней точки ребра дальше нет
+                before = haversine_km(nodes[i], nodes[i + 1])
+                after = haversine_km(nodes[i], nodes[j])
+                if j + 1 < len(nodes):
+                    before += haversine_km(nodes[j], nodes[j + 1])
+                    after += haversine_km(nodes[i + 1], nodes[j + 1])
+                if after + 1e-9 < before:
+                    nodes[i + 1:j + 1] = reversed(nodes[i + 1:j + 1])
+                    order[i:j] = reversed(order[i:j])
+                    improved = True
+        if not improved:
+            break
+    return order
+
+def plan_route(origin: Optional[Point], points: Sequence[Point]) -> List[int]:
+    """Порядок объезда точек (индексы). Без origin стартуем из центра точек"""
+    if not points:
+        return []
+    if origin is None:
+        origin = (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+    return two_opt(origin, points, nearest_neighbor(origin, points))
@@ -1,8 +1,7 @@
 import asyncio
 import os
-from sqlalchemy import text
 from dotenv import load_dotenv
-from app.database.database import engine
+from app.database.database import get_engine
 
 load_dotenv()
 
@@ -12,12 +11,11 @@ async def load_seed_data():
         with open("seed_data.sql", "r", encoding="utf-8") as f:
             sql_content = f.read()
         
-        async with engine.begin() as conn:
-            # Разделить на отдельные команды
-            commands = [cmd.strip() for cmd in sql_content.split(';') if cmd.strip()]
-            for command in commands:
-                if command:  # Проверить что команда не пустая
-                    await conn.execute(text(command))
+        async with get_engine().begin() as conn:
+            # Выполняем скрипт целиком через драйвер: asyncpg сам разбирает
+            # несколько команд, поэтому ';' внутри строк и комментариев не ломает загрузку
+            raw_connection = await conn.get_raw_connection()
+            await raw_connection.driver_connection.execute(sql_content)
         
         print("✅ Тестовые данные загружены")
     except FileNotFoundError:
@@ -26,4 +24,4 @@ async def load_seed_data():
         print(f"❌ Ошибка загрузки данных: {e}")
 
 if __name__ == "__main__":
-    asyncio.run(load_seed_data())
\ No newline at end of file
+    asyncio.run(load_seed_data())
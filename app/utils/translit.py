@@ -0,0 +1,37 @@
+# app/utils/translit.py
+
+"""Приведение кириллицы и латиницы к одному поисковому виду.
+
+Узбекские названия пишут и кириллицей, и латиницей («атиргул» / «atirgul»,
+«ғунча» / «g'uncha»), поэтому для поиска всё переводится в латиницу без
+апострофов. Таблица повторяет SQL-функцию florange_translit из миграции
+поиска товаров - при изменении править оба места.
+"""
+
+import re
+from typing import List
+
+# Многобуквенные замены выполняются первыми
+_MULTI = {
+    "ш": "sh", "щ": "sh", "ч": "ch", "ю": "yu", "я": "ya",
+    "ё": "yo", "ж": "j", "ц": "ts",
+}
+
+_SINGLE = str.maketrans(
+    "абвгдезийклмнопрстуфхҳқғўыэ",
+    "abvgdeziyklmnoprstufxhqgoie",
+    "ъь'`ʻʼ’"
+)
+
+_TOKEN_RE = re.compile(r"\w+")
+
+def transliterate(text: str) -> str:
+    """Строка в нижнем регистре латиницей без апострофов"""
+    value = (text or "").lower()
+    for src, dst in _MULTI.items():
+        value = value.replace(src, dst)
+    return value.translate(_SINGLE)
+
+def search_tokens(text: str) -> List[str]:
+    """Слова строки в поисковом виде"""
+    return _TOKEN_RE.findall(transliterate(text))
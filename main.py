@@ -11,7 +11,8 @@ from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.config import config
-from app.handlers import start, catalog, cart, checkout, admin, orders, consultation, florist
+from app.translate import validate_translations
+from app.handlers import start, catalog, cart, checkout, admin, orders, consultation, florist, inline, courier
 from app.middleware.auth import AuthMiddleware
 from app.middleware.state_validation import StateValidationMiddleware, ConsultationCleanupMiddleware
 from app.database.database import init_db, close_db, get_engine
@@ -35,7 +36,20 @@ async def cleanup_resources(bot=None, dp=None):
         except Exception as e:
             print(f"Storage close error: {e}")
     
-    # 2. Закрываем Bot session (aiohttp)
+    # 2. Останавливаем фоновые задачи и дожидаемся архивирования (ему нужна сессия бота)
+    try:
+        from app.services.maintenance import maintenance
+        await maintenance.close()
+    except Exception as e:
+        print(f"Maintenance close error: {e}")
+
+    try:
+        from app.services.ai_archive_service import archive_queue
+        await archive_queue.close()
+    except Exception as e:
+        print(f"Archive queue close error: {e}")
+
+    # 3. Закрываем Bot session (aiohttp)
     if bot:
         try:
             if hasattr(bot, '_session') and bot._session:
@@ -46,7 +60,14 @@ async def cleanup_resources(bot=None, dp=None):
         except Exception as e:
             print(f"Bot session close error: {e}")
     
-    # 3. Закрываем SQLAlchemy engine
+    # 4. Дописываем буфер сообщений консультаций (до закрытия engine)
+    try:
+        from app.services.consultation_relay import message_writer
+        await message_writer.close()
+    except Exception as e:
+        print(f"Consultation writer close error: {e}")
+    
+    # 5. Закрываем SQLAlchemy engine
     try:
         engine = get_engine()
         if engine:
@@ -55,14 +76,17 @@ async def cleanup_resources(bot=None, dp=None):
     except Exception as e:
         print(f"Engine dispose error: {e}")
     
-    # 4. Закрываем Redis
+    # 6. Закрываем Redis
     try:
         from app.utils.cart import cart_manager
         await cart_manager.close()
+
+        from app.services.consultation_buffer import buffer_redis
+        await buffer_redis.close()
     except Exception as e:
         print(f"Redis close error: {e}")
     
-    # 5. Общее закрытие БД
+    # 7. Общее закрытие БД
     try:
         await close_db()
     except Exception as e:
@@ -77,6 +101,7 @@ async def main():
     
     try:
         config.validate()
+        validate_translations()
         await init_db()
         
         if "--seed" in sys.argv:
@@ -103,7 +128,21 @@ async def main():
         dp.include_router(orders.router)
         dp.include_router(consultation.router)
         dp.include_router(florist.router)
+        dp.include_router(inline.router)
+        dp.include_router(courier.router)
         
+        from app.services.ai_archive_service import archive_queue
+        await archive_queue.start(bot)
+
+        from app.services.role_request_counter import pending_requests
+        await pending_requests.refresh()
+
+        from app.services.staff_directory import staff_directory
+        await staff_directory.refresh()
+
+        from app.services.maintenance import maintenance
+        await maintenance.start(bot)
+
         print("🌸 Florange Bot запущен...")
         
         await dp.start_polling(bot)
@@ -0,0 +1,28 @@
+"""add inventory movements created_at index
+
+Revision ID: 3b9c1d2e4f60
+Revises: 0760a5d8a1f5
+Create Date: 2025-09-02 11:20:41.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9c1d2e4f60'
+down_revision: Union[str, Sequence[str], None] = '0760a5d8a1f5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Индекс для выборок движений склада по периоду"""
+    op.create_index('idx_inventory_movements_created', 'inventory_movements', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    """Удалить индекс"""
+    op.drop_index('idx_inventory_movements_created', 'inventory_movements')
@@ -0,0 +1,74 @@
+"""add natural keys for bulk import
+
+Revision ID: 7c4e2a91b5d3
+Revises: 3b9c1d2e4f60
+Create Date: 2025-09-03 15:42:07.904512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Таблицы, где ключ импорта становится уникальным: (таблица, колонка, ограничение)
+NATURAL_KEYS = [
+    ('flowers', 'name_ru', 'uq_flowers_name_ru'),
+    ('suppliers', 'name', 'uq_suppliers_name'),
+    ('products', 'name_ru', 'uq_products_name_ru'),
+]
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4e2a91b5d3'
+down_revision: Union[str, Sequence[str], None] = '3b9c1d2e4f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_duplicates() -> None:
+    """Остановить миграцию, если в справочниках есть одинаковые названия.
+
+    Строки с дублями уже связаны с заказами, составами и партиями, поэтому
+    удалять их автоматически нельзя - их нужно объединить или переименовать вручную.
+    """
+    connection = op.get_bind()
+    problems = []
+    for table, column, _ in NATURAL_KEYS:
+        rows = connection.execute(sa.text(
+            f"SELECT {column}, count(*) FROM {table} GROUP BY {column} HAVING count(*) > 1 ORDER BY {column} LIMIT 20"
+        )).all()
+        if rows:
+            names = ", ".join(f"'{name}' x{count}" for name, count in rows)
+            problems.append(f"{table}.{column}: {names}")
+    if problems:
+        raise RuntimeError(
+            "Нельзя добавить уникальные ключи импорта - есть дубли названий. "
+            "Переименуйте или объедините записи и повторите миграцию:\n" + "\n".join(problems)
+        )
+
+
+def upgrade() -> None:
+    """Уникальные ключи для ON CONFLICT при массовом импорте"""
+    _check_duplicates()
+    
+    # Дубликаты состава схлопываем: оставляем самую свежую запись
+    op.execute("""
+        DELETE FROM product_compositions a
+        USING product_compositions b
+        WHERE a.product_id = b.product_id
+          AND a.flower_id = b.flower_id
+          AND a.id < b.id
+    """)
+    
+    for table, column, name in NATURAL_KEYS:
+        op.create_unique_constraint(name, table, [column])
+    op.create_unique_constraint(
+        'uq_product_compositions_product_flower', 'product_compositions', ['product_id', 'flower_id']
+    )
+
+
+def downgrade() -> None:
+    """Удалить уникальные ключи"""
+    op.drop_constraint('uq_product_compositions_product_flower', 'product_compositions', type_='unique')
+    for table, _, name in reversed(NATURAL_KEYS):
+        op.drop_constraint(name, table, type_='unique')
@@ -0,0 +1,39 @@
+"""add media fields to consultation messages
+
+Revision ID: 9e1f6b3c8a27
+Revises: 7c4e2a91b5d3
+Create Date: 2025-09-05 10:14:52.661930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e1f6b3c8a27'
+down_revision: Union[str, Sequence[str], None] = '7c4e2a91b5d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Тип вложения, file_id и альбом для сообщений консультаций"""
+    op.add_column('consultation_messages', sa.Column('content_type', sa.String(32), server_default='text', nullable=True))
+    op.add_column('consultation_messages', sa.Column('file_id', sa.String(255), nullable=True))
+    op.add_column('consultation_messages', sa.Column('media_group_id', sa.String(64), nullable=True))
+    
+    # Старые фото переносим в общие поля
+    op.execute("""
+        UPDATE consultation_messages
+        SET content_type = 'photo', file_id = photo_file_id
+        WHERE photo_file_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Удалить поля вложений"""
+    op.drop_column('consultation_messages', 'media_group_id')
+    op.drop_column('consultation_messages', 'file_id')
+    op.drop_column('consultation_messages', 'content_type')
@@ -0,0 +1,48 @@
+"""add delivery slots
+
+Revision ID: a3d8f5c2e716
+Revises: f7a1c3d9e284
+Create Date: 2025-09-11 09:41:22.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3d8f5c2e716'
+down_revision: Union[str, Sequence[str], None] = 'f7a1c3d9e284'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Счетчики бронирований слотов доставки"""
+    op.create_table(
+        'delivery_slots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('slot_at', sa.DateTime(), nullable=False),
+        sa.Column('booked', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slot_at')
+    )
+
+    # Уже оформленные заказы со слотом занимают места
+    op.execute("""
+        INSERT INTO delivery_slots (slot_at, booked, updated_at)
+        SELECT slot_at, COUNT(*), now()
+        FROM orders
+        WHERE slot_at IS NOT NULL AND status <> 'canceled'
+        GROUP BY slot_at
+    """)
+
+    op.create_index('idx_orders_slot_at', 'orders', ['slot_at'])
+
+
+def downgrade() -> None:
+    """Удалить слоты доставки"""
+    op.drop_index('idx_orders_slot_at', table_name='orders')
+    op.drop_table('delivery_slots')
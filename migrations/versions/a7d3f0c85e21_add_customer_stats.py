@@ -0,0 +1,54 @@
+"""add customer stats
+
+Revision ID: a7d3f0c85e21
+Revises: f4c9e1b37a60
+Create Date: 2025-09-14 14:38:02.615907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f0c85e21'
+down_revision: Union[str, Sequence[str], None] = 'f4c9e1b37a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Сводка по клиентам и заполнение по существующим заказам"""
+    op.create_table(
+        'customer_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('orders_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('delivered_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_spent', sa.Numeric(precision=12, scale=2), nullable=False, server_default='0'),
+        sa.Column('first_order_at', sa.DateTime(), nullable=True),
+        sa.Column('last_order_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+
+    op.execute("""
+        INSERT INTO customer_stats
+            (user_id, orders_count, delivered_count, total_spent, first_order_at, last_order_at, updated_at)
+        SELECT
+            user_id,
+            count(*) FILTER (WHERE status <> 'canceled'),
+            count(*) FILTER (WHERE status = 'delivered'),
+            coalesce(sum(total_price) FILTER (WHERE status = 'delivered'), 0),
+            min(created_at),
+            max(created_at),
+            now()
+        FROM orders
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Удалить сводку по клиентам"""
+    op.drop_table('customer_stats')
@@ -0,0 +1,41 @@
+"""add consultation archive parts
+
+Revision ID: b4d27e905c1a
+Revises: 9e1f6b3c8a27
+Create Date: 2025-09-06 12:03:17.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d27e905c1a'
+down_revision: Union[str, Sequence[str], None] = '9e1f6b3c8a27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Части архива консультаций в канале"""
+    op.create_table(
+        'consultation_archive_parts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('consultation_id', sa.Integer(), nullable=False),
+        sa.Column('part_no', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(16), nullable=False),
+        sa.Column('chat_id', sa.String(64), nullable=False),
+        sa.Column('message_ids', sa.JSON(), nullable=False),
+        sa.Column('media', sa.JSON(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['consultation_id'], ['consultations.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('consultation_id', 'part_no', name='uq_consultation_archive_parts_part')
+    )
+
+
+def downgrade() -> None:
+    """Удалить части архива"""
+    op.drop_table('consultation_archive_parts')
@@ -0,0 +1,63 @@
+"""add order geo and delivery zones
+
+Revision ID: b6e2d9f41a07
+Revises: a3d8f5c2e716
+Create Date: 2025-09-11 16:20:08.915442
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6e2d9f41a07'
+down_revision: Union[str, Sequence[str], None] = 'a3d8f5c2e716'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Зоны доставки и координаты заказа отдельными колонками"""
+    op.create_table(
+        'delivery_zones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name_ru', sa.String(length=100), nullable=False),
+        sa.Column('name_uz', sa.String(length=100), nullable=False),
+        sa.Column('polygon', sa.JSON(), nullable=False),
+        sa.Column('fee', sa.Numeric(precision=10, scale=2), nullable=False, server_default='0'),
+        sa.Column('eta_minutes', sa.Integer(), nullable=False, server_default='60'),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('is_active', sa.Boolean(), nullable=True, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+    op.add_column('orders', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('orders', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('orders', sa.Column('delivery_zone_id', sa.Integer(), nullable=True))
+    op.add_column('orders', sa.Column('delivery_fee', sa.Numeric(precision=10, scale=2), nullable=True))
+    op.create_foreign_key(
+        'orders_delivery_zone_id_fkey', 'orders', 'delivery_zones', ['delivery_zone_id'], ['id']
+    )
+    op.create_index('idx_orders_delivery_zone', 'orders', ['delivery_zone_id'])
+
+    # Координаты старых заказов из комментария "Координаты: lat, lon"
+    op.execute(r"""
+        UPDATE orders
+        SET latitude = (regexp_match(comment, 'Координаты: (-?[0-9.]+), (-?[0-9.]+)'))[1]::float,
+            longitude = (regexp_match(comment, 'Координаты: (-?[0-9.]+), (-?[0-9.]+)'))[2]::float
+        WHERE comment ~ 'Координаты: -?[0-9.]+, -?[0-9.]+'
+    """)
+
+
+def downgrade() -> None:
+    """Удалить зоны и координаты"""
+    op.drop_index('idx_orders_delivery_zone', table_name='orders')
+    op.drop_constraint('orders_delivery_zone_id_fkey', 'orders', type_='foreignkey')
+    op.drop_column('orders', 'delivery_fee')
+    op.drop_column('orders', 'delivery_zone_id')
+    op.drop_column('orders', 'longitude')
+    op.drop_column('orders', 'latitude')
+    op.drop_table('delivery_zones')
@@ -0,0 +1,50 @@
+"""add product recommendations
+
+Revision ID: b9e5a2d47c13
+Revises: a7d3f0c85e21
+Create Date: 2025-09-15 11:02:47.318254
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9e5a2d47c13'
+down_revision: Union[str, Sequence[str], None] = 'a7d3f0c85e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Популярность товаров и пары "часто берут вместе".
+
+    Таблицы заполнит задача обслуживания refresh_recommendations с первого заказа.
+    """
+    op.create_table(
+        'product_popularity',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    op.create_table(
+        'product_pairs',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('related_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['related_id'], ['products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'related_id')
+    )
+    op.create_index('idx_product_pairs_score', 'product_pairs', ['product_id', 'score'])
+
+
+def downgrade() -> None:
+    """Удалить таблицы рекомендаций"""
+    op.drop_index('idx_product_pairs_score', table_name='product_pairs')
+    op.drop_table('product_pairs')
+    op.drop_table('product_popularity')
@@ -0,0 +1,43 @@
+"""add customer segments
+
+Revision ID: c2f8d6a41e93
+Revises: b9e5a2d47c13
+Create Date: 2025-09-15 16:24:09.540128
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f8d6a41e93'
+down_revision: Union[str, Sequence[str], None] = 'b9e5a2d47c13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """RFM-сегменты клиентов.
+
+    Таблицу заполнит задача обслуживания refresh_customer_segments.
+    """
+    op.create_table(
+        'customer_segments',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('recency_score', sa.Integer(), nullable=False),
+        sa.Column('frequency_score', sa.Integer(), nullable=False),
+        sa.Column('monetary_score', sa.Integer(), nullable=False),
+        sa.Column('segment', sa.String(length=20), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_customer_segments_segment'), 'customer_segments', ['segment'], unique=False)
+
+
+def downgrade() -> None:
+    """Удалить RFM-сегменты"""
+    op.drop_index(op.f('ix_customer_segments_segment'), table_name='customer_segments')
+    op.drop_table('customer_segments')
@@ -0,0 +1,60 @@
+"""add delivery batches
+
+Revision ID: c5f3a8e07b94
+Revises: b6e2d9f41a07
+Create Date: 2025-09-12 11:05:47.138260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5f3a8e07b94'
+down_revision: Union[str, Sequence[str], None] = 'b6e2d9f41a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Рейсы курьеров и привязка к ним заказов"""
+    op.create_table(
+        'delivery_batches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('open', 'offered', 'accepted', 'delivering', 'completed',
+                                    name='batchstatusenum'), nullable=False),
+        sa.Column('delivery_zone_id', sa.Integer(), nullable=True),
+        sa.Column('slot_at', sa.DateTime(), nullable=True),
+        sa.Column('route', sa.JSON(), nullable=False),
+        sa.Column('distance_km', sa.Numeric(precision=8, scale=2), nullable=True),
+        sa.Column('courier_id', sa.Integer(), nullable=True),
+        sa.Column('declined_by', sa.JSON(), nullable=False),
+        sa.Column('offered_at', sa.DateTime(), nullable=True),
+        sa.Column('accepted_at', sa.DateTime(), nullable=True),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['delivery_zone_id'], ['delivery_zones.id']),
+        sa.ForeignKeyConstraint(['courier_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_delivery_batches_status', 'delivery_batches', ['status', 'courier_id'])
+
+    op.add_column('orders', sa.Column('batch_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('orders_batch_id_fkey', 'orders', 'delivery_batches', ['batch_id'], ['id'])
+    op.create_index('idx_orders_batch', 'orders', ['batch_id'])
+
+    # Поиск готовых заказов без рейса
+    op.execute("CREATE INDEX idx_orders_ready_unbatched ON orders (slot_at) WHERE status = 'ready' AND batch_id IS NULL")
+
+
+def downgrade() -> None:
+    """Удалить рейсы"""
+    op.drop_index('idx_orders_ready_unbatched', table_name='orders')
+    op.drop_index('idx_orders_batch', table_name='orders')
+    op.drop_constraint('orders_batch_id_fkey', 'orders', type_='foreignkey')
+    op.drop_column('orders', 'batch_id')
+    op.drop_index('idx_delivery_batches_status', table_name='delivery_batches')
+    op.drop_table('delivery_batches')
+    op.execute("DROP TYPE IF EXISTS batchstatusenum")
@@ -0,0 +1,32 @@
+"""add consultation messages index
+
+Revision ID: c83a5f1e9d42
+Revises: b4d27e905c1a
+Create Date: 2025-09-07 09:41:08.517342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c83a5f1e9d42'
+down_revision: Union[str, Sequence[str], None] = 'b4d27e905c1a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Индекс для выборки переписки консультации и очистки по сроку хранения"""
+    op.create_index(
+        'idx_consultation_messages_consultation',
+        'consultation_messages',
+        ['consultation_id', 'created_at']
+    )
+
+
+def downgrade() -> None:
+    """Удалить индекс"""
+    op.drop_index('idx_consultation_messages_consultation', table_name='consultation_messages')
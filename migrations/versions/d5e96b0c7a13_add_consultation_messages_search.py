@@ -0,0 +1,41 @@
+"""add consultation messages full-text search
+
+Revision ID: d5e96b0c7a13
+Revises: c83a5f1e9d42
+Create Date: 2025-09-08 11:26:44.093715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e96b0c7a13'
+down_revision: Union[str, Sequence[str], None] = 'c83a5f1e9d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Поисковый вектор сообщений консультаций: русская морфология + simple для узбекского"""
+    # Генерируемая колонка - заполняется самой БД при вставке, в том числе пачками
+    op.execute("""
+        ALTER TABLE consultation_messages
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(message_text, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(message_text, '')), 'B')
+        ) STORED
+    """)
+    op.execute("""
+        CREATE INDEX idx_consultation_messages_search
+        ON consultation_messages USING GIN (search_vector)
+    """)
+
+
+def downgrade() -> None:
+    """Удалить поиск по сообщениям"""
+    op.execute("DROP INDEX IF EXISTS idx_consultation_messages_search")
+    op.drop_column('consultation_messages', 'search_vector')
@@ -0,0 +1,40 @@
+"""add order assignment
+
+Revision ID: d8a4c1f6e352
+Revises: c5f3a8e07b94
+Create Date: 2025-09-13 10:22:31.504817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a4c1f6e352'
+down_revision: Union[str, Sequence[str], None] = 'c5f3a8e07b94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Предложение заказа одному флористу"""
+    op.add_column('orders', sa.Column('offered_florist_id', sa.Integer(), nullable=True))
+    op.add_column('orders', sa.Column('offered_at', sa.DateTime(), nullable=True))
+    op.add_column('orders', sa.Column('offer_skipped', sa.JSON(), nullable=True))
+    op.create_foreign_key('orders_offered_florist_id_fkey', 'orders', 'users', ['offered_florist_id'], ['id'])
+
+    # Нагрузка флориста: заказы в работе и висящие предложения
+    op.create_index('idx_orders_florist_status', 'orders', ['florist_id', 'status'])
+    op.execute("CREATE INDEX idx_orders_new_offers ON orders (offered_florist_id, offered_at) WHERE status = 'new'")
+
+
+def downgrade() -> None:
+    """Удалить назначение заказов"""
+    op.drop_index('idx_orders_new_offers', table_name='orders')
+    op.drop_index('idx_orders_florist_status', table_name='orders')
+    op.drop_constraint('orders_offered_florist_id_fkey', 'orders', type_='foreignkey')
+    op.drop_column('orders', 'offer_skipped')
+    op.drop_column('orders', 'offered_at')
+    op.drop_column('orders', 'offered_florist_id')
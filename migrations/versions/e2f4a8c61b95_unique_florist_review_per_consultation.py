@@ -0,0 +1,50 @@
+"""unique florist review per consultation
+
+Revision ID: e2f4a8c61b95
+Revises: d5e96b0c7a13
+Create Date: 2025-09-09 10:52:31.776120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2f4a8c61b95'
+down_revision: Union[str, Sequence[str], None] = 'd5e96b0c7a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Одна оценка на консультацию и точный пересчет рейтингов"""
+    # Повторные оценки: оставляем самую раннюю
+    op.execute("""
+        DELETE FROM florist_reviews r
+        USING florist_reviews earlier
+        WHERE r.consultation_id = earlier.consultation_id
+          AND r.id > earlier.id
+    """)
+    op.create_unique_constraint(
+        'florist_reviews_consultation_id_key', 'florist_reviews', ['consultation_id']
+    )
+
+    op.execute("""
+        UPDATE florist_profiles p
+        SET rating = COALESCE(s.avg_rating, 0),
+            reviews_count = COALESCE(s.reviews_count, 0)
+        FROM florist_profiles p2
+        LEFT JOIN (
+            SELECT florist_id, ROUND(AVG(rating), 2) AS avg_rating, COUNT(*) AS reviews_count
+            FROM florist_reviews
+            GROUP BY florist_id
+        ) s ON s.florist_id = p2.user_id
+        WHERE p.id = p2.id
+    """)
+
+
+def downgrade() -> None:
+    """Разрешить повторные оценки"""
+    op.drop_constraint('florist_reviews_consultation_id_key', 'florist_reviews', type_='unique')
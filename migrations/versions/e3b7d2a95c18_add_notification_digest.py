@@ -0,0 +1,28 @@
+"""add notification digest
+
+Revision ID: e3b7d2a95c18
+Revises: d8a4c1f6e352
+Create Date: 2025-09-13 15:47:09.281364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3b7d2a95c18'
+down_revision: Union[str, Sequence[str], None] = 'd8a4c1f6e352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Режим уведомлений о заказах: сразу или сводкой"""
+    op.add_column('users', sa.Column('notify_digest_minutes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Удалить режим сводки"""
+    op.drop_column('users', 'notify_digest_minutes')
@@ -0,0 +1,28 @@
+"""add orders user keyset index
+
+Revision ID: f4c9e1b37a60
+Revises: e3b7d2a95c18
+Create Date: 2025-09-14 09:12:44.730152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c9e1b37a60'
+down_revision: Union[str, Sequence[str], None] = 'e3b7d2a95c18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Постраничные "Мои заказы": (user_id, created_at, id)"""
+    op.create_index('idx_orders_user_created', 'orders', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    """Удалить индекс"""
+    op.drop_index('idx_orders_user_created', table_name='orders')
@@ -0,0 +1,69 @@
+"""add product trigram search
+
+Revision ID: f7a1c3d9e284
+Revises: e2f4a8c61b95
+Create Date: 2025-09-10 14:08:57.319054
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a1c3d9e284'
+down_revision: Union[str, Sequence[str], None] = 'e2f4a8c61b95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """pg_trgm индексы для нечеткого поиска товаров и цветов"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    # Кириллица -> латиница без апострофов, как app/utils/translit.py
+    op.execute("""
+        CREATE OR REPLACE FUNCTION florange_translit(value text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT translate(
+                replace(replace(replace(replace(replace(replace(replace(replace(
+                    lower(coalesce(value, '')),
+                    'ш', 'sh'), 'щ', 'sh'), 'ч', 'ch'), 'ю', 'yu'),
+                    'я', 'ya'), 'ё', 'yo'), 'ж', 'j'), 'ц', 'ts'),
+                'абвгдезийклмнопрстуфхҳқғўыэъь''`ʻʼ’',
+                'abvgdeziyklmnoprstufxhqgoie'
+            )
+        $$
+    """)
+
+    # Ключ поиска товара: названия и описания на обоих языках
+    op.execute("""
+        CREATE OR REPLACE FUNCTION florange_product_search_key(
+            name_ru text, name_uz text, desc_ru text, desc_uz text
+        ) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT florange_translit(
+                coalesce(name_ru, '') || ' ' || coalesce(name_uz, '') || ' ' ||
+                coalesce(desc_ru, '') || ' ' || coalesce(desc_uz, '')
+            )
+        $$
+    """)
+
+    op.execute("""
+        CREATE INDEX idx_products_search_trgm ON products
+        USING GIN (florange_product_search_key(name_ru, name_uz, desc_ru, desc_uz) gin_trgm_ops)
+    """)
+
+    # ILIKE '%...%' в поиске цветов тоже начинает использовать индекс
+    op.execute("CREATE INDEX idx_flowers_name_ru_trgm ON flowers USING GIN (name_ru gin_trgm_ops)")
+    op.execute("CREATE INDEX idx_flowers_name_uz_trgm ON flowers USING GIN (name_uz gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Удалить индексы поиска"""
+    op.execute("DROP INDEX IF EXISTS idx_flowers_name_uz_trgm")
+    op.execute("DROP INDEX IF EXISTS idx_flowers_name_ru_trgm")
+    op.execute("DROP INDEX IF EXISTS idx_products_search_trgm")
+    op.execute("DROP FUNCTION IF EXISTS florange_product_search_key(text, text, text, text)")
+    op.execute("DROP FUNCTION IF EXISTS florange_translit(text)")
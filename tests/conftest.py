@@ -1,11 +1,12 @@
 import pytest
+import pytest_asyncio
 import asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models import Base
 from app.database.database import get_session
 
-@pytest.fixture
+@pytest_asyncio.fixture
 async def test_db():
     """Тестовая база данных"""
     engine = create_async_engine("sqlite+aiosqlite:///:memory:", echo=False)
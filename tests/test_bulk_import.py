@@ -0,0 +1,53 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+
+from app.exceptions import ValidationError
+from app.utils.bulk_import import IMPORT_SPECS, ImportReport, parse_rows, _iter_raw_rows
+
+class TestBulkImportParsing:
+    """Тесты разбора файлов импорта"""
+    
+    def test_csv_rows_are_typed_and_errors_reported(self, tmp_path):
+        """Строки CSV приводятся к типам, ошибочные попадают в отчет"""
+        path = tmp_path / "batches.csv"
+        path.write_text(
+            "flower;supplier;quantity;purchase_price;expire_date\n"
+            "Роза красная;ЦветТорг;100;12 500,50;31.12.2025\n"
+            "Тюльпан;;много;1000;2025-12-01\n"
+            ";ЦветТорг;5;1000;\n",
+            encoding="utf-8"
+        )
+        
+        report = ImportReport(entity="batches")
+        header, rows = _iter_raw_rows(str(path))
+        records = list(parse_rows(IMPORT_SPECS["batches"], header, rows, report))
+        
+        assert records == [(2, "Роза красная", "ЦветТорг", 100, Decimal("12500.50"), date(2025, 12, 31))]
+        assert report.total_rows == 3
+        assert [error.line_no for error in report.errors] == [3, 4]
+    
+    def test_jsonl_rows(self, tmp_path):
+        """JSONL: колонки берутся из первой строки, битые строки в отчете"""
+        path = tmp_path / "flowers.jsonl"
+        path.write_text(
+            '{"name_ru": "Роза", "name_uz": "Atirgul", "unit_type": "piece", "is_active": "да"}\n'
+            '{"name_ru": "Лилия", \n',
+            encoding="utf-8"
+        )
+        
+        report = ImportReport(entity="flowers")
+        header, rows = _iter_raw_rows(str(path))
+        records = list(parse_rows(IMPORT_SPECS["flowers"], header, rows, report))
+        
+        assert records == [(1, "Роза", "Atirgul", "piece", True)]
+        assert report.errors[0].line_no == 2
+    
+    def test_missing_required_column(self, tmp_path):
+        """Без обязательной колонки импорт не начинается"""
+        path = tmp_path / "products.csv"
+        path.write_text("name_ru,name_uz\nБукет,Guldasta\n", encoding="utf-8")
+        
+        header, rows = _iter_raw_rows(str(path))
+        with pytest.raises(ValidationError):
+            list(parse_rows(IMPORT_SPECS["products"], header, rows, ImportReport(entity="products")))
@@ -0,0 +1,49 @@
+from datetime import date, datetime
+
+from app.utils.calendar_kb import calendar_keyboard, _build_calendar
+from app.services.delivery_slots import SLOT_PERIODS, build_availability, slot_start, period_for_time
+
+def _days(kb):
+    return [b.text for row in kb.inline_keyboard[2:-1] for b in row if b.text.strip()]
+
+class TestCalendarKeyboard:
+    """Тесты календаря выбора даты доставки"""
+
+    def test_past_and_booked_dates_hidden(self):
+        """Прошедшие и занятые даты не выбираются"""
+        kb = calendar_keyboard(2025, 9, "ru", date(2025, 9, 10), {date(2025, 9, 12), date(2025, 10, 1)})
+
+        assert kb.inline_keyboard[0][0].text == "Сентябрь 2025"
+        assert _days(kb)[:3] == ["10", "11", "13"]
+        assert kb.inline_keyboard[-1][0].callback_data == "ignore"  # раньше сентября нельзя
+        assert kb.inline_keyboard[-1][1].callback_data == "cal_2025_10"
+
+    def test_memoized(self):
+        """Повторное листание берет сетку из кэша, но отдает новую разметку"""
+        earliest = date(2025, 12, 30)
+        kb = calendar_keyboard(2026, 1, "uz", earliest)
+        hits = _build_calendar.cache_info().hits
+
+        again = calendar_keyboard(2026, 1, "uz", earliest, {date(2025, 12, 31)})
+        assert _build_calendar.cache_info().hits == hits + 1
+        assert again is not kb and again == kb
+        assert kb.inline_keyboard[-1][0].callback_data == "cal_2025_12"
+
+class TestSlotAvailability:
+    """Тесты карты доступности слотов доставки"""
+
+    def test_build_availability(self):
+        """Прошедшие и заполненные периоды недоступны, полностью занятый день - в fully_booked"""
+        now = datetime(2025, 9, 10, 13, 0)
+        capacities = {period: 2 for period in SLOT_PERIODS}
+        tomorrow = date(2025, 9, 11)
+        booked = {slot_start(tomorrow, period): 2 for period in SLOT_PERIODS}
+        booked[slot_start(now.date(), "evening")] = 1
+
+        availability = build_availability(now, capacities, booked, days=3)
+
+        assert availability.free_periods(now.date()) == {"day": 2, "evening": 1, "night": 2}
+        assert availability.fully_booked == frozenset({tomorrow})
+        assert availability.is_free(date(2025, 12, 1), "morning")  # за горизонтом карты
+        assert period_for_time(datetime(2025, 9, 10, 14, 30).time()) == "day"
+        assert period_for_time(datetime(2025, 9, 10, 22, 0).time()) is None
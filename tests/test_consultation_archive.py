@@ -0,0 +1,59 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.ai_archive_service import render_transcript_items
+from app.services.transcript_store import TranscriptStore, LocalTranscriptBackend
+from app.utils.message_packing import pack_messages
+
+META = {
+    "consultation_id": 7,
+    "client_id": 1, "client_name": "Анна",
+    "florist_id": 2, "florist_name": "Мария",
+    "message_count": 3,
+}
+
+def _msg(sender_id, text="", content_type="text", file_id=None, minute=0):
+    return SimpleNamespace(
+        sender_id=sender_id, message_text=text, content_type=content_type,
+        file_id=file_id, photo_file_id=file_id if content_type == "photo" else None,
+        media_group_id=None, created_at=datetime(2025, 1, 1, 12, minute)
+    )
+
+class TestConsultationArchive:
+    """Тесты подготовки переписки для архива"""
+
+    def test_render_transcript(self):
+        """Тексты подписываются автором, фото идут с подписью, прочее - меткой"""
+        items = render_transcript_items(META, [
+            _msg(1, "Нужен букет"),
+            _msg(2, "Вот варианты", "photo", "p1", minute=1),
+            _msg(1, "", "voice", "v1", minute=2),
+        ])
+
+        assert items[0] == {"text": "[12:00] Анна: Нужен букет"}
+        assert items[1] == {"photo": "p1", "text": "Мария, 12:01: Вот варианты"}
+        assert items[2] == {"text": "[12:02] Анна: 🎤 Голосовое сообщение"}
+
+    def test_transcript_packets(self):
+        """Подряд идущие фото публикуются одним альбомом"""
+        messages = [_msg(1, "Привет")] + [_msg(2, "", "photo", f"p{i}") for i in range(3)]
+        packets = pack_messages(render_transcript_items(META, messages))
+
+        assert [p["type"] for p in packets] == ["text", "photos"]
+        assert len(packets[1]["photos"]) == 3
+
+    @pytest.mark.asyncio
+    async def test_transcript_store_pages(self, tmp_path):
+        """Переписка сохраняется сжатой и читается страницами"""
+        store = TranscriptStore(LocalTranscriptBackend(str(tmp_path)), codec="gz")
+        messages = [_msg(1, f"Сообщение {i}", minute=i) for i in range(5)]
+
+        await store.save("archive_42", META, messages)
+        meta, page = await store.read_page("archive_42", offset=2, limit=2)
+
+        assert meta["consultation_id"] == 7
+        assert [m.message_text for m in page] == ["Сообщение 2", "Сообщение 3"]
+        assert page[0].created_at == datetime(2025, 1, 1, 12, 2)
+        assert await store.read_page("archive_missing", 0, 10) is None
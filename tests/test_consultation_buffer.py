@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.services.consultation_buffer as consultation_buffer
+from app.config import config
+from app.models import User, Consultation, ConsultationStatusEnum
+from app.services.consultation_buffer import (
+    ConsultationBufferService, PostgresBufferBackend, RedisStreamBufferBackend
+)
+
+class _FakeRedis:
+    """Streams в памяти: только команды, которые использует буфер"""
+
+    def __init__(self):
+        self.streams = {}
+        self.ttl = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    async def xrange(self, key, start, end):
+        return list(self.streams.get(key, []))
+
+    async def xlen(self, key):
+        return len(self.streams.get(key, []))
+
+    async def delete(self, key):
+        self.streams.pop(key, None)
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def xadd(self, key, fields):
+        self.commands.append(("xadd", key, fields))
+
+    def expire(self, key, ttl):
+        self.commands.append(("expire", key, ttl))
+
+    async def execute(self):
+        for command, key, value in self.commands:
+            if command == "xadd":
+                stream = self.redis.streams.setdefault(key, [])
+                stream.append((f"{len(stream)}-0", {k: str(v) for k, v in value.items()}))
+            else:
+                self.redis.ttl[key] = value
+        return [True] * len(self.commands)
+
+class TestConsultationBuffer:
+    """Тесты буфера сообщений консультаций"""
+
+    @pytest.mark.asyncio
+    async def test_redis_stream_backend(self):
+        """Сообщения читаются в порядке записи, TTL - по сроку консультации"""
+        redis = _FakeRedis()
+        backend = RedisStreamBufferBackend(redis)
+
+        expires_at = datetime.utcnow() + timedelta(minutes=10)
+        await backend.add_message(7, 1, message_text="Здравствуйте", sender_name="Анна", expires_at=expires_at)
+        assert 600 <= redis.ttl["consultation_buffer:7"] <= 660
+        await backend.add_message(7, 1, photo_file_id="photo_id")
+
+        messages = await backend.get_messages(7)
+        assert [m["message_text"] for m in messages] == ["Здравствуйте", None]
+        assert messages[0]["sender_id"] == 1 and messages[0]["sender_name"] == "Анна"
+        assert messages[1]["photo_file_id"] == "photo_id"
+        assert await backend.get_buffer_size(7) == 2
+
+        await backend.clear_buffer(7)
+        assert await backend.get_messages(7) == []
+
+    @pytest.mark.asyncio
+    async def test_service_reads_both_stores(self, test_db, monkeypatch):
+        """Сообщения времен сбоя Redis (в PostgreSQL) доходят после его восстановления"""
+        redis = _FakeRedis()
+        available = {"redis": None}
+
+        async def get_client():
+            return available["redis"]
+
+        monkeypatch.setattr(consultation_buffer.buffer_redis, "get_client", get_client)
+        monkeypatch.setattr(config, "CONSULTATION_BUFFER_BACKEND", "redis")
+
+        async for session in test_db():
+            client = User(tg_id="1", first_name="Клиент")
+            florist = User(tg_id="2", first_name="Флорист")
+            session.add_all([client, florist])
+            await session.flush()
+            consultation = Consultation(client_id=client.id, florist_id=florist.id,
+                                        status=ConsultationStatusEnum.pending)
+            session.add(consultation)
+            await session.flush()
+
+            # Redis лежит - пишем в PostgreSQL
+            await ConsultationBufferService(session).add_message(consultation.id, client.id, message_text="первое")
+            # Redis поднялся - пишем в стрим
+            available["redis"] = redis
+            await ConsultationBufferService(session).add_message(consultation.id, client.id, message_text="второе")
+
+            service = ConsultationBufferService(session)
+            assert [m["message_text"] for m in await service.get_messages(consultation.id)] == ["первое", "второе"]
+            assert await service.get_buffer_size(consultation.id) == 2
+
+            await service.clear_buffer(consultation.id)
+            assert await service.get_buffer_size(consultation.id) == 0
+            assert await PostgresBufferBackend(session).get_messages(consultation.id) == []
+
+    @pytest.mark.asyncio
+    async def test_delivery_resumes_without_duplicates(self, test_db, monkeypatch):
+        """Сбой посреди доставки: буфер остается, повтор досылает только недоставленное"""
+        from app.handlers import consultation as handlers
+
+        monkeypatch.setattr(config, "CONSULTATION_BUFFER_BACKEND", "postgres")
+        sent = []
+        failures = {"left": 1}
+
+        class _Bot:
+            async def send_message(self, chat_id, text):
+                sent.append(text)
+
+            async def send_photo(self, chat_id, photo, caption=None):
+                if failures["left"]:
+                    failures["left"] -= 1
+                    raise RuntimeError("telegram is down")
+                sent.append(photo)
+
+        async for session in test_db():
+            client = User(tg_id="1", first_name="Клиент")
+            florist = User(tg_id="2", first_name="Флорист")
+            session.add_all([client, florist])
+            await session.flush()
+            consultation = Consultation(client_id=client.id, florist_id=florist.id,
+                                        status=ConsultationStatusEnum.active)
+            session.add(consultation)
+            await session.flush()
+
+            service = ConsultationBufferService(session)
+            await service.add_message(consultation.id, client.id, message_text="Нужен букет")
+            await service.add_message(consultation.id, client.id, photo_file_id="photo_id")
+            await session.commit()
+
+            bot = _Bot()
+            assert not await handlers._deliver_buffered_messages_to_florist(bot, consultation.id, session, "2")
+            assert len(sent) == 2 and await service.get_buffer_size(consultation.id) == 2
+
+            assert await handlers._deliver_buffered_messages_to_florist(bot, consultation.id, session, "2")
+            assert len(sent) == 3 and sent[-1] == "photo_id"
+            assert await service.get_buffer_size(consultation.id) == 0
+            assert consultation.id not in handlers._buffer_delivery_progress
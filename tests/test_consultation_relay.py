@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from aiogram import types
+
+import app.database.database as database
+from app.models import ConsultationStatusEnum
+from app.services.consultation_relay import (
+    ConsultationParticipants, ConsultationMessageWriter, MediaGroupCollector,
+    extract_content, build_input_media, finish_consultation, participants_cache
+)
+
+def _message(**fields) -> types.Message:
+    return types.Message(
+        message_id=1,
+        date=datetime(2025, 1, 1),
+        chat=types.Chat(id=100, type="private"),
+        **fields
+    )
+
+class TestConsultationRelay:
+    """Тесты быстрого пути пересылки консультаций"""
+    
+    def test_resolve_recipient(self):
+        """Получатель определяется по tg_id отправителя"""
+        participants = ConsultationParticipants(
+            consultation_id=1,
+            client_id=10, client_tg_id="111", client_name="Клиент",
+            florist_id=20, florist_tg_id="222", florist_name="Флорист"
+        )
+        
+        assert participants.resolve(111) == (10, "Клиент", "222")
+        assert participants.resolve("222") == (20, "Флорист", "111")
+        assert participants.resolve(333) is None
+    
+    def test_extract_content(self):
+        """Берется самый большой размер фото и file_id любого вложения"""
+        photo = _message(photo=[
+            types.PhotoSize(file_id="small", file_unique_id="s", width=90, height=90),
+            types.PhotoSize(file_id="large", file_unique_id="l", width=1280, height=1280),
+        ])
+        voice = _message(voice=types.Voice(file_id="voice_id", file_unique_id="v", duration=3))
+        text = _message(text="Привет")
+        
+        assert extract_content(photo) == ("photo", "large")
+        assert extract_content(voice) == ("voice", "voice_id")
+        assert extract_content(text) == ("text", None)
+    
+    def test_build_input_media(self):
+        """Голосовые в альбом не группируются"""
+        assert isinstance(build_input_media("photo", "id", "подпись"), types.InputMediaPhoto)
+        assert build_input_media("voice", "id") is None
+    
+    def test_finished_consultation_not_recached(self):
+        """Завершенная консультация уходит из кэша и не возвращается при поздней загрузке"""
+        consultation = SimpleNamespace(
+            id=5, client_id=10, florist_id=20, status=ConsultationStatusEnum.active, completed_at=None,
+            client=SimpleNamespace(tg_id="111", first_name="Клиент"),
+            florist=SimpleNamespace(tg_id="222", first_name="Флорист")
+        )
+        participants_cache.put(consultation)
+        assert participants_cache.get(5)
+        
+        finish_consultation(consultation, ConsultationStatusEnum.expired)
+        assert consultation.status == ConsultationStatusEnum.expired and consultation.completed_at
+        assert participants_cache.get(5) is None
+        
+        participants_cache.put(consultation)
+        assert participants_cache.get(5) is None
+    
+    @pytest.mark.asyncio
+    async def test_writer_retries_failed_flush(self, monkeypatch):
+        """Неудачная запись возвращает строки в очередь и сама назначает повтор"""
+        attempts = []
+        
+        class _Session:
+            async def execute(self, stmt, rows):
+                attempts.append(len(rows))
+                if len(attempts) == 1:
+                    raise RuntimeError("db is down")
+            
+            async def commit(self):
+                pass
+        
+        async def _get_session():
+            yield _Session()
+        
+        monkeypatch.setattr(database, "get_session", _get_session)
+        writer = ConsultationMessageWriter(flush_interval=0.01, batch_size=2, retry_interval=0.01)
+        
+        writer.add(1, 10, message_text="раз")
+        writer.add(1, 10, message_text="два")
+        await asyncio.sleep(0.1)
+        
+        assert attempts == [2, 2]
+        assert not writer._pending and not writer._timers and not writer._flushes
+    
+    @pytest.mark.asyncio
+    async def test_album_flush_skips_pause(self):
+        """flush отдает альбом консультации сразу, чужие альбомы ждут паузы"""
+        collector = MediaGroupCollector(delay=10)
+        relayed = []
+        
+        async def _relay(messages):
+            relayed.append([m.message_id for m in messages])
+        
+        for message_id, group_id, owner in ((2, "a", 1), (1, "a", 1), (3, "b", 2)):
+            message = _message(text="фото", media_group_id=group_id).model_copy(update={"message_id": message_id})
+            collector.add(message, _relay, owner=owner)
+        
+        await collector.flush(1)
+        
+        assert relayed == [[1, 2]]
+        assert list(collector._tasks) == ["b"]
+        await collector.flush(2)
+        assert relayed == [[1, 2], [3]] and not collector._tasks
@@ -0,0 +1,88 @@
+import os
+import uuid
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, User, Consultation, ConsultationMessage, ConsultationStatusEnum
+from app.repositories.consultation import ConsultationRepository
+
+# Полнотекстовый поиск работает только в PostgreSQL: postgresql+asyncpg://... пустой тестовой БД
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+@pytest_asyncio.fixture
+async def pg_db():
+    """Тестовая схема PostgreSQL с поисковой колонкой как в миграции d5e96b0c7a13"""
+    if not TEST_POSTGRES_URL:
+        pytest.skip("TEST_POSTGRES_URL не задан")
+
+    schema = f"test_search_{uuid.uuid4().hex[:8]}"
+    admin_engine = create_async_engine(TEST_POSTGRES_URL)
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"CREATE SCHEMA {schema}"))
+
+    engine = create_async_engine(TEST_POSTGRES_URL, connect_args={"server_settings": {"search_path": schema}})
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("""
+            ALTER TABLE consultation_messages
+            ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('russian', coalesce(message_text, '')), 'A') ||
+                setweight(to_tsvector('simple', coalesce(message_text, '')), 'B')
+            ) STORED
+        """))
+
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    await engine.dispose()
+    async with admin_engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+    await admin_engine.dispose()
+
+class TestConsultationSearch:
+    """Тесты поиска консультаций по переписке"""
+
+    @pytest.mark.asyncio
+    async def test_ranking_and_cursor(self, pg_db):
+        """Чаще совпадающая консультация выше, курсор листает без повторов"""
+        async with pg_db() as session:
+            client = User(tg_id="1", first_name="Анна")
+            florist = User(tg_id="2", first_name="Мария")
+            session.add_all([client, florist])
+            await session.flush()
+
+            texts = {
+                "best": ["Нужны пионы, розовые пионы и белые пионы на свадьбу"],
+                "weak": ["Добрый день", "А пионы у вас бывают?"],
+                "none": ["Хочу тюльпаны"],
+            }
+            ids = {}
+            for key, messages in texts.items():
+                consultation = Consultation(client_id=client.id, florist_id=florist.id,
+                                            status=ConsultationStatusEnum.completed)
+                session.add(consultation)
+                await session.flush()
+                ids[key] = consultation.id
+                session.add_all([
+                    ConsultationMessage(consultation_id=consultation.id, sender_id=client.id, message_text=message)
+                    for message in messages
+                ])
+            await session.commit()
+
+            repo = ConsultationRepository(session)
+            # "пион" находит "пионы" через русскую морфологию
+            first = await repo.search_consultations("пион", limit=1)
+            assert [hit["consultation_id"] for hit in first] == [ids["best"]]
+            assert "<b>" in first[0]["snippet"] and first[0]["client_name"] == "Анна"
+
+            cursor = (first[0]["rank"], first[0]["consultation_id"])
+            second = await repo.search_consultations("пион", limit=1, after=cursor)
+            assert [hit["consultation_id"] for hit in second] == [ids["weak"]]
+            assert second[0]["rank"] < first[0]["rank"]
+
+            cursor = (second[0]["rank"], second[0]["consultation_id"])
+            assert await repo.search_consultations("пион", limit=1, after=cursor) == []
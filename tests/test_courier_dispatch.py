@@ -0,0 +1,71 @@
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.models import User, RoleEnum, Order, OrderStatusEnum, BatchStatusEnum
+from app.repositories.delivery_batch import DeliveryBatchRepository
+from app.services.courier_dispatch import build_batches
+from app.utils.routing import plan_route
+
+SLOT = datetime(2025, 9, 12, 12, 0)
+
+def _order(order_id, lat=None, lon=None, zone_id=1, slot_at=SLOT):
+    return SimpleNamespace(id=order_id, latitude=lat, longitude=lon, delivery_zone_id=zone_id, slot_at=slot_at)
+
+class TestCourierDispatch:
+    """Тесты формирования рейсов курьеров"""
+
+    def test_plan_route_removes_crossing(self):
+        """Маршрут по прямой идет по порядку, без возвратов"""
+        points = [(41.30, 69.30), (41.30, 69.10), (41.30, 69.20), (41.30, 69.40)]
+        assert plan_route((41.30, 69.00), points) == [1, 2, 0, 3]
+
+    def test_build_batches(self):
+        """Группы по зоне и слоту, нарезка по маршруту, заказы без координат - в конце"""
+        orders = [
+            _order(1, 41.30, 69.30), _order(2, 41.30, 69.10), _order(3),
+            _order(4, 41.30, 69.20), _order(5, 41.30, 69.25, zone_id=2),
+        ]
+        batches = build_batches(orders, (41.30, 69.00), max_size=2)
+
+        assert [(zone, ids) for zone, _, ids, _ in batches] == [(1, [2, 4]), (1, [1, 3]), (2, [5])]
+
+    @pytest.mark.asyncio
+    async def test_batch_lifecycle(self, test_db):
+        """Предложение, принятие и массовая смена статусов заказов рейса"""
+        async for session in test_db():
+            client = User(tg_id="1", first_name="Client", role=RoleEnum.client)
+            courier = User(tg_id="2", first_name="Courier", role=RoleEnum.courier)
+            session.add_all([client, courier])
+            await session.flush()
+
+            orders = [
+                Order(user_id=client.id, total_price=Decimal("100"), status=OrderStatusEnum.ready, slot_at=SLOT)
+                for _ in range(3)
+            ]
+            session.add_all(orders)
+            await session.commit()
+
+            repo = DeliveryBatchRepository(session)
+            batch = await repo.create_batch([o.id for o in orders], None, SLOT, None)
+            assert await repo.get_unbatched_ready_orders(datetime(2030, 1, 1)) == []
+
+            assert [c.id for c in await repo.get_free_couriers()] == [courier.id]
+            assert await repo.offer(batch.id, courier.id)
+            assert await repo.get_free_couriers() == []
+            assert not await repo.accept(batch.id, client.id)
+            assert await repo.accept(batch.id, courier.id)
+
+            changed = await repo.start(batch.id, courier.id)
+            assert sorted(order_id for order_id, _ in changed) == sorted(o.id for o in orders)
+            assert await repo.start(batch.id, courier.id) is None
+
+            await repo.complete(batch.id, courier.id)
+            await session.commit()
+
+            delivered = await repo.get_orders(batch.id, (OrderStatusEnum.delivered,))
+            assert len(delivered) == 3
+            await session.refresh(batch)
+            assert batch.status == BatchStatusEnum.completed
@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+import pytest
+
+from app.services.delivery_zones import Zone, ZoneIndex, parse_zones, point_in_polygon
+
+SQUARE = ((41.30, 69.20), (41.30, 69.30), (41.40, 69.30), (41.40, 69.20))
+
+def _zone(zone_id, polygon, priority=0):
+    return Zone(
+        id=zone_id, name_ru=f"Зона {zone_id}", name_uz=f"Zona {zone_id}",
+        polygon=polygon, fee=Decimal("10000"), eta_minutes=60, priority=priority
+    )
+
+class TestDeliveryZones:
+    """Тесты поиска зоны доставки по точке"""
+
+    def test_point_in_polygon(self):
+        """Точка внутри и снаружи невыпуклого многоугольника"""
+        notch = ((0, 0), (0, 4), (4, 4), (4, 0), (2, 2))  # вырез снизу
+        assert point_in_polygon(3, 2, notch)
+        assert not point_in_polygon(2, 1, notch)
+        assert not point_in_polygon(5, 5, notch)
+
+    def test_zone_index_priority(self):
+        """При пересечении зон выигрывает приоритет, вне зон - None"""
+        center = ((41.34, 69.24), (41.34, 69.26), (41.36, 69.26), (41.36, 69.24))
+        index = ZoneIndex([_zone(1, SQUARE), _zone(2, center, priority=10)])
+
+        assert index.locate(41.35, 69.25).id == 2
+        assert index.locate(41.31, 69.21).id == 1
+        assert index.locate(41.50, 69.25) is None
+
+    def test_parse_zones(self):
+        """Импорт зон из JSON"""
+        zones = parse_zones('[{"name_ru": "Центр", "fee": 15000, "polygon": [[1, 1], [1, 2], [2, 2]]}]')
+        assert zones[0]["name_uz"] == "Центр" and zones[0]["fee"] == Decimal("15000")
+
+        with pytest.raises(ValueError):
+            parse_zones('[{"name_ru": "Центр", "polygon": [[1, 1], [1, 2]]}]')
@@ -0,0 +1,52 @@
+import pytest
+from datetime import datetime, date
+
+from app.repositories.inventory import MovementRepository
+from app.models import Flower, InventoryMovement, MovementTypeEnum
+
+class TestMovementRepository:
+    """Тесты репозитория движений склада"""
+    
+    async def _create_movements(self, session):
+        flower = Flower(name_ru="Роза", name_uz="Atirgul", unit_type="piece")
+        session.add(flower)
+        await session.flush()
+        
+        for created_at in (
+            datetime(2025, 3, 31, 23, 59, 59),
+            datetime(2025, 4, 1, 0, 0, 0),
+            datetime(2025, 4, 30, 23, 59, 59),
+            datetime(2025, 5, 1, 0, 0, 0),
+        ):
+            session.add(InventoryMovement(
+                flower_id=flower.id,
+                movement_type=MovementTypeEnum.purchase,
+                quantity=10,
+                created_at=created_at
+            ))
+        await session.commit()
+    
+    @pytest.mark.asyncio
+    async def test_get_movements_by_period_includes_whole_end_day(self, test_db):
+        """Период включает весь последний день и не захватывает соседние"""
+        async for session in test_db():
+            await self._create_movements(session)
+            repo = MovementRepository(session)
+            
+            movements = await repo.get_movements_by_period(date(2025, 4, 1), date(2025, 4, 30))
+            assert len(movements) == 2
+    
+    @pytest.mark.asyncio
+    async def test_stream_movements_by_period(self, test_db):
+        """Потоковая выгрузка отдает строки в хронологическом порядке"""
+        async for session in test_db():
+            await self._create_movements(session)
+            repo = MovementRepository(session)
+            
+            rows = [
+                row async for row in repo.stream_movements_by_period(
+                    date(2025, 3, 31), date(2025, 4, 30), chunk_size=1
+                )
+            ]
+            assert [row.created_at.day for row in rows] == [31, 1, 30]
+            assert rows[0].flower_name == "Роза"
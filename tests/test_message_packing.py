@@ -0,0 +1,34 @@
+from app.utils.message_packing import pack_messages, split_text
+
+class TestMessagePacking:
+    """Тесты упаковки сообщений для отправки пачками"""
+    
+    def test_texts_are_merged_and_order_kept(self):
+        """Соседние тексты склеиваются, фото разрывают текст и собираются в альбом"""
+        packets = pack_messages([
+            {"text": "раз"},
+            {"text": "два"},
+            {"photo": "p1", "text": "подпись"},
+            {"photo": "p2"},
+            {"text": "три"},
+        ])
+        
+        assert packets == [
+            {"type": "text", "text": "раз\n\nдва"},
+            {"type": "photos", "photos": [("p1", "подпись"), ("p2", None)]},
+            {"type": "text", "text": "три"},
+        ]
+    
+    def test_text_limit(self):
+        """Тексты не превышают лимит Telegram"""
+        packets = pack_messages([{"text": "x" * 3000}, {"text": "y" * 3000}])
+        assert [len(p["text"]) for p in packets] == [3000, 3000]
+        
+        parts = split_text("слово " * 2000, limit=4096)
+        assert all(len(part) <= 4096 for part in parts)
+        assert "".join(parts).replace(" ", "") == "слово" * 2000
+    
+    def test_media_group_limit(self):
+        """В одном альбоме не больше 10 фото"""
+        packets = pack_messages([{"photo": f"p{i}"} for i in range(12)])
+        assert [len(p["photos"]) for p in packets] == [10, 2]
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.notification_digest import NotificationDigest, render_digest
+
+class _NoRedisDigest(NotificationDigest):
+    """Буфер только в памяти процесса"""
+
+    async def _redis(self):
+        return None
+
+class TestNotificationDigest:
+    """Тесты сводок уведомлений о заказах"""
+
+    def test_render_coalesces_by_order(self):
+        """Повторы статуса схлопываются, по заказу - цепочка статусов"""
+        events = [
+            {"order_id": 7, "status": "accepted", "by": "Анна"},
+            {"order_id": 5, "status": "ready", "by": "Анна"},
+            {"order_id": 7, "status": "accepted", "by": "Анна"},
+            {"order_id": 7, "status": "ready", "by": "Ольга"},
+        ]
+        text = render_digest(events, 15)
+
+        assert "Изменений: 4, заказов: 2" in text
+        assert text.index("#5:") < text.index("#7:")
+        assert "#7: ✅ ПРИНЯТ → 🎉 ГОТОВ (Анна, Ольга)" in text
+
+    @pytest.mark.asyncio
+    async def test_defer_respects_mode_and_critical(self):
+        """Мгновенный режим и отмены не буферизуются, остальное копится до выгрузки"""
+        digest = _NoRedisDigest()
+        instant = SimpleNamespace(tg_id="1", notify_digest_minutes=None)
+        batched = SimpleNamespace(tg_id="2", notify_digest_minutes=15)
+
+        assert not await digest.defer(instant, 1, "accepted")
+        assert not await digest.defer(batched, 1, "canceled")
+        assert await digest.defer(batched, 1, "accepted", "Анна")
+        assert await digest.defer(batched, 2, "ready")
+
+        assert await digest.oldest("2") is not None
+        assert [e["order_id"] for e in await digest.drain("2")] == [1, 2]
+        assert await digest.drain("2") == []
+        assert await digest.oldest("2") is None
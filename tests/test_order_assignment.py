@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.models import User, RoleEnum, Order, OrderStatusEnum, FloristProfile
+from app.repositories.order import OrderRepository
+from app.repositories.florist import FloristRepository
+
+class TestOrderAssignment:
+    """Тесты назначения заказов флористам"""
+
+    @pytest.mark.asyncio
+    async def test_least_loaded_and_claim(self, test_db):
+        """Заказ предлагается свободнейшему, после отказа - следующему, принять может только один"""
+        async for session in test_db():
+            now = datetime.utcnow()
+            client = User(tg_id="1", first_name="Client", role=RoleEnum.client)
+            busy = User(tg_id="2", first_name="Busy", role=RoleEnum.florist)
+            free = User(tg_id="3", first_name="Free", role=RoleEnum.florist)
+            away = User(tg_id="4", first_name="Away", role=RoleEnum.florist)
+            session.add_all([client, busy, free, away])
+            await session.flush()
+
+            session.add_all([
+                FloristProfile(user_id=busy.id, last_seen=now),
+                FloristProfile(user_id=free.id, last_seen=now),
+                FloristProfile(user_id=away.id, last_seen=now - timedelta(days=1)),
+                Order(user_id=client.id, florist_id=busy.id, total_price=Decimal("100"),
+                      status=OrderStatusEnum.preparing),
+            ])
+            order = Order(user_id=client.id, total_price=Decimal("100"), status=OrderStatusEnum.new)
+            session.add(order)
+            await session.commit()
+
+            florist_repo = FloristRepository(session)
+            order_repo = OrderRepository(session)
+            online_since = now - timedelta(minutes=30)
+
+            # Без заказов в работе, но не в сети - после тех, кто в сети
+            florist, load = await florist_repo.get_least_loaded(online_since)
+            assert (florist.id, load) == (free.id, 0)
+
+            assert await order_repo.offer_to(order.id, free.id)
+            assert not await order_repo.offer_to(order.id, busy.id)
+
+            # Отказ: флорист исключается из следующих предложений
+            assert await order_repo.skip_offer(order, free.id)
+            await session.refresh(order)
+            assert order.offer_skipped == [free.id]
+            florist, load = await florist_repo.get_least_loaded(online_since, exclude=order.offer_skipped)
+            assert (florist.id, load) == (busy.id, 1)
+
+            assert await order_repo.escalate(order.id)
+            assert await order_repo.claim(order.id, busy.id)
+            assert not await order_repo.claim(order.id, free.id)
+
+            await session.refresh(order)
+            assert order.status == OrderStatusEnum.accepted
+            assert order.florist_id == busy.id
@@ -0,0 +1,48 @@
+from decimal import Decimal
+
+from app.utils.translit import transliterate, search_tokens
+from app.services.product_search import CatalogProduct, PrefixIndex
+from app.utils.cache import LRUCache
+
+def _product(product_id, name_ru, name_uz):
+    return CatalogProduct(
+        id=product_id, category_id=1, name_ru=name_ru, name_uz=name_uz,
+        desc_ru=None, desc_uz=None, price=Decimal("100000"),
+        photo_file_id=None, photo_url=None
+    )
+
+class TestProductSearch:
+    """Тесты транслитерации и префиксного индекса"""
+
+    def test_transliterate(self):
+        """Кириллица и латиница узбекского приводятся к одному виду"""
+        assert transliterate("Атиргул") == transliterate("Atirgul") == "atirgul"
+        assert transliterate("ғунча") == transliterate("G'uncha") == "guncha"
+        assert transliterate("Шафтоли") == "shaftoli"
+        assert search_tokens("Букет «Нежность»") == ["buket", "nejnost"]
+
+    def test_prefix_index(self):
+        """Поиск по началу слов в названиях на обоих языках"""
+        index = PrefixIndex([
+            _product(1, "Букет роз", "Atirgul guldastasi"),
+            _product(2, "Розовые пионы", "Pushti pionlar"),
+            _product(3, "Тюльпаны", "Lolalar"),
+        ])
+
+        assert set(index.search("роз")) == {1, 2}
+        assert index.search("роз")[0] == 2  # название начинается с запроса
+        assert index.search("атир") == [1]
+        assert index.search("буке роз") == [1]
+        assert index.search("lola") == [3]
+        assert index.search("") == []
+
+    def test_lru_cache_eviction(self):
+        """Вытесняется давно не использованный ключ"""
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert "b" not in cache
+        assert cache.get("a") == 1 and cache.get("c") == 3
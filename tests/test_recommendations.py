@@ -0,0 +1,78 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.repositories.recommendation import RecommendationRepository
+from app.services.recommendations import accumulate, decay_factor, HALF_LIFE
+from app.models import Category, Product, User, Order, OrderItem, OrderStatusEnum
+
+class TestRecommendations:
+    """Тесты популярности и пар "часто берут вместе\""""
+
+    def test_accumulate_weights_by_age(self):
+        """Популярность - штуки с затуханием, пары - симметрично по заказу"""
+        now = datetime(2025, 9, 15, 12, 0)
+        lines = [
+            (1, now, 10, 2),
+            (1, now, 11, 1),
+            (1, now, 10, 1),              # повтор товара в заказе суммируется
+            (2, now - HALF_LIFE, 10, 1),
+            (2, now - HALF_LIFE, 12, 1),
+            (3, now, 12, 1),              # заказ из одного товара пар не дает
+        ]
+        popularity, pairs = accumulate(lines, now)
+
+        assert decay_factor(HALF_LIFE) == pytest.approx(0.5)
+        assert popularity == pytest.approx({10: 3.5, 11: 1.0, 12: 1.5})
+        assert pairs == pytest.approx({(10, 11): 1.0, (11, 10): 1.0, (10, 12): 0.5, (12, 10): 0.5})
+
+    @pytest.mark.asyncio
+    async def test_repository_upsert_decay_and_prune(self, test_db):
+        """Вклады складываются, затухание убирает мелкие оценки, у товара остаются лучшие пары"""
+        async for session in test_db():
+            repo = RecommendationRepository(session)
+
+            category = Category(name_ru="Букеты", name_uz="Guldastalar")
+            session.add(category)
+            await session.flush()
+            products = [
+                Product(category_id=category.id, name_ru=f"Товар {n}", name_uz=f"Mahsulot {n}", price=Decimal("100"))
+                for n in range(4)
+            ]
+            client = User(tg_id="1", first_name="Client")
+            session.add_all(products + [client])
+            await session.flush()
+            a, b, c, d = (p.id for p in products)
+
+            created = datetime.utcnow() - timedelta(hours=2)
+            live = Order(user_id=client.id, total_price=Decimal("200"), created_at=created)
+            canceled = Order(user_id=client.id, total_price=Decimal("100"),
+                             status=OrderStatusEnum.canceled, created_at=created)
+            session.add_all([live, canceled])
+            await session.flush()
+            session.add_all([
+                OrderItem(order_id=live.id, product_id=a, qty=1, price=Decimal("100")),
+                OrderItem(order_id=live.id, product_id=b, qty=1, price=Decimal("100")),
+                OrderItem(order_id=canceled.id, product_id=c, qty=1, price=Decimal("100")),
+            ])
+            await session.commit()
+
+            lines = await repo.get_new_order_lines(0, datetime.utcnow() - timedelta(hours=1))
+            assert {line[2] for line in lines} == {a, b}
+            assert await repo.get_new_order_lines(live.id, datetime.utcnow()) == []
+
+            await repo.add_popularity({a: 1.0, b: 3.0})
+            await repo.add_popularity({a: 5.0})
+            assert [p.id for p in await repo.get_popular_products(10)] == [a, b]
+
+            await repo.add_pairs({(a, b): 1.0, (a, c): 3.0, (a, d): 2.0})
+            await repo.add_pairs({(a, b): 0.5})
+            assert [p.id for p in await repo.get_related_products(a, 10)] == [c, d, b]
+
+            await repo.prune_pairs(2)
+            assert [p.id for p in await repo.get_related_products(a, 10)] == [c, d]
+
+            await repo.decay(0.1, 0.25)
+            await session.commit()
+            assert [p.id for p in await repo.get_popular_products(10)] == [a, b]
+            assert [p.id for p in await repo.get_related_products(a, 10)] == [c]
@@ -1,6 +1,19 @@
 import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import select, update
 from app.repositories.user import UserRepository
-from app.models import User, RoleEnum
+from app.repositories.florist import FloristRepository
+from app.repositories.order import OrderRepository
+from app.services.order_service import OrderService
+from app.services.staff_directory import StaffDirectory, STAFF_ROLES
+from app.services.customer_segments import SEGMENT_RULES, DEFAULT_SEGMENT, classify
+from app.repositories.customer_segment import CustomerSegmentRepository
+from app.models import (
+    User, RoleEnum, FloristProfile, FloristReview,
+    RoleRequest, RequestedRoleEnum, RequestStatusEnum, Order, OrderStatusEnum,
+    CustomerStats, CustomerSegment
+)
 
 class TestUserRepository:
     """Тесты репозитория пользователей"""
@@ -36,4 +49,201 @@ class TestUserRepository:
             # Получаем пользователя
             found_user = await repo.get_by_tg_id("123456")
             assert found_user is not None
-            assert found_user.tg_id == "123456"
\ No newline at end of file
+            assert found_user.tg_id == "123456"
+
+    @pytest.mark.asyncio
+    async def test_count_pending_requests(self, test_db):
+        """Считаются только ожидающие заявки"""
+        async for session in test_db():
+            repo = UserRepository(session)
+            
+            session.add_all([
+                RoleRequest(user_tg_id="1", requested_role=RequestedRoleEnum.florist),
+                RoleRequest(user_tg_id="2", requested_role=RequestedRoleEnum.owner),
+                RoleRequest(user_tg_id="3", requested_role=RequestedRoleEnum.florist,
+                            status=RequestStatusEnum.rejected),
+            ])
+            await session.commit()
+            
+            assert await repo.count_pending_requests() == 2
+
+    @pytest.mark.asyncio
+    async def test_staff_directory_load(self, test_db):
+        """Справочник персонала: клиенты не попадают, роли и режим сводки - из одного запроса"""
+        async for session in test_db():
+            repo = UserRepository(session)
+            
+            session.add_all([
+                User(tg_id="1", first_name="Client", role=RoleEnum.client),
+                User(tg_id="2", first_name="Owner", role=RoleEnum.owner, notify_digest_minutes=15),
+                User(tg_id="3", first_name="Florist", role=RoleEnum.florist),
+                User(tg_id="4", first_name="Courier", role=RoleEnum.courier),
+            ])
+            await session.commit()
+            
+            directory = StaffDirectory()
+            directory.load(await repo.get_staff(STAFF_ROLES))
+            
+            assert [m.tg_id for m in await directory.owners()] == ["2"]
+            assert [m.tg_id for m in await directory.florists()] == ["3"]
+            assert [m.tg_id for m in await directory.get(RoleEnum.courier)] == ["4"]
+            assert [m.tg_id for m in await directory.digest_recipients()] == ["2"]
+
+class TestOrderRepository:
+    """Тесты репозитория заказов"""
+    
+    @pytest.mark.asyncio
+    async def test_user_orders_keyset_pages(self, test_db):
+        """Листание по (created_at, id) в обе стороны, фильтр статусов и сводка одним запросом"""
+        async for session in test_db():
+            repo = OrderRepository(session)
+            
+            client = User(tg_id="1", first_name="Client")
+            other = User(tg_id="2", first_name="Other")
+            session.add_all([client, other])
+            await session.flush()
+            
+            same_time = datetime(2025, 9, 1, 12, 0)
+            for n in range(7):
+                session.add(Order(
+                    user_id=client.id,
+                    total_price=Decimal("100"),
+                    status=OrderStatusEnum.delivered if n < 5 else OrderStatusEnum.new,
+                    # Два последних заказа с одинаковым временем - порядок по id
+                    created_at=same_time if n >= 5 else same_time - timedelta(days=7 - n)
+                ))
+            session.add(Order(user_id=other.id, total_price=Decimal("5"), created_at=same_time))
+            await session.commit()
+            
+            page, has_more = await repo.get_user_orders_page(client.id, 3)
+            assert has_more
+            ids = [o.id for o in page]
+            assert ids == sorted(ids, reverse=True)
+            
+            cursor = lambda order: (order.created_at, order.id)
+            older, has_more = await repo.get_user_orders_page(client.id, 3, before=cursor(page[-1]))
+            assert has_more and [o.id for o in older] == [ids[-1] - 1, ids[-1] - 2, ids[-1] - 3]
+            
+            last, has_more = await repo.get_user_orders_page(client.id, 3, before=cursor(older[-1]))
+            assert not has_more and len(last) == 1
+            
+            newer, has_more = await repo.get_user_orders_page(client.id, 3, after=cursor(older[0]))
+            assert not has_more and [o.id for o in newer] == ids
+            
+            active, _ = await repo.get_user_orders_page(client.id, 10, statuses=[OrderStatusEnum.new])
+            assert len(active) == 2
+            
+            stats = await repo.get_user_stats(client.id)
+            assert stats == {
+                OrderStatusEnum.delivered: (5, Decimal("500")),
+                OrderStatusEnum.new: (2, Decimal("200")),
+            }
+
+    @pytest.mark.asyncio
+    async def test_customer_stats_incremental(self, test_db):
+        """Сводка клиента меняется вместе со статусами заказов"""
+        async for session in test_db():
+            client = User(tg_id="1", first_name="Client")
+            session.add(client)
+            await session.flush()
+            
+            orders = [
+                Order(user_id=client.id, total_price=Decimal(price), created_at=datetime(2025, 9, day))
+                for price, day in (("100", 2), ("300", 5), ("50", 3))
+            ]
+            session.add_all(orders)
+            await session.flush()
+            
+            service = OrderService(session)
+            for order in orders:
+                await service.stats_repo.record_order(client.id, order.created_at)
+            
+            await service.update_order_status(orders[0].id, OrderStatusEnum.delivered)
+            await service.update_order_status(orders[1].id, OrderStatusEnum.delivered)
+            await service.update_order_status(orders[2].id, OrderStatusEnum.canceled)
+            await service.update_order_status(orders[1].id, OrderStatusEnum.canceled)
+            await session.commit()
+            
+            stats = await service.get_customer_stats(client.id)
+            await session.refresh(stats)
+            assert (stats.orders_count, stats.delivered_count, stats.total_spent) == (1, 1, Decimal("100"))
+            assert stats.average_check == Decimal("100")
+            assert (stats.first_order_at, stats.last_order_at) == (datetime(2025, 9, 2), datetime(2025, 9, 5))
+
+class TestFloristRepository:
+    """Тесты рейтинга флористов"""
+    
+    @pytest.mark.asyncio
+    async def test_incremental_rating_and_recompute(self, test_db):
+        """Инкрементальный рейтинг совпадает с точным пересчетом"""
+        async for session in test_db():
+            client = User(tg_id="1", first_name="Клиент", lang="ru")
+            florist = User(tg_id="2", first_name="Флорист", lang="ru", role=RoleEnum.florist)
+            session.add_all([client, florist])
+            await session.flush()
+            session.add(FloristProfile(user_id=florist.id, rating=0, reviews_count=0))
+            
+            for consultation_id, rating in [(1, 5), (2, 4), (3, 4)]:
+                session.add(FloristReview(
+                    consultation_id=consultation_id, client_id=client.id,
+                    florist_id=florist.id, rating=rating
+                ))
+            await session.flush()
+            
+            repo = FloristRepository(session)
+            for rating in (5, 4, 4):
+                new_rating = await repo.add_rating(florist.id, rating)
+            
+            assert new_rating[1] == 3
+            assert float(new_rating[0]) == pytest.approx(4.33, abs=0.01)
+            
+            # Сбиваем рейтинг - пересчет исправляет только разошедшиеся профили
+            await session.execute(
+                update(FloristProfile).values(rating=1)
+            )
+            assert await repo.recompute_ratings() == 1
+            assert await repo.recompute_ratings() == 0
+
+class TestCustomerSegmentRepository:
+    """Тесты RFM-сегментации"""
+    
+    @pytest.mark.asyncio
+    async def test_rebuild_scores_and_segments(self, test_db):
+        """Квинтили считаются в БД, одинаковые значения - один балл, сегменты как в classify"""
+        async for session in test_db():
+            repo = CustomerSegmentRepository(session)
+            now = datetime(2025, 9, 15, 12, 0)
+            
+            users = [User(tg_id=str(n), first_name=f"Client {n}") for n in range(11)]
+            session.add_all(users)
+            await session.flush()
+            # Клиент n: заказ n дней назад, у первых пяти по одному заказу, n*1000 потрачено
+            for n, user in enumerate(users[:10]):
+                session.add(CustomerStats(
+                    user_id=user.id, orders_count=1 if n < 5 else n, delivered_count=n,
+                    total_spent=Decimal(n * 1000), last_order_at=now - timedelta(days=n)
+                ))
+            # Только отмененные заказы - в сегменты не попадает
+            session.add(CustomerStats(user_id=users[10].id, orders_count=0, last_order_at=now))
+            await session.commit()
+            
+            assert await repo.rebuild(SEGMENT_RULES, DEFAULT_SEGMENT, now) == 10
+            await repo.rebuild(SEGMENT_RULES, DEFAULT_SEGMENT, now)  # повторная пересборка заменяет строки
+            await session.commit()
+            
+            rows = {
+                row.user_id: row
+                for row in (await session.execute(select(CustomerSegment))).scalars().all()
+            }
+            assert len(rows) == 10
+            first, last = rows[users[0].id], rows[users[9].id]
+            assert (first.recency_score, first.frequency_score, first.monetary_score) == (5, 1, 1)
+            assert (last.recency_score, last.frequency_score, last.monetary_score) == (1, 5, 5)
+            assert {rows[u.id].frequency_score for u in users[:5]} == {1}
+            for row in rows.values():
+                assert row.segment == classify(row.recency_score, row.frequency_score, row.monetary_score)
+            assert last.segment == "at_risk"
+            
+            counts = await repo.get_segment_counts()
+            assert sum(counts.values()) == 10
+            assert await repo.get_computed_at() == now
@@ -0,0 +1,24 @@
+import pytest
+
+from app import translate
+from app.translate import t, validate_translations
+
+class TestTranslate:
+    """Тесты скомпилированных таблиц переводов"""
+
+    def test_format_and_fallback(self):
+        """Подстановки, fallback на русский и неизвестный ключ"""
+        assert t("uz", "call_request_received", name="A", phone="1").startswith("📞 A ")
+        assert t("xx", "menu_catalog") == t("ru", "menu_catalog")
+        assert "{name}" in t("ru", "call_request_received", name="A")  # не хватает phone
+        assert t("ru", "no_such_key") == "no_such_key"
+
+    def test_validation(self, monkeypatch):
+        """Расхождение плейсхолдеров между языками - ошибка при старте"""
+        validate_translations()
+
+        sources = {lang: dict(texts) for lang, texts in translate._SOURCES.items()}
+        sources["uz"]["call_request_received"] = "{name}"
+        monkeypatch.setattr(translate, "_SOURCES", sources)
+        with pytest.raises(ValueError, match="call_request_received"):
+            validate_translations()